@@ -0,0 +1,10 @@
+"""Serveur de développement : python -m backend.
+
+Point d'entrée distinct de backend.app : les processus du pool de hachage (spawn) réimportent
+le module principal, qui ne doit donc pas construire l'application.
+"""
+
+if __name__ == '__main__':
+    from backend.app import app
+
+    app.run(debug=True)
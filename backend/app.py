@@ -1,18 +1,44 @@
 import os
-from flask import Flask, jsonify, redirect, send_from_directory
+from flask import Flask, jsonify, redirect
+from werkzeug.exceptions import NotFound
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager
+from flask_jwt_extended import JWTManager, jwt_required
+from flask_migrate import Migrate, upgrade
 from backend.config import Config
-from backend.models import db, bcrypt
+from backend.json_provider import JSONProvider
+from backend.negotiation import ApiRequest
+from backend.models import db
+from backend.passwords import password_hasher
+from backend.cache import response_cache
+from backend.ratelimit import limiter
+from backend.revocation import revocation_list
+from backend.images import image_pipeline
+from backend.remote_uploads import upload_queue
+from backend.static_files import static_files
+from backend.upload_store import upload_storage
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
 
 def create_app(config_class=Config):
-    app = Flask(__name__, static_folder='dist', static_url_path='')
+    # Pas de route statique Flask : le build frontend est servi par static_files (voir spa())
+    app = Flask(__name__, static_folder=None)
+    app.request_class = ApiRequest
+    app.json = JSONProvider(app)
     app.url_map.strict_slashes = False
     app.config.from_object(config_class)
     
     # Initialisation des extensions
     db.init_app(app)
-    bcrypt.init_app(app)
+    password_hasher.init_app(app)
+    Migrate(app, db, directory=MIGRATIONS_DIR, render_as_batch=True)
+    response_cache.init_app(app)
+    limiter.init_app(app)
+    revocation_list.init_app(app)
+    image_pipeline.init_app(app)
+    upload_storage.init_app(app)
+    upload_queue.init_app(app)
+    static_files.init_app(app)
     jwt = JWTManager(app)
 
     @jwt.expired_token_loader
@@ -30,6 +56,13 @@ def create_app(config_class=Config):
         app.logger.warning("JWT missing: %s", reason)
         return jsonify({"message": "Token manquant"}), 401
 
+    @jwt.token_in_blocklist_loader
+    def _token_in_blocklist(jwt_header, jwt_payload):
+        # Les jetons de rafraîchissement sont vérifiés par la route /refresh (table refresh_tokens)
+        if jwt_payload.get('type') == 'refresh':
+            return False
+        return revocation_list.is_revoked(jwt_payload)
+
     @jwt.revoked_token_loader
     def _revoked_token_callback(jwt_header, jwt_payload):
         app.logger.warning("JWT revoked: %s", jwt_payload.get('jti'))
@@ -55,12 +88,29 @@ def create_app(config_class=Config):
     from backend.routes.ingredients import ingredients_bp
     from backend.routes.inventaires import inventaires_bp
     from backend.routes.shopping import shopping_bp
+    from backend.routes.uploads import uploads_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(recettes_bp, url_prefix='/api/recettes')
     app.register_blueprint(ingredients_bp, url_prefix='/api/ingredients')
     app.register_blueprint(inventaires_bp, url_prefix='/api/inventaires')
     app.register_blueprint(shopping_bp, url_prefix='/api/shopping')
+    app.register_blueprint(uploads_bp, url_prefix='/api/uploads')
+
+    from backend.index_check import check_indexes_command
+    app.cli.add_command(check_indexes_command)
+    from backend.benchmarks import benchmark_serialization_command
+    app.cli.add_command(benchmark_serialization_command)
+    from backend.remote_uploads import process_uploads_command
+    from backend.cloudinary_standin import cloudinary_standin_command
+    app.cli.add_command(process_uploads_command)
+    from backend.static_files import compress_static_command
+    app.cli.add_command(compress_static_command)
+    app.cli.add_command(cloudinary_standin_command)
+    from backend.passwords import calibrate_bcrypt_command
+    app.cli.add_command(calibrate_bcrypt_command)
+    from backend.s3_standin import s3_standin_command
+    app.cli.add_command(s3_standin_command)
     
     auto_create_env = os.environ.get('AUTO_CREATE_DB')
     if auto_create_env is None:
@@ -69,25 +119,23 @@ def create_app(config_class=Config):
         should_create = auto_create_env.lower() in ('1', 'true', 'yes')
 
     if should_create:
-        # Création des tables si elles n'existent pas (dev uniquement sauf override)
+        # Application des migrations au démarrage (dev uniquement sauf override)
         with app.app_context():
-            db.create_all()
+            upgrade(directory=MIGRATIONS_DIR)
     
     def _spa_fallback(path):
         if path.startswith('api/') or path.startswith('uploads/'):
             return jsonify({"message": "Not found"}), 404
 
-        index_path = os.path.join(app.static_folder, 'index.html')
-        if not os.path.exists(index_path):
+        index = static_files.static_entry('index.html')
+        if index is None:
             frontend_url = os.environ.get('FRONTEND_URL')
             if frontend_url:
                 return redirect(frontend_url, code=302)
             return jsonify({"message": "API running", "docs": "/api/health"}), 200
 
-        static_path = os.path.join(app.static_folder, path)
-        if path and os.path.exists(static_path):
-            return send_from_directory(app.static_folder, path)
-        return send_from_directory(app.static_folder, 'index.html')
+        entry = static_files.static_entry(path) if path else None
+        return static_files.send(entry or index, 'static')
 
     @app.route('/', defaults={'path': ''})
     @app.route('/<path:path>')
@@ -96,15 +144,27 @@ def create_app(config_class=Config):
 
     @app.route('/uploads/<path:filename>')
     def uploaded_file(filename):
-        return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+        entry = static_files.upload_entry(filename)
+        if entry is None:
+            raise NotFound()
+        return static_files.send(entry, 'uploads')
 
     @app.route('/api/health')
     def health():
         return jsonify({"status": "ok"}), 200
+
+    if app.config.get('CACHE_STATS_ENABLED'):
+        @app.route('/api/cache/stats')
+        @jwt_required()
+        def cache_stats():
+            return jsonify(response_cache.stats()), 200
     
     return app
 
-app = create_app()
+# Sous `python -m backend.app`, les processus spawn réimportent ce module comme __mp_main__ :
+# ils ne doivent pas reconstruire l'application (migrations, manifeste, calibrage bcrypt)
+if __name__ != '__mp_main__':
+    app = create_app()
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,111 @@
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from flask.json.provider import DefaultJSONProvider
+
+from backend.json_provider import orjson
+from backend.models import Recette, Utilisateur
+from backend.uploads import image_variants
+
+
+def _legacy_user_dict(user):
+    return {
+        'id': user.id,
+        'nom_utilisateur': user.nom_utilisateur,
+        'date_inscription': user.date_inscription.isoformat(),
+        'avatar': user.avatar_url,
+        'avatar_placeholder': user.avatar_placeholder,
+        'avatar_variantes': image_variants(user.avatar_url, user.avatar_placeholder is not None)
+    }
+
+
+def _legacy_recette_dict(recette):
+    """Sérialisation de Recette.to_dict avant la lecture groupée des colonnes (référence).
+
+    image_variants est la version actuelle : le gain mesuré sur to_dict est une borne basse.
+    """
+    data = {
+        'id': recette.id,
+        'nom': recette.nom,
+        'description': recette.description,
+        'image': recette.image_url,
+        'image_placeholder': recette.image_placeholder,
+        'image_variantes': image_variants(recette.image_url, recette.image_placeholder is not None),
+        'temps_preparation': recette.temps_preparation,
+        'temps_cuisson': recette.temps_cuisson,
+        'est_publique': recette.est_publique,
+        'date_creation': recette.date_creation.isoformat(),
+        'date_modification': recette.date_modification.isoformat() if recette.date_modification else None,
+        'utilisateur_id': recette.utilisateur_id
+    }
+    if recette.auteur:
+        data['auteur'] = _legacy_user_dict(recette.auteur)
+    else:
+        data['auteur'] = None
+    return data
+
+
+def _sample_recettes(count):
+    """Recettes non persistées, toutes colonnes renseignées comme après un chargement en base."""
+    now = datetime(2026, 1, 1, 12, 30, 15, 123456)
+    auteurs = [
+        Utilisateur(
+            id=index, nom_utilisateur=f'cuisinier{index}', email=f'cuisinier{index}@exemple.fr',
+            date_inscription=now, avatar_url=None, avatar_placeholder=None,
+        )
+        for index in range(1, 51)
+    ]
+    recettes = []
+    for index in range(count):
+        # Une recette sur deux a une image locale avec ses dérivés
+        image_url = f'https://api.exemple.fr/uploads/recipes/ab/cd/{index:064x}.jpg' if index % 2 else None
+        recettes.append(Recette(
+            id=index + 1, nom=f'Tarte aux pommes n°{index}', description='Pâte brisée, pommes, crème. ' * 4,
+            image_url=image_url, image_placeholder='data:image/webp;base64,UklGR' if image_url else None,
+            temps_preparation=20, temps_cuisson=35, est_publique=True,
+            date_creation=now - timedelta(minutes=index), date_modification=None if index % 3 else now,
+            utilisateur_id=auteurs[index % len(auteurs)].id, auteur=auteurs[index % len(auteurs)],
+        ))
+    return recettes
+
+
+def _best_of(repeat, function):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+@click.command('benchmark-serialization')
+@click.option('--rows', default=10000, type=int, help="Nombre de recettes sérialisées")
+@click.option('--repeat', default=5, type=int, help="Meilleur temps sur N essais")
+@with_appcontext
+def benchmark_serialization_command(rows, repeat):
+    """Débit de sérialisation JSON de recettes : avant (to_dict champ par champ, json) et après."""
+    recettes = _sample_recettes(rows)
+    legacy_json = DefaultJSONProvider(current_app._get_current_object())
+    provider = current_app.json
+
+    legacy_dicts = [_legacy_recette_dict(recette) for recette in recettes]
+    dicts = [recette.to_dict() for recette in recettes]
+    mesures = [
+        ('to_dict (avant)', lambda: [_legacy_recette_dict(recette) for recette in recettes]),
+        ('to_dict (après)', lambda: [recette.to_dict() for recette in recettes]),
+        ('json (avant)', lambda: legacy_json.dumps({'recettes': legacy_dicts})),
+        (f"json (après, {'orjson' if orjson else 'json'})", lambda: provider.dumps({'recettes': dicts})),
+        ('total (avant)', lambda: legacy_json.dumps({'recettes': [_legacy_recette_dict(r) for r in recettes]})),
+        ('total (après)', lambda: provider.dumps({'recettes': [r.to_dict() for r in recettes]})),
+    ]
+
+    click.echo(f"{rows} recettes, meilleur de {repeat} essais")
+    results = {}
+    for label, function in mesures:
+        elapsed = _best_of(repeat, function)
+        results[label] = elapsed
+        click.echo(f"  {label:<26} {elapsed * 1000:8.1f} ms  {rows / elapsed:12,.0f} lignes/s")
+    click.echo(f"Accélération totale : x{results['total (avant)'] / results['total (après)']:.1f}")
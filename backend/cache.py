@@ -0,0 +1,253 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import wraps
+
+from flask import current_app, make_response, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from backend.conditional import request_version
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 300
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BODY_BYTES = 1024 * 1024
+
+
+class MemoryBackend:
+    """Cache propre au processus : LRU borné à max_entries, expiration par TTL."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+        self._counters = Counter()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value, tags = entry
+            if expires_at < time.monotonic():
+                self._discard(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl, tags=()):
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (time.monotonic() + ttl, value, tuple(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+                self._counters['evictions'] += 1
+
+    def invalidate(self, tag):
+        with self._lock:
+            for key in list(self._tags.get(tag, ())):
+                self._discard(key)
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags[tag]
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+    def incr(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, 'entries': len(self._entries)}
+
+
+class RedisBackend:
+    """Cache partagé entre workers (Redis ou serveur compatible).
+
+    L'éviction LRU est celle du serveur (maxmemory-policy allkeys-lru) ; chaque entrée a un TTL.
+    """
+
+    def __init__(self, url, prefix='recetteo:cache:'):
+        if redis is None:
+            raise RuntimeError("Le paquet redis est requis pour CACHE_URL=redis://")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl, tags=()):
+        pipeline = self.client.pipeline()
+        pipeline.set(self.prefix + key, value, ex=ttl)
+        for tag in tags:
+            tag_key = f"{self.prefix}tag:{tag}"
+            pipeline.sadd(tag_key, self.prefix + key)
+            pipeline.expire(tag_key, ttl)
+        pipeline.execute()
+
+    def invalidate(self, tag):
+        tag_key = f"{self.prefix}tag:{tag}"
+        keys = self.client.smembers(tag_key)
+        self.client.delete(tag_key, *keys)
+
+    def incr(self, counter):
+        self.client.hincrby(f"{self.prefix}stats", counter, 1)
+
+    def stats(self):
+        counters = self.client.hgetall(f"{self.prefix}stats")
+        return {name.decode(): int(value) for name, value in counters.items()}
+
+
+class ResponseCache:
+    """Cache des réponses GET publiques, indexé sur la version des données qu'elles exposent.
+
+    La clé contient la version lue dans versions_donnees : une écriture faite par n'importe quel
+    worker rend les anciennes entrées inaccessibles, même dans un cache local au processus.
+    Les entrées du périmètre modifié sont en plus purgées après chaque commit.
+    """
+
+    def __init__(self):
+        self.backend = None
+
+    def init_app(self, app):
+        url = app.config.get('CACHE_URL', 'memory://')
+        if url in ('', 'none'):
+            self.backend = None
+        elif url.startswith('memory://'):
+            self.backend = MemoryBackend(app.config.get('CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
+        elif url.startswith(('redis://', 'rediss://', 'unix://')):
+            self.backend = RedisBackend(url)
+        else:
+            raise RuntimeError(f"CACHE_URL non pris en charge: {url}")
+        app.extensions['response_cache'] = self
+
+    def cached(self, *scopes, ttl=None):
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if self.backend is None:
+                    return view(*args, **kwargs)
+
+                version, _ = request_version(scopes)
+                key = self._key(scopes, version)
+                try:
+                    hit = self.backend.get(key)
+                except Exception as exc:
+                    logger.warning("Cache indisponible: %s", exc)
+                    return view(*args, **kwargs)
+
+                if hit is not None:
+                    self._incr('hits')
+                    mimetype, _, body = hit.partition(b'\n')
+                    response = make_response(body, 200)
+                    response.mimetype = mimetype.decode()
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                self._incr('misses')
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200:
+                    self._store(response, key, scopes, ttl or current_app.config.get('CACHE_DEFAULT_TTL', DEFAULT_TTL))
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+    def _key(self, scopes, version):
+        parts = [request.full_path, request.headers.get('Accept', ''), version]
+        digest = hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+        return f"{'+'.join(scopes)}:{digest}"
+
+    def _store(self, response, key, scopes, ttl):
+        backend = self.backend
+        max_bytes = current_app.config.get('CACHE_MAX_BODY_BYTES', DEFAULT_MAX_BODY_BYTES)
+        header = response.mimetype.encode() + b'\n'
+
+        def save(body):
+            try:
+                backend.set(key, header + body, ttl, scopes)
+            except Exception as exc:
+                logger.warning("Écriture cache impossible: %s", exc)
+
+        if not response.is_streamed:
+            body = response.get_data()
+            if len(body) <= max_bytes:
+                save(body)
+            return
+
+        # Réponse diffusée : les paquets sont transmis au client et copiés au passage,
+        # la copie n'est conservée que si le corps complet tient dans max_bytes
+        def tee(chunks):
+            parts, size = [], 0
+            for chunk in chunks:
+                yield chunk
+                if parts is not None:
+                    size += len(chunk)
+                    if size <= max_bytes:
+                        parts.append(chunk)
+                    else:
+                        parts = None
+            if parts is not None:
+                save(b''.join(parts))
+
+        response.response = tee(response.iter_encoded())
+
+    def _incr(self, counter):
+        try:
+            self.backend.incr(counter)
+        except Exception as exc:
+            logger.warning("Compteur cache indisponible: %s", exc)
+
+    def invalidate(self, scopes):
+        if self.backend is None:
+            return
+        for scope in scopes:
+            try:
+                self.backend.invalidate(scope)
+            except Exception as exc:
+                logger.warning("Invalidation cache impossible (%s): %s", scope, exc)
+
+    def stats(self):
+        if self.backend is None:
+            return {'active': False}
+        counters = self.backend.stats()
+        lookups = counters.get('hits', 0) + counters.get('misses', 0)
+        return {
+            'active': True,
+            'backend': type(self.backend).__name__,
+            **counters,
+            'hit_ratio': round(counters.get('hits', 0) / lookups, 4) if lookups else None,
+        }
+
+
+response_cache = ResponseCache()
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    scopes = session.info.pop('portees_modifiees', None)
+    if scopes:
+        response_cache.invalidate(scopes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session):
+    session.info.pop('portees_modifiees', None)
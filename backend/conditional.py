@@ -0,0 +1,74 @@
+import hashlib
+import hmac
+from datetime import timezone
+from functools import wraps
+
+from flask import current_app, g, make_response, request
+from flask_jwt_extended import get_jwt_identity
+
+from backend.models import VersionDonnees
+from backend.negotiation import msgpack, negotiated_msgpack
+
+
+def request_version(scopes):
+    """VersionDonnees.current(scopes), lue une seule fois par requête (ETag et cache de réponses)."""
+    versions = g.setdefault('versions_donnees', {})
+    if scopes not in versions:
+        versions[scopes] = VersionDonnees.current(scopes)
+    return versions[scopes]
+
+
+def _make_etag(version, per_user):
+    parts = [request.full_path, version]
+    if per_user:
+        parts.append(str(get_jwt_identity()))
+    # Une représentation MessagePack a son propre ETag (celui du JSON reste inchangé)
+    mimetype = negotiated_msgpack()
+    if mimetype:
+        parts.append(mimetype)
+    # Clé secrète : un ETag ne peut pas être deviné pour une ressource jamais reçue
+    secret = current_app.config['SECRET_KEY'].encode('utf-8')
+    return hmac.new(secret, '|'.join(parts).encode('utf-8'), hashlib.sha256).hexdigest()[:32]
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified:
+        return request.if_modified_since >= last_modified.replace(microsecond=0)
+    return False
+
+
+def conditional_get(*scopes, per_user=False):
+    """Gère If-None-Match / If-Modified-Since à partir des compteurs de VersionDonnees.
+
+    La version est lue avant d'appeler la vue : un 304 ne charge ni ne sérialise aucune ligne.
+    Avec per_user=True (routes sous @jwt_required), l'ETag dépend aussi de l'utilisateur.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            version, last_modified = request_version(scopes)
+            etag = _make_etag(version, per_user)
+            if last_modified:
+                last_modified = last_modified.replace(tzinfo=timezone.utc)
+
+            if _not_modified(etag, last_modified):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag, weak=True)
+            if last_modified:
+                response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            if msgpack is not None:
+                response.vary.add('Accept')
+            if per_user:
+                response.cache_control.private = True
+                response.vary.add('Authorization')
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,146 @@
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+from sqlalchemy import select
+
+from backend.indexing import VersionedIndex
+from backend.models import db, Recette, RecetteIngredient
+
+RECIPE_SCOPE = 'composition_recettes'
+# Tolérance sur les quantités : FLOAT (MySQL) est en simple précision
+QUANTITY_TOLERANCE = 1e-6
+REBUILD_BATCH_SIZE = 5000
+
+
+class _Posting:
+    """Recettes utilisant un ingrédient, triées par quantité requise.
+
+    Les recettes réalisables avec un stock donné forment un préfixe, trouvé par bisection.
+    """
+
+    __slots__ = ('quantities', 'recette_ids')
+
+    def __init__(self):
+        self.quantities = []
+        self.recette_ids = []
+
+    def add(self, quantite, recette_id):
+        position = bisect_right(self.quantities, quantite)
+        self.quantities.insert(position, quantite)
+        self.recette_ids.insert(position, recette_id)
+
+    def remove(self, quantite, recette_id):
+        position = bisect_left(self.quantities, quantite)
+        while self.recette_ids[position] != recette_id:
+            position += 1
+        del self.quantities[position]
+        del self.recette_ids[position]
+
+    def satisfied_by(self, disponible):
+        return self.recette_ids[:bisect_right(self.quantities, disponible * (1 + QUANTITY_TOLERANCE))]
+
+
+class RecipeIndex(VersionedIndex):
+    """Index inversé ingrédient -> recettes pour le classement des recettes cuisinables."""
+
+    scope = RECIPE_SCOPE
+
+    def __init__(self):
+        super().__init__()
+        self.recipes = {}
+        self.postings = {}
+        self.sizes = {}
+
+    def _clear(self):
+        self.recipes = {}
+        self.postings = {}
+        self.sizes = {}
+
+    def _add_recipe(self, recette_id, utilisateur_id, est_publique, ingredients):
+        self.recipes[recette_id] = (utilisateur_id, est_publique, ingredients)
+        self.sizes.setdefault(len(ingredients), set()).add(recette_id)
+        for ingredient_id, quantite in ingredients.items():
+            self.postings.setdefault(ingredient_id, _Posting()).add(quantite, recette_id)
+
+    def _remove(self, recette_id):
+        entry = self.recipes.pop(recette_id, None)
+        if entry is None:
+            return
+        ingredients = entry[2]
+        self.sizes[len(ingredients)].discard(recette_id)
+        for ingredient_id, quantite in ingredients.items():
+            self.postings[ingredient_id].remove(quantite, recette_id)
+
+    def _load(self, recette_ids=None):
+        """Lit recettes et lignes en une requête (jointure externe pour les recettes sans ingrédient)."""
+        statement = (
+            select(
+                Recette.id,
+                Recette.utilisateur_id,
+                Recette.est_publique,
+                RecetteIngredient.ingredient_id,
+                RecetteIngredient.quantite,
+            )
+            .outerjoin(RecetteIngredient, RecetteIngredient.recette_id == Recette.id)
+            .order_by(Recette.id)
+        )
+        if recette_ids is not None:
+            statement = statement.where(Recette.id.in_(recette_ids))
+
+        result = db.session.execute(statement.execution_options(yield_per=REBUILD_BATCH_SIZE))
+        current_id, current = None, None
+        for recette_id, utilisateur_id, est_publique, ingredient_id, quantite in result:
+            if recette_id != current_id:
+                if current is not None:
+                    self._add_recipe(current_id, *current)
+                current_id, current = recette_id, (utilisateur_id, est_publique, {})
+            if ingredient_id is not None:
+                current[2][ingredient_id] = quantite
+        if current is not None:
+            self._add_recipe(current_id, *current)
+
+    def rank(self, stock, utilisateur_id, max_missing=2, limit=50):
+        """Classe les recettes visibles (les siennes et les publiques) selon les ingrédients manquants.
+
+        stock : {ingredient_id: quantité disponible}. Retourne [(recette_id, manquants, total)]
+        triés par nombre d'ingrédients manquants puis par couverture décroissante.
+        """
+        with self._lock:
+            satisfied = Counter()
+            for ingredient_id, disponible in stock.items():
+                posting = self.postings.get(ingredient_id)
+                if posting is not None:
+                    satisfied.update(posting.satisfied_by(disponible))
+
+            candidates = []
+            for recette_id, count in satisfied.items():
+                owner, public, ingredients = self.recipes[recette_id]
+                missing = len(ingredients) - count
+                if missing <= max_missing and (public or owner == utilisateur_id):
+                    candidates.append((recette_id, missing, len(ingredients)))
+
+            # Recettes n'utilisant aucun ingrédient du stock mais assez courtes pour rester candidates
+            for size in range(max_missing + 1):
+                for recette_id in self.sizes.get(size, ()):
+                    if recette_id in satisfied:
+                        continue
+                    owner, public, _ = self.recipes[recette_id]
+                    if public or owner == utilisateur_id:
+                        candidates.append((recette_id, size, size))
+
+        candidates.sort(key=lambda item: (item[1], -(item[2] - item[1]) / (item[2] or 1), item[0]))
+        return candidates[:limit]
+
+    def missing_ingredients(self, recette_id, stock):
+        with self._lock:
+            entry = self.recipes.get(recette_id)
+        if entry is None:
+            return []
+        return sorted(
+            ingredient_id
+            for ingredient_id, quantite in entry[2].items()
+            if stock.get(ingredient_id, 0) * (1 + QUANTITY_TOLERANCE) < quantite
+        )
+
+
+recipe_index = RecipeIndex()
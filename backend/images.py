@@ -0,0 +1,192 @@
+import base64
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from backend.models import db
+from backend.uploads import IMAGE_VARIANTS, derivative_path, derivative_paths, local_upload_path
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow est optionnel : sans lui, seules les images d'origine sont servies
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_SIZE = 16
+PLACEHOLDER_QUALITY = 40
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+# Un PNG de quelques Mo peut se décompresser en plusieurs Go : au-delà de 40 mégapixels, l'image
+# n'est pas décodée. Vérifié explicitement : Pillow ne lève DecompressionBombError qu'au double de
+# son propre seuil (global au processus) et se contente d'un avertissement en dessous.
+MAX_IMAGE_PIXELS = 40_000_000
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+def _save_atomic(image, path, fmt, **options):
+    # Fichier temporaire puis renommage : un dérivé à moitié écrit n'est jamais servi. Le nom est
+    # propre au thread car deux uploads du même contenu produisent les mêmes dérivés.
+    temporary = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    image.save(temporary, fmt, **options)
+    os.replace(temporary, path)
+
+
+def _flatten(image):
+    if image.mode != 'RGBA':
+        return image
+    background = Image.new('RGBA', image.size, (255, 255, 255, 255))
+    return Image.alpha_composite(background, image).convert('RGB')
+
+
+def render_derivatives(data, destination=None):
+    """Produit les dérivés à côté de destination (si fournie) et retourne (placeholder, fichiers écrits).
+
+    L'original n'est décodé qu'une fois (un JPEG directement à échelle réduite grâce à draft),
+    puis les tailles sont produites de la plus grande à la plus petite, chacune à partir de la
+    précédente.
+    Le placeholder est une data URI WebP de PLACEHOLDER_SIZE pixels, à afficher floutée.
+    """
+    largest = IMAGE_VARIANTS[-1][1]
+    written = []
+    with Image.open(io.BytesIO(data)) as source:
+        # Image.open ne lit que l'en-tête : les dimensions sont connues avant tout décodage
+        width, height = source.size
+        if width * height > MAX_IMAGE_PIXELS:
+            raise ImageTooLarge(f"Image trop grande ({width}x{height} pixels)")
+        source.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(source)
+        has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    try:
+        for variant, size in reversed(IMAGE_VARIANTS):
+            image.thumbnail((size, size), Image.Resampling.LANCZOS, reducing_gap=3.0)
+            if destination is None:
+                continue
+            webp_path = derivative_path(destination, variant, 'webp')
+            _save_atomic(image, webp_path, 'WEBP', quality=WEBP_QUALITY, method=4)
+            written.append(webp_path)
+            jpg_path = derivative_path(destination, variant, 'jpg')
+            _save_atomic(_flatten(image), jpg_path, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+            written.append(jpg_path)
+    except Exception:
+        _remove_files(written)
+        raise
+
+    image.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.Resampling.BILINEAR)
+    buffer = io.BytesIO()
+    _flatten(image).save(buffer, 'WEBP', quality=PLACEHOLDER_QUALITY)
+    placeholder = "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode('ascii')
+    return placeholder, written
+
+
+def _remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class ImagePipeline:
+    """Production des dérivés d'image (tailles WebP/JPEG et placeholder) hors de la requête d'upload.
+
+    Pillow relâche le GIL pendant le décodage, le redimensionnement et l'encodage : un pool de
+    threads suffit et le callback peut écrire en base dans un contexte d'application. Au-delà de
+    max_pending images en attente, les nouvelles sont ignorées (l'original reste servi).
+    Avec workers=0, le traitement a lieu dans la requête (développement, tests).
+    """
+
+    def __init__(self):
+        self.workers = 0
+        self._executor = None
+        self._pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.workers = app.config.get('IMAGE_WORKERS', 0)
+        self._slots = threading.BoundedSemaphore(
+            app.config.get('IMAGE_MAX_PENDING') or max(self.workers, 1) * 16
+        )
+        if Image is None:
+            logger.warning("Pillow absent : les dérivés d'image ne seront pas produits")
+        app.extensions['image_pipeline'] = self
+
+    def _pool(self):
+        with self._lock:
+            # Les threads du pool ne survivent pas à un fork (gunicorn --preload)
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='images')
+                self._pid = os.getpid()
+            return self._executor
+
+    def submit(self, file_storage, file_url, on_done):
+        """Planifie les dérivés de l'image envoyée, enregistrée sous file_url.
+
+        on_done(placeholder) est appelé dans un contexte d'application. Les dérivés déjà produits
+        pour le même contenu (fichier partagé) sont réutilisés ; ceux écrits alors que le fichier
+        d'origine a été supprimé entre-temps sont effacés.
+        """
+        if Image is None:
+            return
+        file_storage.stream.seek(0)
+        data = file_storage.stream.read()
+        self._schedule(lambda: data, file_url, on_done)
+
+    def submit_file(self, path, file_url, on_done):
+        """Comme submit pour une image déjà sur disque (envoi direct) : lue par le worker."""
+        if Image is None:
+            return
+
+        def load():
+            with open(path, 'rb') as file:
+                return file.read()
+
+        self._schedule(load, file_url, on_done)
+
+    def _schedule(self, load, file_url, on_done):
+        destination = local_upload_path(file_url, current_app.config['UPLOAD_FOLDER'])
+        if destination and all(os.path.isfile(path) for path in derivative_paths(destination)):
+            destination = None
+        app = current_app._get_current_object()
+        if not self.workers:
+            self._process(app, load, destination, on_done)
+            return
+        if not self._slots.acquire(blocking=False):
+            logger.warning("File des traitements d'image pleine, dérivés ignorés pour %s", file_url)
+            return
+        try:
+            future = self._pool().submit(self._process, app, load, destination, on_done)
+        except Exception as exc:
+            # L'image est déjà enregistrée : sans dérivés, l'original reste servi
+            self._slots.release()
+            logger.error("Planification des dérivés impossible pour %s: %s", file_url, exc)
+            return
+        future.add_done_callback(lambda _: self._slots.release())
+
+    def _process(self, app, load, destination, on_done):
+        try:
+            placeholder, written = render_derivatives(load(), destination)
+        except Exception as exc:
+            logger.error("Traitement de l'image impossible: %s", exc)
+            return
+        with app.app_context():
+            try:
+                on_done(placeholder)
+            except Exception as exc:
+                db.session.rollback()
+                logger.error("Enregistrement du placeholder impossible: %s", exc)
+        if destination and not os.path.exists(destination):
+            _remove_files(written)
+
+
+image_pipeline = ImagePipeline()
@@ -0,0 +1,221 @@
+import uuid
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import inspect, insert, select, text
+
+from backend.models import (
+    db,
+    Utilisateur,
+    Recette,
+    Ingredient,
+    RecetteIngredient,
+    Inventaire,
+    InventaireIngredient,
+    ShoppingList,
+    ShoppingListItem,
+    RefreshToken,
+    RevokedToken,
+    UploadJob,
+)
+
+
+def _access_patterns(ids):
+    """Requêtes réellement émises par les routes, avec des identifiants du jeu de données."""
+    return [
+        ("recettes d'un utilisateur", select(Recette).where(Recette.utilisateur_id == ids['utilisateur'])
+            .order_by(Recette.date_creation.desc(), Recette.id.desc()).limit(20)),
+        ("fil public", select(Recette).where(Recette.est_publique.is_(True))
+            .order_by(Recette.date_creation.desc(), Recette.id.desc()).limit(20)),
+        ("ingrédients d'une recette", select(RecetteIngredient)
+            .where(RecetteIngredient.recette_id == ids['recette'])),
+        ("recettes utilisant un ingrédient", select(RecetteIngredient)
+            .where(RecetteIngredient.ingredient_id == ids['ingredient'])),
+        ("inventaires d'un utilisateur", select(Inventaire).where(Inventaire.utilisateur_id == ids['utilisateur'])
+            .order_by(Inventaire.date_creation.desc(), Inventaire.id.desc())),
+        ("ligne d'inventaire", select(InventaireIngredient).where(
+            InventaireIngredient.inventaire_id == ids['inventaire'],
+            InventaireIngredient.ingredient_id == ids['ingredient'])),
+        ("listes d'un utilisateur", select(ShoppingList).where(ShoppingList.utilisateur_id == ids['utilisateur'])
+            .order_by(ShoppingList.date_creation.desc(), ShoppingList.id.desc())),
+        ("article de liste", select(ShoppingListItem).where(
+            ShoppingListItem.liste_id == ids['liste'],
+            ShoppingListItem.ingredient_id == ids['ingredient'])),
+        ("ingrédient par nom", select(Ingredient).where(Ingredient.nom == 'tomate')),
+        ("utilisateur par email", select(Utilisateur).where(Utilisateur.email == 'a@b.fr')),
+        ("famille de jetons", select(RefreshToken).where(RefreshToken.famille == 'f')),
+        ("jetons expirés", select(RefreshToken.jti).where(RefreshToken.expire_le < datetime(2000, 1, 1))),
+        ("révocations actives", select(RevokedToken.cle).where(RevokedToken.expire_le >= datetime(2000, 1, 1))),
+        ("uploads échus", select(UploadJob.id).where(UploadJob.prochain_essai <= datetime(2000, 1, 1))
+            .order_by(UploadJob.prochain_essai).limit(10)),
+    ]
+
+
+def missing_indexes(connection):
+    """Index et contraintes uniques déclarés dans les modèles mais absents de la base."""
+    inspector = inspect(connection)
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            missing.append((table.name, '(table absente)'))
+            continue
+        existing = {tuple(index['column_names']) for index in inspector.get_indexes(table.name)}
+        existing |= {tuple(uc['column_names']) for uc in inspector.get_unique_constraints(table.name)}
+        existing.add(tuple(inspector.get_pk_constraint(table.name)['constrained_columns']))
+
+        expected = {tuple(column.name for column in index.columns) for index in table.indexes}
+        expected |= {
+            tuple(column.name for column in constraint.columns)
+            for constraint in table.constraints
+            if isinstance(constraint, db.UniqueConstraint)
+        }
+        expected |= {(column.name,) for column in table.columns if column.unique}
+        for columns in sorted(expected - existing):
+            missing.append((table.name, ', '.join(columns)))
+    return missing
+
+
+def _seed(connection, size):
+    """Insère un jeu de données synthétique (annulé en fin de vérification) pour que l'optimiseur
+    travaille sur des volumes réalistes plutôt que sur des tables vides."""
+    tag = uuid.uuid4().hex[:8]
+    now = datetime.utcnow()
+    nb_users = max(size // 50, 1)
+    nb_ingredients = max(size // 4, 1)
+
+    connection.execute(insert(Utilisateur.__table__), [
+        {'nom_utilisateur': f'seed-{tag}-{i}', 'email': f'seed-{tag}-{i}@example.com',
+         'mot_de_passe': 'x', 'date_inscription': now}
+        for i in range(nb_users)
+    ])
+    users = connection.execute(
+        select(Utilisateur.id).where(Utilisateur.nom_utilisateur.like(f'seed-{tag}-%'))
+    ).scalars().all()
+
+    connection.execute(insert(Ingredient.__table__), [
+        {'nom': f'seed-{tag}-{i}', 'unite': 'g', 'prix_unitaire': 1.0, 'date_ajout': now}
+        for i in range(nb_ingredients)
+    ])
+    ingredients = connection.execute(
+        select(Ingredient.id).where(Ingredient.nom.like(f'seed-{tag}-%'))
+    ).scalars().all()
+
+    connection.execute(insert(Recette.__table__), [
+        {'nom': f'seed-{tag}-{i}', 'description': 'seed', 'temps_preparation': 10, 'temps_cuisson': 10,
+         'est_publique': i % 5 == 0, 'date_creation': now - timedelta(minutes=i),
+         'utilisateur_id': users[i % len(users)]}
+        for i in range(size)
+    ])
+    recettes = connection.execute(
+        select(Recette.id).where(Recette.nom.like(f'seed-{tag}-%'))
+    ).scalars().all()
+    connection.execute(insert(RecetteIngredient.__table__), [
+        {'recette_id': recette_id, 'ingredient_id': ingredients[(recette_id + offset) % len(ingredients)],
+         'quantite': 1.0}
+        for recette_id in recettes
+        for offset in range(min(5, len(ingredients)))
+    ])
+
+    connection.execute(insert(Inventaire.__table__), [
+        {'nom': f'seed-{tag}', 'date_creation': now, 'utilisateur_id': user_id} for user_id in users
+    ])
+    inventaires = connection.execute(
+        select(Inventaire.id).where(Inventaire.nom == f'seed-{tag}')
+    ).scalars().all()
+    connection.execute(insert(InventaireIngredient.__table__), [
+        {'inventaire_id': inventaire_id, 'ingredient_id': ingredient_id, 'quantite_disponible': 1.0}
+        for inventaire_id in inventaires
+        for ingredient_id in ingredients[:20]
+    ])
+
+    connection.execute(insert(ShoppingList.__table__), [
+        {'utilisateur_id': user_id, 'date_creation': now} for user_id in users
+    ])
+    listes = connection.execute(
+        select(ShoppingList.id).where(ShoppingList.utilisateur_id.in_(users))
+    ).scalars().all()
+    connection.execute(insert(ShoppingListItem.__table__), [
+        {'liste_id': liste_id, 'ingredient_id': ingredient_id, 'quantite': 1.0, 'est_achete': False,
+         'date_ajout': now}
+        for liste_id in listes
+        for ingredient_id in ingredients[:20]
+    ])
+
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text('ANALYZE'))
+
+    return {
+        'utilisateur': users[0],
+        'recette': recettes[0],
+        'ingredient': ingredients[0],
+        'inventaire': inventaires[0],
+        'liste': listes[0],
+    }
+
+
+def _plan_problems(connection, statement):
+    sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True}))
+    dialect = connection.dialect.name
+
+    if dialect == 'sqlite':
+        problems = []
+        for row in connection.execute(text(f'EXPLAIN QUERY PLAN {sql}')):
+            detail = row[-1]
+            if detail.startswith('SCAN ') and 'USING' not in detail:
+                problems.append(detail)
+            elif 'TEMP B-TREE' in detail:
+                problems.append(detail)
+        return problems
+
+    if dialect in ('mysql', 'mariadb'):
+        problems = []
+        for row in connection.execute(text(f'EXPLAIN {sql}')).mappings():
+            if row['type'] == 'ALL':
+                problems.append(f"full scan sur {row['table']}")
+            if row['Extra'] and 'filesort' in row['Extra']:
+                problems.append(f"filesort sur {row['table']}")
+        return problems
+
+    return None
+
+
+def check_indexes(seed_size=0):
+    """Retourne (index manquants, [(requête, problèmes du plan)]). Rien n'est conservé en base."""
+    with db.engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            missing = missing_indexes(connection)
+            ids = _seed(connection, seed_size) if seed_size else dict.fromkeys(
+                ('utilisateur', 'recette', 'ingredient', 'inventaire', 'liste'), 1
+            )
+            plans = [(label, _plan_problems(connection, statement)) for label, statement in _access_patterns(ids)]
+        finally:
+            transaction.rollback()
+    return missing, plans
+
+
+@click.command('check-indexes')
+@click.option('--seed', 'seed_size', default=0, type=int,
+              help="Nombre de recettes synthétiques à insérer (annulées ensuite) avant l'analyse des plans.")
+@with_appcontext
+def check_indexes_command(seed_size):
+    """Signale les index manquants et les requêtes des routes qui parcourent une table entière."""
+    missing, plans = check_indexes(seed_size)
+    failed = False
+
+    for table, columns in missing:
+        failed = True
+        click.echo(f"MANQUANT  {table} ({columns})")
+
+    for label, problems in plans:
+        if problems is None:
+            click.echo(f"IGNORE    {label} : EXPLAIN non pris en charge pour ce dialecte")
+        elif problems:
+            failed = True
+            click.echo(f"SCAN      {label} : {'; '.join(problems)}")
+        else:
+            click.echo(f"OK        {label}")
+
+    if failed:
+        raise SystemExit(1)
@@ -0,0 +1,147 @@
+import abc
+import logging
+import threading
+
+from flask import current_app
+
+from backend.models import db, VersionDonnees
+
+logger = logging.getLogger(__name__)
+
+_registry = []
+
+
+class VersionedIndex(abc.ABC):
+    """Index en mémoire du processus, synchronisé sur un compteur de VersionDonnees.
+
+    L'index retient la version du périmètre qu'il reflète. Une écriture faite par ce processus est
+    appliquée de façon incrémentale ; si un autre worker a écrit entre-temps, l'index continue de
+    servir son état courant pendant qu'un thread en construit une copie neuve, échangée une fois
+    prête. Seule la toute première construction bloque les lectures.
+
+    Les sous-classes définissent scope, _clear(), _load(ids=None) et _remove(id). topic est le
+    périmètre passé à notify_write par les routes, s'il diffère de scope.
+    """
+
+    scope = None
+    topic = None
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        # None : version inconnue ou dépassée, une reconstruction est à lancer
+        self.version = None
+        self.ready = False
+        self._rebuilding = False
+        # Éléments écrits par ce processus pendant une reconstruction, à recharger après l'échange
+        self._written = set()
+        _registry.append(self)
+
+    def _database_version(self):
+        token, _ = VersionDonnees.current((self.scope,))
+        return int(token)
+
+    @abc.abstractmethod
+    def _clear(self):
+        """Vide l'état de l'index."""
+
+    @abc.abstractmethod
+    def _load(self, ids=None):
+        """Charge depuis la base les éléments ids (tous si None)."""
+
+    @abc.abstractmethod
+    def _remove(self, item_id):
+        """Retire un élément de l'index, s'il y figure."""
+
+    def _build(self):
+        """Construit un nouvel état hors verrou ; retourne (version, attributs de l'index)."""
+        version = self._database_version()
+        shadow = object.__new__(type(self))
+        shadow._clear()
+        shadow._load()
+        return version, vars(shadow)
+
+    def _swap(self, version, state):
+        with self._lock:
+            self.__dict__.update(state)
+            written, self._written = self._written, set()
+            if written:
+                for item_id in written:
+                    self._remove(item_id)
+                self._load(written)
+            self.version = version
+            self.ready = True
+            self._rebuilding = False
+
+    def _rebuild_locked(self):
+        with self._lock:
+            self._rebuilding = True
+            self._written = set()
+        try:
+            version, state = self._build()
+        except Exception:
+            with self._lock:
+                self._rebuilding = False
+            raise
+        self._swap(version, state)
+
+    def rebuild(self):
+        with self._build_lock:
+            self._rebuild_locked()
+
+    def _rebuild_in_background(self, app):
+        with app.app_context():
+            try:
+                self.rebuild()
+            except Exception as exc:
+                logger.error("Erreur reconstruction index %s: %s", type(self).__name__, exc)
+            finally:
+                db.session.remove()
+
+    def _schedule_rebuild(self):
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        app = current_app._get_current_object()
+        threading.Thread(target=self._rebuild_in_background, args=(app,), daemon=True).start()
+
+    def ensure_fresh(self):
+        if not self.ready:
+            # Premier accès : rien à servir, les lectures attendent la construction
+            with self._build_lock:
+                if not self.ready:
+                    self._rebuild_locked()
+            return
+        if self.version is None or self.version != self._database_version():
+            self._schedule_rebuild()
+
+    def apply_write(self, item_ids, bumped):
+        with self._lock:
+            if not self.ready:
+                return
+            if self._rebuilding:
+                self._written.update(item_ids)
+            try:
+                version = self._database_version()
+                for item_id in item_ids:
+                    self._remove(item_id)
+                self._load(item_ids)
+                if self.version is None or version != self.version + bumped:
+                    # Écriture concurrente d'un autre processus : reconstruction à la prochaine lecture
+                    version = None
+                self.version = version
+            except Exception as exc:
+                # L'écriture est déjà validée : on n'échoue pas la requête, l'index sera reconstruit
+                logger.error("Erreur mise à jour index %s: %s", type(self).__name__, exc)
+                self.version = None
+
+
+def notify_write(topic, item_ids):
+    """À appeler après le commit d'une écriture du périmètre topic faite dans la requête courante."""
+    bumped = db.session.info.get('versions_incrementees', {})
+    indexes = [index for index in _registry if (index.topic or index.scope) == topic]
+    for index in indexes:
+        index.apply_write(item_ids, bumped.get(index.scope, 0))
+    for index in indexes:
+        bumped.pop(index.scope, None)
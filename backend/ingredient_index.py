@@ -0,0 +1,158 @@
+import math
+from bisect import bisect_left, insort
+from collections import Counter
+
+from sqlalchemy import select
+
+from backend.indexing import VersionedIndex
+from backend.models import db, Ingredient
+from backend.text import TOKEN_RE, fold
+
+INGREDIENT_SCOPE = 'ingredients'
+# Part minimale des trigrammes de la saisie retrouvés dans le nom pour une correspondance approchée
+MIN_FUZZY_SCORE = 0.4
+# En deçà, une saisie est encore un préfixe en cours de frappe : pas de correspondance approchée
+MIN_FUZZY_LENGTH = 5
+# Similarité (Dice sur les trigrammes) au-delà de laquelle deux noms sont considérés comme doublons
+DUPLICATE_SIMILARITY = 0.7
+MAX_PREFIX_SCAN = 200
+
+
+def trigrams(words):
+    """Trigrammes de chaque mot, bornés comme pg_trgm : "tomate" -> "  t", " to", ..., "te "."""
+    grams = set()
+    for word in words:
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class IngredientIndex(VersionedIndex):
+    """Autocomplétion du catalogue : préfixes triés (par bisection) et trigrammes pour les fautes de frappe."""
+
+    scope = INGREDIENT_SCOPE
+
+    def __init__(self):
+        super().__init__()
+        self.entries = {}
+        self.keys = []
+        self.postings = {}
+
+    def _clear(self):
+        self.entries = {}
+        self.keys = []
+        self.postings = {}
+
+    def _add(self, ingredient_id, nom, unite, sort_keys=True):
+        words = TOKEN_RE.findall(fold(nom))
+        key = ' '.join(words)
+        grams = trigrams(words)
+        self.entries[ingredient_id] = (nom, unite, key, grams)
+        # Un préfixe peut viser le nom entier ou n'importe quel mot ("cerise" -> "tomate cerise")
+        for position in range(len(words)):
+            entry = (' '.join(words[position:]), ingredient_id)
+            if sort_keys:
+                insort(self.keys, entry)
+            else:
+                self.keys.append(entry)
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(ingredient_id)
+
+    def _remove(self, ingredient_id):
+        entry = self.entries.pop(ingredient_id, None)
+        if entry is None:
+            return
+        words = entry[2].split()
+        for position in range(len(words)):
+            index = bisect_left(self.keys, (' '.join(words[position:]), ingredient_id))
+            del self.keys[index]
+        for gram in entry[3]:
+            posting = self.postings[gram]
+            posting.discard(ingredient_id)
+            if not posting:
+                del self.postings[gram]
+
+    def _load(self, ingredient_ids=None):
+        statement = select(Ingredient.id, Ingredient.nom, Ingredient.unite)
+        if ingredient_ids is not None:
+            statement = statement.where(Ingredient.id.in_(ingredient_ids))
+        full = ingredient_ids is None
+        for row in db.session.execute(statement):
+            self._add(*row, sort_keys=not full)
+        if full:
+            self.keys.sort()
+
+    def _prefix_matches(self, key):
+        matches = {}
+        position = bisect_left(self.keys, (key,))
+        while position < len(self.keys) and len(matches) < MAX_PREFIX_SCAN:
+            candidate, ingredient_id = self.keys[position]
+            if not candidate.startswith(key):
+                break
+            whole_name = self.entries[ingredient_id][2].startswith(key)
+            matches[ingredient_id] = matches.get(ingredient_id, False) or whole_name
+            position += 1
+        return matches
+
+    def _trigram_overlap(self, grams):
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+        return shared
+
+    def suggest(self, query, limit=10):
+        """Retourne [(id, nom, unite)] : correspondances par préfixe, puis approchées (trigrammes)."""
+        words = TOKEN_RE.findall(fold(query))
+        if not words:
+            return []
+        key = ' '.join(words)
+
+        with self._lock:
+            prefix = self._prefix_matches(key)
+            # Nom commençant par la saisie, puis mot intérieur ; à égalité, le nom le plus court
+            ranked = sorted(
+                prefix,
+                key=lambda ingredient_id: (not prefix[ingredient_id], len(self.entries[ingredient_id][2]),
+                                           self.entries[ingredient_id][2]),
+            )
+
+            if len(ranked) < limit and len(key) >= MIN_FUZZY_LENGTH:
+                grams = trigrams(words)
+                # Un nom partageant au moins `needed` trigrammes contient forcément l'un des
+                # len(grams) - needed + 1 plus rares : seuls ces candidats sont comparés
+                needed = math.ceil(MIN_FUZZY_SCORE * len(grams))
+                rarest = sorted(grams, key=lambda gram: len(self.postings.get(gram, ())))
+                candidates = set().union(*(self.postings.get(gram, ()) for gram in rarest[:len(grams) - needed + 1]))
+                fuzzy = []
+                for ingredient_id in candidates - prefix.keys():
+                    score = len(grams & self.entries[ingredient_id][3]) / len(grams)
+                    if score >= MIN_FUZZY_SCORE:
+                        fuzzy.append((score, ingredient_id))
+                fuzzy.sort(key=lambda item: (-item[0], len(self.entries[item[1]][2]), self.entries[item[1]][2]))
+                ranked.extend(ingredient_id for _, ingredient_id in fuzzy)
+
+            return [(ingredient_id, *self.entries[ingredient_id][:2]) for ingredient_id in ranked[:limit]]
+
+    def near_duplicates(self, nom, exclude_id=None, limit=5):
+        """Noms proches de nom : [(id, nom, similarité)], 1.0 pour un nom identique à la casse et aux accents près."""
+        words = TOKEN_RE.findall(fold(nom))
+        key = ' '.join(words)
+        grams = trigrams(words)
+        if not grams:
+            return []
+
+        with self._lock:
+            duplicates = []
+            for ingredient_id, count in self._trigram_overlap(grams).items():
+                if ingredient_id == exclude_id:
+                    continue
+                other_nom, _, other_key, other_grams = self.entries[ingredient_id]
+                similarity = 1.0 if other_key == key else 2 * count / (len(grams) + len(other_grams))
+                if similarity >= DUPLICATE_SIMILARITY:
+                    duplicates.append((ingredient_id, other_nom, round(similarity, 3)))
+
+        duplicates.sort(key=lambda item: (-item[2], item[0]))
+        return duplicates[:limit]
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,76 @@
+import dataclasses
+import decimal
+import uuid
+from datetime import date
+
+from flask.json.provider import DefaultJSONProvider
+
+from backend.negotiation import msgpack, negotiated_msgpack, packb
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dépendance optionnelle (sérialisation rapide)
+    orjson = None
+
+
+def _default(obj):
+    """Types non natifs : dates en ISO 8601 (comme orjson, au lieu du format HTTP de Flask)."""
+    if isinstance(obj, date):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Sérialisation des réponses de l'application : orjson quand il est installé, json sinon,
+    ou MessagePack (même schéma) pour les clients qui le demandent.
+
+    Les modèles renvoient leurs dates telles quelles : orjson les écrit en C au format ISO 8601,
+    le repli json produit le même texte via default. Les flottants non finis (NaN, inf) deviennent
+    null avec orjson. Le corps est écrit directement en octets UTF-8, sans passer par str.
+    """
+
+    default = staticmethod(_default)
+
+    def _options(self, sort_keys, indent):
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None:
+            return super().dumps(obj, **kwargs)
+        option = self._options(kwargs.get('sort_keys', self.sort_keys), kwargs.get('indent'))
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        """Corps de jsonify : MessagePack si le client le préfère (Accept), JSON sinon."""
+        mimetype = negotiated_msgpack()
+        if mimetype is not None:
+            obj = self._prepare_response_obj(args, kwargs)
+            response = self._app.response_class(packb(obj, self.default), mimetype=mimetype)
+        elif orjson is None:
+            response = super().response(*args, **kwargs)
+        else:
+            obj = self._prepare_response_obj(args, kwargs)
+            pretty = self.compact is False or (self.compact is None and self._app.debug)
+            body = orjson.dumps(obj, default=self.default, option=self._options(self.sort_keys, pretty))
+            response = self._app.response_class(body + b'\n', mimetype=self.mimetype)
+        if msgpack is not None:
+            response.vary.add('Accept')
+        return response
@@ -0,0 +1,118 @@
+"""schema initial (equivalent de l'ancien db.create_all)
+
+Revision ID: 0001_schema_initial
+Revises:
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_schema_initial'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'utilisateurs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nom_utilisateur', sa.String(length=80), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('mot_de_passe', sa.String(length=128), nullable=False),
+        sa.Column('date_inscription', sa.DateTime(), nullable=True),
+        sa.Column('avatar_url', sa.String(length=255), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email'),
+        sa.UniqueConstraint('nom_utilisateur'),
+    )
+    op.create_table(
+        'ingredients',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nom', sa.String(length=120), nullable=False),
+        sa.Column('unite', sa.String(length=50), nullable=False),
+        sa.Column('prix_unitaire', sa.Float(), nullable=True),
+        sa.Column('date_ajout', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('nom'),
+    )
+    op.create_table(
+        'recettes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nom', sa.String(length=120), nullable=False),
+        sa.Column('description', sa.Text(), nullable=False),
+        sa.Column('image_url', sa.String(length=255), nullable=True),
+        sa.Column('temps_preparation', sa.Integer(), nullable=False),
+        sa.Column('temps_cuisson', sa.Integer(), nullable=False),
+        sa.Column('est_publique', sa.Boolean(), nullable=False),
+        sa.Column('date_creation', sa.DateTime(), nullable=True),
+        sa.Column('date_modification', sa.DateTime(), nullable=True),
+        sa.Column('utilisateur_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['utilisateur_id'], ['utilisateurs.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'inventaires',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nom', sa.String(length=120), nullable=False),
+        sa.Column('date_creation', sa.DateTime(), nullable=True),
+        sa.Column('date_modification', sa.DateTime(), nullable=True),
+        sa.Column('utilisateur_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['utilisateur_id'], ['utilisateurs.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'shopping_lists',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('utilisateur_id', sa.Integer(), nullable=False),
+        sa.Column('date_creation', sa.DateTime(), nullable=True),
+        sa.Column('date_mise_a_jour', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['utilisateur_id'], ['utilisateurs.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'recette_ingredients',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('recette_id', sa.Integer(), nullable=False),
+        sa.Column('ingredient_id', sa.Integer(), nullable=False),
+        sa.Column('quantite', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['ingredient_id'], ['ingredients.id']),
+        sa.ForeignKeyConstraint(['recette_id'], ['recettes.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'inventaire_ingredients',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('inventaire_id', sa.Integer(), nullable=False),
+        sa.Column('ingredient_id', sa.Integer(), nullable=False),
+        sa.Column('quantite_disponible', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['ingredient_id'], ['ingredients.id']),
+        sa.ForeignKeyConstraint(['inventaire_id'], ['inventaires.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'shopping_list_items',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('liste_id', sa.Integer(), nullable=False),
+        sa.Column('ingredient_id', sa.Integer(), nullable=False),
+        sa.Column('quantite', sa.Float(), nullable=False),
+        sa.Column('est_achete', sa.Boolean(), nullable=False),
+        sa.Column('date_ajout', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['ingredient_id'], ['ingredients.id']),
+        sa.ForeignKeyConstraint(['liste_id'], ['shopping_lists.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade():
+    op.drop_table('shopping_list_items')
+    op.drop_table('inventaire_ingredients')
+    op.drop_table('recette_ingredients')
+    op.drop_table('shopping_lists')
+    op.drop_table('inventaires')
+    op.drop_table('recettes')
+    op.drop_table('ingredients')
+    op.drop_table('utilisateurs')
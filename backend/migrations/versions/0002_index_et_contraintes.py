@@ -0,0 +1,101 @@
+"""index composites, unicite des lignes de liaison et table versions_donnees
+
+Revision ID: 0002_index_et_contraintes
+Revises: 0001_schema_initial
+Create Date: 2026-10-17 09:30:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_index_et_contraintes'
+down_revision = '0001_schema_initial'
+branch_labels = None
+depends_on = None
+
+
+# (table, colonne parent, nom de la contrainte unique, nom de l'index ingredient_id,
+#  agrégats reportés sur la ligne conservée quand une paire est en double)
+LIAISONS = [
+    ('recette_ingredients', 'recette_id',
+     'uq_recette_ingredients_recette_ingredient', 'ix_recette_ingredients_ingredient',
+     {'quantite': 'SUM(quantite)'}),
+    ('inventaire_ingredients', 'inventaire_id',
+     'uq_inventaire_ingredients_inventaire_ingredient', 'ix_inventaire_ingredients_ingredient',
+     {'quantite_disponible': 'SUM(quantite_disponible)'}),
+    ('shopping_list_items', 'liste_id',
+     'uq_shopping_list_items_liste_ingredient', 'ix_shopping_list_items_ingredient',
+     {'quantite': 'SUM(quantite)',
+      # Acheté seulement si toutes les lignes fusionnées l'étaient
+      'est_achete': 'MIN(CASE WHEN est_achete THEN 1 ELSE 0 END) = 1'}),
+]
+
+# Périmètres versionnés, créés d'avance : sinon deux premières écritures concurrentes d'un même
+# périmètre tentent toutes deux l'INSERT et l'une échoue sur la clé primaire
+PERIMETRES = ['ingredients', 'recettes']
+
+INDEX = [
+    ('ix_recettes_utilisateur_date', 'recettes', ['utilisateur_id', 'date_creation', 'id']),
+    ('ix_recettes_utilisateur_nom', 'recettes', ['utilisateur_id', 'nom', 'id']),
+    ('ix_recettes_publique_date', 'recettes', ['est_publique', 'date_creation', 'id']),
+    ('ix_recettes_publique_nom', 'recettes', ['est_publique', 'nom', 'id']),
+    ('ix_ingredients_date_ajout', 'ingredients', ['date_ajout', 'id']),
+    ('ix_inventaires_utilisateur_date', 'inventaires', ['utilisateur_id', 'date_creation', 'id']),
+    ('ix_inventaires_utilisateur_nom', 'inventaires', ['utilisateur_id', 'nom', 'id']),
+    ('ix_shopping_lists_utilisateur_date', 'shopping_lists', ['utilisateur_id', 'date_creation', 'id']),
+]
+
+
+def upgrade():
+    versions = op.create_table(
+        'versions_donnees',
+        sa.Column('nom', sa.String(length=50), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('date_modification', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('nom'),
+    )
+    maintenant = datetime.utcnow()
+    op.bulk_insert(versions, [
+        {'nom': nom, 'version': 0, 'date_modification': maintenant} for nom in PERIMETRES
+    ])
+
+    for name, table, columns in INDEX:
+        op.create_index(name, table, columns)
+
+    for table, parent, unique_name, index_name, agregats in LIAISONS:
+        # Les doublons existants bloqueraient la contrainte : chaque paire est fusionnée dans sa
+        # première ligne (quantités additionnées, article acheté seulement si toutes les lignes
+        # l'étaient), puis les autres lignes sont supprimées.
+        # Les tables dérivées évitent l'erreur MySQL 1093 (sous-requête sur la table modifiée).
+        for colonne, agregat in agregats.items():
+            op.execute(
+                f"UPDATE {table} SET {colonne} = ("
+                f"SELECT valeur FROM (SELECT {parent} AS parent, ingredient_id, {agregat} AS valeur "
+                f"FROM {table} GROUP BY {parent}, ingredient_id HAVING COUNT(*) > 1) AS fusion "
+                f"WHERE fusion.parent = {table}.{parent} AND fusion.ingredient_id = {table}.ingredient_id) "
+                f"WHERE id IN (SELECT id FROM (SELECT MIN(id) AS id FROM {table} "
+                f"GROUP BY {parent}, ingredient_id HAVING COUNT(*) > 1) AS a_fusionner)"
+            )
+        op.execute(
+            f"DELETE FROM {table} WHERE id NOT IN ("
+            f"SELECT id FROM (SELECT MIN(id) AS id FROM {table} GROUP BY {parent}, ingredient_id) AS a_garder)"
+        )
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.create_unique_constraint(unique_name, [parent, 'ingredient_id'])
+            batch_op.create_index(index_name, ['ingredient_id'])
+
+
+def downgrade():
+    for table, parent, unique_name, index_name, _ in reversed(LIAISONS):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_index(index_name)
+            batch_op.drop_constraint(unique_name, type_='unique')
+
+    for name, table, columns in reversed(INDEX):
+        op.drop_index(name, table_name=table)
+
+    op.drop_table('versions_donnees')
@@ -0,0 +1,38 @@
+"""table refresh_tokens
+
+Revision ID: 0003_refresh_tokens
+Revises: 0002_index_et_contraintes
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_refresh_tokens'
+down_revision = '0002_index_et_contraintes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'refresh_tokens',
+        sa.Column('jti', sa.String(length=32), nullable=False),
+        sa.Column('famille', sa.String(length=32), nullable=False),
+        sa.Column('utilisateur_id', sa.Integer(), nullable=False),
+        sa.Column('expire_le', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['utilisateur_id'], ['utilisateurs.id']),
+        sa.PrimaryKeyConstraint('jti'),
+    )
+    op.create_index('ix_refresh_tokens_utilisateur', 'refresh_tokens', ['utilisateur_id'])
+    op.create_index('ix_refresh_tokens_famille', 'refresh_tokens', ['famille'])
+    op.create_index('ix_refresh_tokens_expire_le', 'refresh_tokens', ['expire_le'])
+
+
+def downgrade():
+    op.drop_index('ix_refresh_tokens_expire_le', table_name='refresh_tokens')
+    op.drop_index('ix_refresh_tokens_famille', table_name='refresh_tokens')
+    op.drop_index('ix_refresh_tokens_utilisateur', table_name='refresh_tokens')
+    op.drop_table('refresh_tokens')
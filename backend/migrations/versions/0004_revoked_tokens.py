@@ -0,0 +1,31 @@
+"""table revoked_tokens
+
+Revision ID: 0004_revoked_tokens
+Revises: 0003_refresh_tokens
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_revoked_tokens'
+down_revision = '0003_refresh_tokens'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'revoked_tokens',
+        sa.Column('cle', sa.String(length=40), nullable=False),
+        sa.Column('expire_le', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('cle'),
+    )
+    op.create_index('ix_revoked_tokens_expire_le', 'revoked_tokens', ['expire_le'])
+
+
+def downgrade():
+    op.drop_index('ix_revoked_tokens_expire_le', table_name='revoked_tokens')
+    op.drop_table('revoked_tokens')
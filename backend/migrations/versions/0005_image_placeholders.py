@@ -0,0 +1,30 @@
+"""placeholders d'image des recettes et avatars
+
+Revision ID: 0005_image_placeholders
+Revises: 0004_revoked_tokens
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_image_placeholders'
+down_revision = '0004_revoked_tokens'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('utilisateurs') as batch_op:
+        batch_op.add_column(sa.Column('avatar_placeholder', sa.Text(), nullable=True))
+    with op.batch_alter_table('recettes') as batch_op:
+        batch_op.add_column(sa.Column('image_placeholder', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('recettes') as batch_op:
+        batch_op.drop_column('image_placeholder')
+    with op.batch_alter_table('utilisateurs') as batch_op:
+        batch_op.drop_column('avatar_placeholder')
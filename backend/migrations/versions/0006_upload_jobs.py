@@ -0,0 +1,38 @@
+"""table upload_jobs
+
+Revision ID: 0006_upload_jobs
+Revises: 0005_image_placeholders
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_upload_jobs'
+down_revision = '0005_image_placeholders'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'upload_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('cible', sa.String(length=20), nullable=False),
+        sa.Column('cible_id', sa.Integer(), nullable=False),
+        sa.Column('url_locale', sa.String(length=255), nullable=False),
+        sa.Column('dossier', sa.String(length=100), nullable=False),
+        sa.Column('tentatives', sa.Integer(), nullable=False),
+        sa.Column('prochain_essai', sa.DateTime(), nullable=True),
+        sa.Column('derniere_erreur', sa.String(length=255), nullable=True),
+        sa.Column('date_creation', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_upload_jobs_prochain_essai', 'upload_jobs', ['prochain_essai'])
+
+
+def downgrade():
+    op.drop_index('ix_upload_jobs_prochain_essai', table_name='upload_jobs')
+    op.drop_table('upload_jobs')
@@ -0,0 +1,29 @@
+"""table upload_blobs
+
+Revision ID: 0007_upload_blobs
+Revises: 0006_upload_jobs
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_upload_blobs'
+down_revision = '0006_upload_jobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'upload_blobs',
+        sa.Column('chemin', sa.String(length=255), nullable=False),
+        sa.Column('nb_references', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('chemin'),
+    )
+
+
+def downgrade():
+    op.drop_table('upload_blobs')
@@ -0,0 +1,46 @@
+"""lignes versions_donnees des index de recettes
+
+Revision ID: 0008_perimetres_index
+Revises: 0007_upload_blobs
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_perimetres_index'
+down_revision = '0007_upload_blobs'
+branch_labels = None
+depends_on = None
+
+
+# Périmètres des index en mémoire (recettes cuisinables, recherche) ; une écriture a déjà pu
+# créer leur ligne, seules les manquantes sont ajoutées
+PERIMETRES = ['composition_recettes', 'recherche_recettes']
+
+versions = sa.table(
+    'versions_donnees',
+    sa.column('nom', sa.String),
+    sa.column('version', sa.Integer),
+    sa.column('date_modification', sa.DateTime),
+)
+
+
+def upgrade():
+    existants = set(op.get_bind().execute(
+        sa.select(versions.c.nom).where(versions.c.nom.in_(PERIMETRES))
+    ).scalars())
+    maintenant = datetime.utcnow()
+    manquants = [nom for nom in PERIMETRES if nom not in existants]
+    if manquants:
+        op.bulk_insert(versions, [
+            {'nom': nom, 'version': 0, 'date_modification': maintenant} for nom in manquants
+        ])
+
+
+def downgrade():
+    op.execute(versions.delete().where(versions.c.nom.in_(PERIMETRES)))
@@ -1,15 +1,72 @@
 import logging
+import math
+from operator import attrgetter, itemgetter
 from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
+from sqlalchemy import case, delete, event, func, insert, inspect, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, selectinload
 from datetime import datetime
+from backend.passwords import PasswordHasherBusy, password_hasher
+from backend.uploads import image_variants, same_upload
 
 db = SQLAlchemy()
-bcrypt = Bcrypt()
 
 # Configuration des logs
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class _Fields:
+    """Colonnes sérialisées d'un modèle : clés JSON et lecture groupée des valeurs.
+
+    Les valeurs chargées sont lues d'un seul appel C (itemgetter) dans le __dict__ de l'instance,
+    là où SQLAlchemy les range ; une colonne expirée ou différée fait retomber sur les attributs,
+    qui la rechargent. Les dates restent des datetime : le JSONProvider les écrit en ISO 8601.
+    Un champ est un nom d'attribut ou un couple (clé JSON, attribut).
+    """
+
+    __slots__ = ('keys', '_loaded', '_attributes')
+
+    def __init__(self, *fields):
+        pairs = [field if isinstance(field, tuple) else (field, field) for field in fields]
+        attributes = [attribute for _, attribute in pairs]
+        self.keys = tuple(key for key, _ in pairs)
+        self._loaded = itemgetter(*attributes)
+        self._attributes = attrgetter(*attributes)
+
+    def __call__(self, obj):
+        try:
+            values = self._loaded(obj.__dict__)
+        except KeyError:
+            values = self._attributes(obj)
+        return dict(zip(self.keys, values))
+
+
+def diff_ingredient_links(rows, wanted, quantity_field):
+    """Compare des lignes de liaison existantes à la liste voulue {ingredient_id: quantité}.
+
+    Retourne (à ajouter {ingredient_id: quantité}, à modifier [(ligne, quantité)], à supprimer [ligne]).
+    Les quantités sont comparées avec une tolérance car FLOAT (MySQL) est en simple précision.
+    """
+    existing = {row.ingredient_id: row for row in rows}
+    to_add = {ingredient_id: quantite for ingredient_id, quantite in wanted.items() if ingredient_id not in existing}
+    to_update = [
+        (existing[ingredient_id], quantite)
+        for ingredient_id, quantite in wanted.items()
+        if ingredient_id in existing
+        and not math.isclose(getattr(existing[ingredient_id], quantity_field), quantite, rel_tol=1e-6)
+    ]
+    to_remove = [row for ingredient_id, row in existing.items() if ingredient_id not in wanted]
+    return to_add, to_update, to_remove
+
+
+_UTILISATEUR_SAFE_FIELDS = _Fields(
+    'id', 'nom_utilisateur', 'date_inscription', ('avatar', 'avatar_url'), 'avatar_placeholder',
+)
+_UTILISATEUR_FIELDS = _Fields(
+    'id', 'nom_utilisateur', 'email', 'date_inscription', ('avatar', 'avatar_url'), 'avatar_placeholder',
+)
+
+
 class Utilisateur(db.Model):
     __tablename__ = 'utilisateurs'
     
@@ -19,53 +76,80 @@ class Utilisateur(db.Model):
     mot_de_passe = db.Column(db.String(128), nullable=False)
     date_inscription = db.Column(db.DateTime, default=datetime.utcnow)
     avatar_url = db.Column(db.String(255), nullable=True)
+    # Aperçu flouté (data URI de quelques centaines d'octets), renseigné une fois les dérivés produits
+    avatar_placeholder = db.Column(db.Text, nullable=True)
 
     recettes = db.relationship('Recette', backref='auteur', lazy=True)
     inventaires = db.relationship('Inventaire', backref='proprietaire', lazy=True)
     listes_courses = db.relationship('ShoppingList', backref='utilisateur', lazy=True)
 
     def set_password(self, mot_de_passe):
+        # PasswordHasherBusy (pool saturé ou délai dépassé) n'est pas interceptée : la route répond 503
         try:
-            self.mot_de_passe = bcrypt.generate_password_hash(mot_de_passe).decode('utf-8')
+            self.mot_de_passe = password_hasher.hash(mot_de_passe)
+        except PasswordHasherBusy:
+            raise
         except Exception as e:
             logger.error(f"Erreur hachage mot de passe: {e}")
             raise ValueError("Erreur création compte")
 
     def check_password(self, mot_de_passe):
         try:
-            return bcrypt.check_password_hash(self.mot_de_passe, mot_de_passe)
+            return password_hasher.check(self.mot_de_passe, mot_de_passe)
+        except PasswordHasherBusy:
+            raise
         except Exception as e:
             logger.error(f"Erreur vérification mot de passe: {e}")
             return False
 
+    def password_needs_rehash(self):
+        """Hash moins coûteux que la configuration (à régénérer après une connexion réussie)."""
+        return password_hasher.needs_rehash(self.mot_de_passe)
+
+    @classmethod
+    def set_avatar_placeholder(cls, utilisateur_id, avatar_url, placeholder):
+        """Enregistre le placeholder si l'avatar a toujours le même contenu, même déjà envoyé
+        vers le stockage distant ; retourne False sinon."""
+        user = db.session.get(cls, utilisateur_id)
+        if user is None or not same_upload(user.avatar_url, avatar_url):
+            return False
+        user.avatar_placeholder = placeholder
+        return True
+
     def to_dict(self):
-        return {
-            'id': self.id,
-            'nom_utilisateur': self.nom_utilisateur,
-            'email': self.email,
-            'date_inscription': self.date_inscription.isoformat(),
-            'avatar': self.avatar_url
-        }
+        data = _UTILISATEUR_FIELDS(self)
+        data['avatar_variantes'] = image_variants(data['avatar'], data['avatar_placeholder'] is not None)
+        return data
 
     def to_safe_dict(self):
-        return {
-            'id': self.id,
-            'nom_utilisateur': self.nom_utilisateur,
-            'date_inscription': self.date_inscription.isoformat(),
-            'avatar': self.avatar_url
-        }
+        data = _UTILISATEUR_SAFE_FIELDS(self)
+        data['avatar_variantes'] = image_variants(data['avatar'], data['avatar_placeholder'] is not None)
+        return data
 
     def __repr__(self):
         return f"<Utilisateur {self.nom_utilisateur}>"
 
 
+_RECETTE_FIELDS = _Fields(
+    'id', 'nom', 'description', ('image', 'image_url'), 'image_placeholder', 'temps_preparation',
+    'temps_cuisson', 'est_publique', 'date_creation', 'date_modification', 'utilisateur_id',
+)
+
+
 class Recette(db.Model):
     __tablename__ = 'recettes'
+    __table_args__ = (
+        db.Index('ix_recettes_utilisateur_date', 'utilisateur_id', 'date_creation', 'id'),
+        db.Index('ix_recettes_utilisateur_nom', 'utilisateur_id', 'nom', 'id'),
+        db.Index('ix_recettes_publique_date', 'est_publique', 'date_creation', 'id'),
+        db.Index('ix_recettes_publique_nom', 'est_publique', 'nom', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     nom = db.Column(db.String(120), nullable=False)
     description = db.Column(db.Text, nullable=False)
     image_url = db.Column(db.String(255), nullable=True)
+    image_placeholder = db.Column(db.Text, nullable=True)
     temps_preparation = db.Column(db.Integer, nullable=False)
     temps_cuisson = db.Column(db.Integer, nullable=False)
     est_publique = db.Column(db.Boolean, default=False, nullable=False)
@@ -75,63 +159,51 @@ class Recette(db.Model):
 
     ingredients = db.relationship('RecetteIngredient', backref='recette_rel', lazy=True, cascade='all, delete-orphan')
 
+    @classmethod
+    def query_loaded(cls, with_ingredients=False):
+        """Requête avec l'auteur (et les ingrédients) chargés d'avance pour to_dict."""
+        options = [joinedload(cls.auteur)]
+        if with_ingredients:
+            options.append(selectinload(cls.ingredients).joinedload(RecetteIngredient.ingredient_rel))
+        return cls.query.options(*options)
+
+    @classmethod
+    def set_image_placeholder(cls, recette_id, image_url, placeholder):
+        """Enregistre le placeholder si l'image a toujours le même contenu, même déjà envoyée
+        vers le stockage distant ; retourne False sinon."""
+        recette = db.session.get(cls, recette_id)
+        if recette is None or not same_upload(recette.image_url, image_url):
+            return False
+        recette.image_placeholder = placeholder
+        return True
+
     def to_dict(self, with_ingredients=False):
-        data = {
-            'id': self.id,
-            'nom': self.nom,
-            'description':   self.description,
-            'image': self.image_url,
-            'temps_preparation': self.temps_preparation,
-            'temps_cuisson': self.temps_cuisson,
-            'est_publique': self.est_publique,
-            'date_creation': self.date_creation.isoformat(),
-            'date_modification': self.date_modification.isoformat() if self.date_modification else None,
-            'utilisateur_id': self.utilisateur_id
-        }
-
-        if self.auteur:
-            data['auteur'] = self.auteur.to_safe_dict()
-        else:
-            data['auteur'] = None
+        data = _RECETTE_FIELDS(self)
+        data['image_variantes'] = image_variants(data['image'], data['image_placeholder'] is not None)
+        auteur = self.auteur
+        data['auteur'] = auteur.to_safe_dict() if auteur is not None else None
 
         if with_ingredients:
-            data['ingredients'] = []
-            for ri in self.ingredients:
-                ing = ri.ingredient_rel
-                if ing:  # Vérification de sécurité
-                    data['ingredients'].append({
-                        'id': ing.id,
-                        'nom': ing.nom,
-                        'quantite': ri.quantite,
-                        'unite': ing.unite
-                    })
-                else:
-                    logger.warning(f"Ingrédient manquant pour recette ID {self.id}, RI ID {ri.id}")
+            data['ingredients'] = [
+                {'id': ing.id, 'nom': ing.nom, 'quantite': ri.quantite, 'unite': ing.unite}
+                for ri in self.ingredients
+                if (ing := ri.ingredient_rel) is not None
+            ]
 
         return data
-    def ajouter_ingredient(self, ingredient, quantite):
-        try:
-            if not self.id:
-                db.session.flush()  # Assure que l'ID est généré
-
-            ri = RecetteIngredient(
-                recette_id=self.id,
-                ingredient_id=ingredient.id,
-                quantite=quantite
-            )
-            db.session.add(ri)
-            return True
-        except Exception as e:
-            db.session.rollback()
-            logger.error(f"Erreur ajout ingrédient à recette: {e}")
-            return False
 
     def __repr__(self):
         return f"<Recette {self.nom}>"
 
 
+_INGREDIENT_FIELDS = _Fields('id', 'nom', 'unite', 'prix_unitaire', 'date_ajout')
+
+
 class Ingredient(db.Model):
     __tablename__ = 'ingredients'
+    __table_args__ = (
+        db.Index('ix_ingredients_date_ajout', 'date_ajout', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     nom = db.Column(db.String(120), nullable=False, unique=True)
@@ -143,32 +215,78 @@ class Ingredient(db.Model):
     inventaires = db.relationship('InventaireIngredient', backref='ingredient_inv', lazy=True)
     items_liste = db.relationship('ShoppingListItem', backref='ingredient_item', lazy=True)
 
+    @classmethod
+    def unknown_ids(cls, ingredient_ids):
+        """Identifiants absents du catalogue, résolus en une seule requête IN."""
+        wanted = set(ingredient_ids)
+        if not wanted:
+            return []
+        found = db.session.execute(select(cls.id).where(cls.id.in_(wanted))).scalars()
+        return sorted(wanted.difference(found))
+
     def to_dict(self):
-        return {
-            'id': self.id,
-            'nom': self.nom,
-            'unite': self.unite,
-            'prix_unitaire': self.prix_unitaire,
-            'date_ajout': self.date_ajout.isoformat()
-        }
+        return _INGREDIENT_FIELDS(self)
+
+_RECETTE_INGREDIENT_FIELDS = _Fields('recette_id', 'ingredient_id', 'quantite')
+
 
 class RecetteIngredient(db.Model):
     __tablename__ = 'recette_ingredients'
+    __table_args__ = (
+        db.UniqueConstraint('recette_id', 'ingredient_id', name='uq_recette_ingredients_recette_ingredient'),
+        db.Index('ix_recette_ingredients_ingredient', 'ingredient_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     recette_id = db.Column(db.Integer, db.ForeignKey('recettes.id'), nullable=False)
     ingredient_id = db.Column(db.Integer, db.ForeignKey('ingredients.id'), nullable=False)
     quantite = db.Column(db.Float, nullable=False)
 
+    @classmethod
+    def missing_quantities(cls, multipliers, inventaire_ids):
+        """Quantités manquantes {ingredient_id: quantité} pour cuisiner plusieurs recettes.
+
+        multipliers : {recette_id: multiplicateur}. La demande (somme des quantités multipliées)
+        et le stock cumulé des inventaires sont agrégés côté SQL puis soustraits en une requête.
+        """
+        if not multipliers:
+            return {}
+        multiplicateur = case(multipliers, value=cls.recette_id, else_=0)
+        demande = (
+            select(cls.ingredient_id.label('ingredient_id'), func.sum(cls.quantite * multiplicateur).label('quantite'))
+            .where(cls.recette_id.in_(multipliers))
+            .group_by(cls.ingredient_id)
+            .subquery()
+        )
+        stock = (
+            select(
+                InventaireIngredient.ingredient_id.label('ingredient_id'),
+                func.sum(InventaireIngredient.quantite_disponible).label('quantite'),
+            )
+            .where(InventaireIngredient.inventaire_id.in_(inventaire_ids))
+            .group_by(InventaireIngredient.ingredient_id)
+            .subquery()
+        )
+        manquant = demande.c.quantite - func.coalesce(stock.c.quantite, 0)
+        rows = db.session.execute(
+            select(demande.c.ingredient_id, manquant)
+            .outerjoin(stock, stock.c.ingredient_id == demande.c.ingredient_id)
+            .where(manquant > 0)
+        ).all()
+        return {ingredient_id: quantite for ingredient_id, quantite in rows}
+
     def to_dict(self):
-        return {
-            'recette_id': self.recette_id,
-            'ingredient_id': self.ingredient_id,
-            'quantite': self.quantite
-        }
+        return _RECETTE_INGREDIENT_FIELDS(self)
+
+_INVENTAIRE_FIELDS = _Fields('id', 'nom', 'date_creation', 'date_modification', 'utilisateur_id')
+
 
 class Inventaire(db.Model):
     __tablename__ = 'inventaires'
+    __table_args__ = (
+        db.Index('ix_inventaires_utilisateur_date', 'utilisateur_id', 'date_creation', 'id'),
+        db.Index('ix_inventaires_utilisateur_nom', 'utilisateur_id', 'nom', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     nom = db.Column(db.String(120), nullable=False)
@@ -178,35 +296,43 @@ class Inventaire(db.Model):
     
     ingredients = db.relationship('InventaireIngredient', backref='inventaire_rel', lazy=True, cascade='all, delete-orphan')
 
+    @classmethod
+    def query_loaded(cls, with_ingredients=False):
+        """Requête avec les lignes d'inventaire (et leurs ingrédients) chargées d'avance."""
+        lignes = selectinload(cls.ingredients)
+        if with_ingredients:
+            lignes = lignes.joinedload(InventaireIngredient.ingredient_inv)
+        return cls.query.options(lignes)
+
     def to_dict(self, with_ingredients=False):
-        data = {
-            'id': self.id,
-            'nom': self.nom,
-            'date_creation': self.date_creation.isoformat(),
-            'date_modification': self.date_modification.isoformat() if self.date_modification else None,
-            'utilisateur_id': self.utilisateur_id,
-            'ingredients_count': len(self.ingredients)
-        }
+        data = _INVENTAIRE_FIELDS(self)
+        data['ingredients_count'] = len(self.ingredients)
 
         if with_ingredients:
-            data['ingredients'] = []
-            for ii in self.ingredients:
-                ing = ii.ingredient_inv
-                if ing:
-                    data['ingredients'].append({
-                        'id': ing.id,
-                        'nom': ing.nom,
-                        'quantite_disponible': ii.quantite_disponible,
-                        'unite': ing.unite,
-                        'prix_unitaire': ing.prix_unitaire
-                    })
-                else:
-                    logger.warning(f"Ingrédient manquant dans inventaire ID {self.id}, II ID {ii.id}")
+            data['ingredients'] = [
+                {
+                    'id': ing.id,
+                    'nom': ing.nom,
+                    'quantite_disponible': ii.quantite_disponible,
+                    'unite': ing.unite,
+                    'prix_unitaire': ing.prix_unitaire
+                }
+                for ii in self.ingredients
+                if (ing := ii.ingredient_inv) is not None
+            ]
 
         return data
 
+
+_INVENTAIRE_INGREDIENT_FIELDS = _Fields('id', 'inventaire_id', 'ingredient_id', 'quantite_disponible')
+
+
 class InventaireIngredient(db.Model):
     __tablename__ = 'inventaire_ingredients'
+    __table_args__ = (
+        db.UniqueConstraint('inventaire_id', 'ingredient_id', name='uq_inventaire_ingredients_inventaire_ingredient'),
+        db.Index('ix_inventaire_ingredients_ingredient', 'ingredient_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     inventaire_id = db.Column(db.Integer, db.ForeignKey('inventaires.id'), nullable=False)
@@ -214,12 +340,7 @@ class InventaireIngredient(db.Model):
     quantite_disponible = db.Column(db.Float, nullable=False)
 
     def to_dict(self):
-        return {
-            'id': self.id,
-            'inventaire_id': self.inventaire_id,
-            'ingredient_id': self.ingredient_id,
-            'quantite_disponible': self.quantite_disponible
-        }
+        return _INVENTAIRE_INGREDIENT_FIELDS(self)
 
     def update_quantity(self, quantite):
         try:
@@ -231,8 +352,15 @@ class InventaireIngredient(db.Model):
             logger.error(f"Erreur mise à jour quantité: {e}")
             return False
 
+
+_SHOPPING_LIST_FIELDS = _Fields('id', 'utilisateur_id', 'date_creation', 'date_mise_a_jour')
+
+
 class ShoppingList(db.Model):
     __tablename__ = 'shopping_lists'
+    __table_args__ = (
+        db.Index('ix_shopping_lists_utilisateur_date', 'utilisateur_id', 'date_creation', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     utilisateur_id = db.Column(db.Integer, db.ForeignKey('utilisateurs.id'), nullable=False)
@@ -241,6 +369,61 @@ class ShoppingList(db.Model):
     
     items = db.relationship('ShoppingListItem', backref='liste', lazy=True, cascade='all, delete-orphan')
 
+    @classmethod
+    def query_loaded(cls):
+        """Requête avec les articles et leurs ingrédients chargés d'avance."""
+        return cls.query.options(selectinload(cls.items).joinedload(ShoppingListItem.ingredient_item))
+
+    @classmethod
+    def summary_totals(cls, liste_ids):
+        """Totaux (articles, quantités, prix) de plusieurs listes en une seule requête groupée."""
+        if not liste_ids:
+            return {}
+        prix = func.coalesce(Ingredient.prix_unitaire, 0)
+        rows = db.session.execute(
+            select(
+                ShoppingListItem.liste_id,
+                func.count(ShoppingListItem.id),
+                func.coalesce(func.sum(ShoppingListItem.quantite), 0),
+                func.coalesce(func.sum(ShoppingListItem.quantite * prix), 0),
+            )
+            .outerjoin(Ingredient, Ingredient.id == ShoppingListItem.ingredient_id)
+            .where(ShoppingListItem.liste_id.in_(liste_ids))
+            .group_by(ShoppingListItem.liste_id)
+        ).all()
+        return {liste_id: (total_items, total_ingredients, prix_total)
+                for liste_id, total_items, total_ingredients, prix_total in rows}
+
+    def merge_quantities(self, quantities):
+        """Ajoute {ingredient_id: quantité} à la liste : les articles déjà présents sont cumulés
+        (et repassent à acheter), les autres sont insérés en un seul INSERT multi-lignes."""
+        if not quantities:
+            return
+        existing = ShoppingListItem.query.filter(
+            ShoppingListItem.liste_id == self.id,
+            ShoppingListItem.ingredient_id.in_(quantities),
+        ).all()
+        for item in existing:
+            item.quantite += quantities[item.ingredient_id]
+            item.est_achete = False
+
+        known = {item.ingredient_id for item in existing}
+        new_rows = [
+            {'liste_id': self.id, 'ingredient_id': ingredient_id, 'quantite': quantite}
+            for ingredient_id, quantite in quantities.items()
+            if ingredient_id not in known
+        ]
+        if new_rows:
+            db.session.execute(insert(ShoppingListItem), new_rows)
+
+    def to_summary_dict(self, totals=None):
+        total_items, total_ingredients, prix_total = totals or (0, 0, 0)
+        data = _SHOPPING_LIST_FIELDS(self)
+        data['total_items'] = total_items
+        data['total_ingredients'] = total_ingredients
+        data['prix_total'] = round(prix_total, 2)
+        return data
+
     def to_dict(self):
         prix_total = sum(
             item.quantite
@@ -252,19 +435,20 @@ class ShoppingList(db.Model):
             for item in self.items
         )
 
-        return {
-            'id': self.id,
-            'utilisateur_id': self.utilisateur_id,
-            'date_creation': self.date_creation.isoformat(),
-            'date_mise_a_jour': self.date_mise_a_jour.isoformat() if self.date_mise_a_jour else None,
-            'items': [item.to_dict() for item in self.items],
-            'total_items': len(self.items),
-            'total_ingredients': sum(item.quantite for item in self.items),
-            'prix_total': round(prix_total, 2)
-        }
-    
+        data = self.to_summary_dict((len(self.items), sum(item.quantite for item in self.items), prix_total))
+        data['items'] = [item.to_dict() for item in self.items]
+        return data
+
+
+_SHOPPING_LIST_ITEM_FIELDS = _Fields('id', 'liste_id', 'ingredient_id', 'quantite', 'est_achete', 'date_ajout')
+
+
 class ShoppingListItem(db.Model):
     __tablename__ = 'shopping_list_items'
+    __table_args__ = (
+        db.UniqueConstraint('liste_id', 'ingredient_id', name='uq_shopping_list_items_liste_ingredient'),
+        db.Index('ix_shopping_list_items_ingredient', 'ingredient_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     liste_id = db.Column(db.Integer, db.ForeignKey('shopping_lists.id'), nullable=False)
@@ -274,29 +458,322 @@ class ShoppingListItem(db.Model):
     date_ajout = db.Column(db.DateTime, default=datetime.utcnow)
 
     def to_dict(self):
+        data = _SHOPPING_LIST_ITEM_FIELDS(self)
         ing = self.ingredient_item
         if ing is None:
-            logger.warning(f"Ingredient manquant pour ShoppingListItem ID {self.id}")
-            return {
-                'id': self.id,
-                'liste_id': self.liste_id,
-                'ingredient_id': self.ingredient_id,
-                'ingredient_nom': None,
-                'quantite': self.quantite,
-                'unite': None,
-                'est_achete': self.est_achete,
-                'prix_estime': None,
-                'date_ajout': self.date_ajout.isoformat()
-            }
-
-        return {
-            'id': self.id,
-            'liste_id': self.liste_id,
-            'ingredient_id': self.ingredient_id,
-            'ingredient_nom': ing.nom,
-            'quantite': self.quantite,
-            'unite': ing.unite,
-            'est_achete': self.est_achete,
-            'prix_estime': round(self.quantite * ing.prix_unitaire, 2) if ing.prix_unitaire is not None else None,
-            'date_ajout': self.date_ajout.isoformat()
-        }
+            data['ingredient_nom'] = data['unite'] = data['prix_estime'] = None
+            return data
+        data['ingredient_nom'] = ing.nom
+        data['unite'] = ing.unite
+        data['prix_estime'] = round(self.quantite * ing.prix_unitaire, 2) if ing.prix_unitaire is not None else None
+        return data
+
+
+class RefreshToken(db.Model):
+    """Jeton de rafraîchissement actif. Une ligne par jeton valide : consommée à la rotation.
+
+    Les jetons issus d'une même connexion partagent une famille ; présenter un jeton déjà
+    consommé révoque toute la famille (jeton volé rejoué).
+    """
+    __tablename__ = 'refresh_tokens'
+    __table_args__ = (
+        db.Index('ix_refresh_tokens_utilisateur', 'utilisateur_id'),
+        db.Index('ix_refresh_tokens_famille', 'famille'),
+        db.Index('ix_refresh_tokens_expire_le', 'expire_le'),
+    )
+
+    jti = db.Column(db.String(32), primary_key=True)
+    famille = db.Column(db.String(32), nullable=False)
+    utilisateur_id = db.Column(db.Integer, db.ForeignKey('utilisateurs.id'), nullable=False)
+    expire_le = db.Column(db.DateTime, nullable=False)
+
+    @classmethod
+    def record(cls, jti, famille, utilisateur_id, expire_le):
+        db.session.execute(insert(cls), [
+            {'jti': jti, 'famille': famille, 'utilisateur_id': utilisateur_id, 'expire_le': expire_le}
+        ])
+
+    @classmethod
+    def consume(cls, jti):
+        """Supprime le jeton ; False s'il n'était plus actif (déjà utilisé ou révoqué)."""
+        result = db.session.execute(
+            delete(cls).where(cls.jti == jti).execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    @classmethod
+    def revoke_family(cls, famille):
+        db.session.execute(delete(cls).where(cls.famille == famille).execution_options(synchronize_session=False))
+
+    @classmethod
+    def revoke_user(cls, utilisateur_id):
+        db.session.execute(
+            delete(cls).where(cls.utilisateur_id == utilisateur_id).execution_options(synchronize_session=False)
+        )
+
+    @classmethod
+    def families(cls, utilisateur_id):
+        return db.session.execute(
+            select(cls.famille).where(cls.utilisateur_id == utilisateur_id).distinct()
+        ).scalars().all()
+
+    @classmethod
+    def purge_expired(cls):
+        db.session.execute(
+            delete(cls).where(cls.expire_le < datetime.utcnow()).execution_options(synchronize_session=False)
+        )
+
+
+class RevokedToken(db.Model):
+    """Clé révoquée ("jti:<jti>" ou "fam:<famille>") jusqu'à l'expiration des jetons d'accès concernés."""
+    __tablename__ = 'revoked_tokens'
+    __table_args__ = (
+        db.Index('ix_revoked_tokens_expire_le', 'expire_le'),
+    )
+
+    cle = db.Column(db.String(40), primary_key=True)
+    expire_le = db.Column(db.DateTime, nullable=False)
+
+    @classmethod
+    def record(cls, cles, expire_le):
+        cles = set(cles)
+        existing = db.session.execute(select(cls.cle).where(cls.cle.in_(cles))).scalars()
+        missing = cles.difference(existing)
+        if missing:
+            db.session.execute(insert(cls), [{'cle': cle, 'expire_le': expire_le} for cle in missing])
+        db.session.execute(
+            delete(cls).where(cls.expire_le < datetime.utcnow()).execution_options(synchronize_session=False)
+        )
+
+    @classmethod
+    def active(cls):
+        return db.session.execute(select(cls.cle).where(cls.expire_le >= datetime.utcnow())).scalars().all()
+
+
+class UploadBlob(db.Model):
+    """Fichier d'upload adressé par son contenu (chemin relatif à UPLOAD_FOLDER) et son nombre de
+    références : recettes et utilisateurs dont l'URL pointe vers ce fichier."""
+    __tablename__ = 'upload_blobs'
+
+    chemin = db.Column(db.String(255), primary_key=True)
+    nb_references = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def _increment(cls, chemin):
+        return db.session.execute(
+            update(cls)
+            .where(cls.chemin == chemin)
+            .values(nb_references=cls.nb_references + 1)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+    @classmethod
+    def acquire(cls, chemin):
+        if cls._increment(chemin):
+            return
+        try:
+            # Point de sauvegarde : un échec de l'insertion n'annule pas la transaction de l'appelant
+            with db.session.begin_nested():
+                db.session.execute(insert(cls), [{'chemin': chemin, 'nb_references': 1}])
+        except IntegrityError:
+            # Premier envoi concurrent du même contenu : la ligne vient d'être créée par l'autre
+            cls._increment(chemin)
+
+    @classmethod
+    def release(cls, chemin):
+        """Retire une référence et retourne celles qui restent (None pour un fichier sans ligne,
+        antérieur au stockage par contenu). La ligne est conservée à 0 : le fichier n'est
+        supprimé qu'après le commit, par reclaim."""
+        db.session.execute(
+            update(cls)
+            .where(cls.chemin == chemin)
+            .values(nb_references=cls.nb_references - 1)
+            .execution_options(synchronize_session=False)
+        )
+        remaining = db.session.execute(select(cls.nb_references).where(cls.chemin == chemin)).scalar()
+        return None if remaining is None else max(remaining, 0)
+
+    @classmethod
+    def reclaim(cls, connection, chemin):
+        """Supprime la ligne si plus rien ne référence le fichier ; True si elle l'a été.
+
+        À appeler dans une transaction distincte, après le commit de la libération : la ligne
+        reste verrouillée jusqu'à la fin de cette transaction, le fichier est supprimé avant
+        qu'un nouvel envoi du même contenu puisse reprendre une référence."""
+        result = connection.execute(delete(cls).where(cls.chemin == chemin, cls.nb_references <= 0))
+        return result.rowcount == 1
+
+
+class UploadJob(db.Model):
+    """Envoi d'un fichier local vers le stockage distant, en attente ou en cours.
+
+    prochain_essai sert aussi de bail : un worker qui prend la tâche le repousse de la durée du
+    bail, si bien qu'une tâche interrompue par un redémarrage redevient disponible à son expiration.
+    NULL : tâche abandonnée après trop d'échecs (le fichier local reste servi).
+    """
+    __tablename__ = 'upload_jobs'
+    __table_args__ = (
+        db.Index('ix_upload_jobs_prochain_essai', 'prochain_essai'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    cible = db.Column(db.String(20), nullable=False)
+    cible_id = db.Column(db.Integer, nullable=False)
+    url_locale = db.Column(db.String(255), nullable=False)
+    dossier = db.Column(db.String(100), nullable=False)
+    tentatives = db.Column(db.Integer, nullable=False, default=0)
+    prochain_essai = db.Column(db.DateTime, nullable=True)
+    derniere_erreur = db.Column(db.String(255), nullable=True)
+    date_creation = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    @classmethod
+    def enqueue(cls, cible, cible_id, url_locale, dossier):
+        """Ajoute la tâche à la transaction courante : elle n'existe que si l'upload local est validé."""
+        now = datetime.utcnow()
+        db.session.execute(insert(cls), [{
+            'cible': cible, 'cible_id': cible_id, 'url_locale': url_locale, 'dossier': dossier,
+            'tentatives': 0, 'prochain_essai': now, 'date_creation': now,
+        }])
+        db.session.info['uploads_en_attente'] = True
+
+    @classmethod
+    def due(cls, now, limit):
+        # Lignes simples plutôt qu'objets ORM : les valeurs lues ne sont pas rechargées après un rollback
+        return db.session.execute(
+            select(cls.id, cls.cible, cls.cible_id, cls.url_locale, cls.dossier, cls.tentatives, cls.prochain_essai)
+            .where(cls.prochain_essai <= now)
+            .order_by(cls.prochain_essai)
+            .limit(limit)
+        ).all()
+
+    @classmethod
+    def claim(cls, job, lease_until):
+        """Prend la tâche si aucun autre worker ne l'a prise depuis sa lecture (compare-and-set)."""
+        result = db.session.execute(
+            update(cls)
+            .where(cls.id == job.id, cls.prochain_essai == job.prochain_essai)
+            .values(prochain_essai=lease_until, tentatives=cls.tentatives + 1)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    @classmethod
+    def reschedule(cls, job_id, prochain_essai, erreur):
+        db.session.execute(
+            update(cls)
+            .where(cls.id == job_id)
+            .values(prochain_essai=prochain_essai, derniere_erreur=erreur[:255])
+            .execution_options(synchronize_session=False)
+        )
+
+    @classmethod
+    def remove(cls, job_id):
+        db.session.execute(delete(cls).where(cls.id == job_id).execution_options(synchronize_session=False))
+
+
+class VersionDonnees(db.Model):
+    """Compteur de modifications par périmètre, base des ETag / Last-Modified."""
+    __tablename__ = 'versions_donnees'
+
+    nom = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    date_modification = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    @classmethod
+    def current(cls, scopes):
+        """Retourne (jeton de version, date de dernière modification) pour les périmètres donnés."""
+        rows = db.session.execute(
+            select(cls.nom, cls.version, cls.date_modification).where(cls.nom.in_(scopes))
+        ).all()
+        versions = {row.nom: row.version for row in rows}
+        token = '.'.join(str(versions.get(scope, 0)) for scope in scopes)
+        last_modified = max((row.date_modification for row in rows), default=None)
+        return token, last_modified
+
+
+# Périmètres invalidés par la modification de chaque modèle : une recette expose son auteur
+# et le nom/l'unité de ses ingrédients, donc ces modèles invalident aussi "recettes".
+# "composition_recettes" (index des recettes cuisinables) et "recherche_recettes" (index plein
+# texte) ne suivent que les recettes et leurs lignes.
+VERSION_SCOPES = {
+    Utilisateur: ('recettes',),
+    Recette: ('recettes', 'composition_recettes', 'recherche_recettes'),
+    RecetteIngredient: ('recettes', 'composition_recettes', 'recherche_recettes'),
+    Ingredient: ('ingredients', 'recettes'),
+}
+# Colonnes jamais exposées par les périmètres : les modifier ne change aucune réponse versionnée
+PRIVATE_COLUMNS = {
+    Utilisateur: frozenset({'mot_de_passe', 'email'}),
+}
+# Colonnes dont dépend un périmètre : la modification d'une autre colonne (nom, image...) ne
+# l'invalide pas, ce qui évite de reconstruire les index des autres workers pour rien
+SCOPE_COLUMNS = {
+    (Recette, 'composition_recettes'): frozenset({'utilisateur_id', 'est_publique'}),
+    (Recette, 'recherche_recettes'): frozenset({
+        'utilisateur_id', 'est_publique', 'nom', 'description', 'temps_preparation', 'temps_cuisson',
+    }),
+}
+
+
+def _changed_columns(obj):
+    return {attr.key for attr in inspect(obj).attrs if attr.history.has_changes()}
+
+
+def _only_private_changes(obj):
+    private = PRIVATE_COLUMNS.get(type(obj))
+    if not private:
+        return False
+    return _changed_columns(obj) <= private
+
+
+def _bump_versions(session, scopes):
+    table = VersionDonnees.__table__
+    connection = session.connection()
+    now = datetime.utcnow()
+    # Incréments faits par cette session, pour qu'un cache local sache s'il est seul à avoir écrit
+    bumped = session.info.setdefault('versions_incrementees', {})
+    # Périmètres à invalider dans le cache de réponses une fois la transaction validée
+    session.info.setdefault('portees_modifiees', set()).update(scopes)
+    for scope in sorted(scopes):
+        bumped[scope] = bumped.get(scope, 0) + 1
+        result = connection.execute(
+            update(table)
+            .where(table.c.nom == scope)
+            .values(version=table.c.version + 1, date_modification=now)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(table).values(nom=scope, version=1, date_modification=now))
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_versions_after_flush(session, flush_context):
+    scopes = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        obj_scopes = VERSION_SCOPES.get(type(obj))
+        if not obj_scopes:
+            continue
+        # Un nouvel utilisateur n'apparaît dans aucune recette
+        if isinstance(obj, Utilisateur) and obj in session.new:
+            continue
+        if obj in session.dirty:
+            if not session.is_modified(obj, include_collections=False) or _only_private_changes(obj):
+                continue
+            changed = _changed_columns(obj)
+            obj_scopes = [
+                scope for scope in obj_scopes
+                if (type(obj), scope) not in SCOPE_COLUMNS or changed & SCOPE_COLUMNS[type(obj), scope]
+            ]
+        scopes.update(obj_scopes)
+    if scopes:
+        _bump_versions(session, scopes)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bump_versions_on_bulk_write(orm_execute_state):
+    # Les insert()/update()/delete() en masse ne passent pas par le flush
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    scopes = VERSION_SCOPES.get(mapper.class_) if mapper is not None else None
+    if scopes:
+        _bump_versions(orm_execute_state.session, set(scopes))
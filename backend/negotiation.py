@@ -0,0 +1,50 @@
+from flask import Request, has_request_context, request
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - dépendance optionnelle (clients mobiles)
+    msgpack = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+# Variante non standard encore envoyée par certaines bibliothèques clientes
+MSGPACK_MIMETYPES = (MSGPACK_MIMETYPE, 'application/x-msgpack')
+
+
+def negotiated_msgpack():
+    """Type MessagePack à renvoyer si le client le préfère à JSON (Accept), sinon None."""
+    if msgpack is None or not has_request_context():
+        return None
+    best = request.accept_mimetypes.best_match((JSON_MIMETYPE, *MSGPACK_MIMETYPES))
+    return best if best in MSGPACK_MIMETYPES else None
+
+
+def packb(obj, default):
+    """Même schéma que le JSON : default convertit dates, Decimal... comme pour json."""
+    return msgpack.packb(obj, default=default, use_bin_type=True)
+
+
+class ApiRequest(Request):
+    """Requête dont get_json décode aussi un corps MessagePack (Content-Type application/msgpack).
+
+    Les routes et validation.get_json_object reçoivent ainsi le même dict quel que soit le format.
+    """
+
+    _cached_msgpack = Ellipsis
+
+    def get_json(self, force=False, silent=False, cache=True):
+        if self.mimetype not in MSGPACK_MIMETYPES:
+            return super().get_json(force=force, silent=silent, cache=cache)
+        if cache and self._cached_msgpack is not Ellipsis:
+            return self._cached_msgpack
+        try:
+            if msgpack is None:
+                raise ValueError("MessagePack non pris en charge")
+            data = msgpack.unpackb(self.get_data(cache=cache), raw=False)
+        except (ValueError, TypeError) as exc:
+            if silent:
+                return None
+            return self.on_json_loading_failed(exc)
+        if cache:
+            self._cached_msgpack = data
+        return data
@@ -0,0 +1,81 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+from backend.validation import ValidationError
+
+
+class SortOrder:
+    """Ordre de tri keyset : colonnes comparées dans l'ordre, la dernière étant unique (id)."""
+
+    def __init__(self, *columns, descending=False):
+        self.columns = columns
+        self.descending = descending
+
+    def order_by(self):
+        return [column.desc() if self.descending else column.asc() for column in self.columns]
+
+    def after(self, values):
+        # (a, b) > (va, vb)  <=>  a > va OR (a = va AND b > vb), écrit sans row values pour rester portable
+        clauses = []
+        for index, column in enumerate(self.columns):
+            egalites = [previous == value for previous, value in zip(self.columns[:index], values[:index])]
+            comparaison = column < values[index] if self.descending else column > values[index]
+            clauses.append(and_(*egalites, comparaison))
+        return or_(*clauses)
+
+    def key(self, row):
+        return [getattr(row, column.key) for column in self.columns]
+
+
+def encode_cursor(sort_name, values):
+    payload = [sort_name] + [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, sort_name, sort_order):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise ValidationError("Curseur invalide") from None
+
+    if not isinstance(payload, list) or len(payload) != len(sort_order.columns) + 1 or payload[0] != sort_name:
+        raise ValidationError("Curseur invalide")
+
+    values = []
+    for column, value in zip(sort_order.columns, payload[1:]):
+        if value is None:
+            raise ValidationError("Curseur invalide")
+        try:
+            if column.type.python_type is datetime:
+                value = datetime.fromisoformat(value)
+            elif not isinstance(value, column.type.python_type):
+                raise TypeError
+        except (TypeError, ValueError):
+            raise ValidationError("Curseur invalide") from None
+        values.append(value)
+    return values
+
+
+def paginate(query, sorts, params):
+    """Applique le tri et, si demandé, la page keyset. Retourne (lignes, curseur suivant)."""
+    sort_order = sorts[params['sort']]
+    query = query.order_by(*sort_order.order_by())
+
+    if params['limit'] is None:
+        return query.all(), None
+
+    if params['cursor']:
+        query = query.filter(sort_order.after(decode_cursor(params['cursor'], params['sort'], sort_order)))
+
+    rows = query.limit(params['limit'] + 1).all()
+    if len(rows) <= params['limit']:
+        return rows, None
+
+    rows = rows[:params['limit']]
+    return rows, encode_cursor(params['sort'], sort_order.key(rows[-1]))
@@ -0,0 +1,184 @@
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import bcrypt
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROUNDS = 12
+MIN_ROUNDS = 10
+MAX_ROUNDS = 16
+HASH_TIMEOUT_SECONDS = 10
+# bcrypt n'utilise que les 72 premiers octets ; bcrypt>=5 refuse les mots de passe plus longs
+BCRYPT_MAX_BYTES = 72
+
+
+class PasswordHasherBusy(Exception):
+    """File du pool de hachage pleine : la requête doit être rejetée (503) plutôt que mise en attente."""
+
+
+class PasswordHasherTimeout(PasswordHasherBusy):
+    """Calcul non terminé en HASH_TIMEOUT_SECONDS : même réponse 503, jamais un échec d'identification."""
+
+
+def _password_bytes(mot_de_passe):
+    return mot_de_passe.encode('utf-8')[:BCRYPT_MAX_BYTES]
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check(password, hashed):
+    return bcrypt.checkpw(password, hashed.encode('utf-8'))
+
+
+def hash_rounds(hashed):
+    """Coût d'un hash bcrypt "$2b$12$..." (None si le format n'est pas reconnu)."""
+    parts = hashed.split('$')
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+def calibrate_rounds(target_ms, minimum=MIN_ROUNDS, maximum=MAX_ROUNDS, samples=3):
+    """Coût le plus élevé dont un hachage tient dans target_ms sur cette machine.
+
+    Chaque incrément double le temps de calcul : une mesure au coût minimal suffit, la plus
+    rapide de samples essais (les plus lentes reflètent surtout la charge du moment).
+    """
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        _hash(b'calibration', minimum)
+        timings.append((time.perf_counter() - started) * 1000)
+    rounds = minimum + int(math.floor(math.log2(max(target_ms / min(timings), 1))))
+    return min(rounds, maximum)
+
+
+def _read_rounds(path):
+    try:
+        with open(path, encoding='utf-8') as handle:
+            return int(handle.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def deployment_rounds(instance_path, target_ms):
+    """Coût calibré une seule fois pour tous les processus qui partagent instance_path.
+
+    Le premier processus mesure et publie le résultat (création atomique, le premier écrit
+    gagne) ; les suivants le relisent au lieu de mesurer chacun de leur côté. Pour plusieurs
+    machines, fixer BCRYPT_LOG_ROUNDS avec la valeur de `flask calibrate-bcrypt`.
+    """
+    path = os.path.join(instance_path, f'bcrypt_rounds_{target_ms}ms')
+    rounds = _read_rounds(path)
+    if rounds is not None:
+        return rounds
+    rounds = calibrate_rounds(target_ms)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(instance_path, exist_ok=True)
+        with open(temporary, 'w', encoding='utf-8') as handle:
+            handle.write(str(rounds))
+        os.link(temporary, path)
+    except FileExistsError:
+        rounds = _read_rounds(path) or rounds
+    except OSError as exc:
+        # Système de fichiers en lecture seule : calibrage propre à ce processus
+        logger.warning("Coût bcrypt calibré non partagé (%s)", exc)
+    finally:
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+    return rounds
+
+
+class PasswordHasher:
+    """Hachage bcrypt hors des threads de requête, dans un pool de processus borné.
+
+    Au-delà de max_pending calculs en cours ou en attente, PasswordHasherBusy est levée
+    immédiatement : une rafale de connexions ne bloque pas les autres requêtes du worker.
+    Avec workers=0, le calcul reste dans le thread appelant (développement, tests).
+    """
+
+    def __init__(self):
+        self.rounds = DEFAULT_ROUNDS
+        self.workers = 0
+        self._executor = None
+        self._pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        target_ms = app.config.get('BCRYPT_TARGET_MS')
+        if target_ms:
+            self.rounds = deployment_rounds(app.instance_path, target_ms)
+            logger.info("Coût bcrypt calibré à %s pour %s ms", self.rounds, target_ms)
+        else:
+            self.rounds = app.config.get('BCRYPT_LOG_ROUNDS', DEFAULT_ROUNDS)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', 0)
+        self._slots = threading.BoundedSemaphore(
+            app.config.get('PASSWORD_HASH_MAX_PENDING') or max(self.workers, 1) * 8
+        )
+        app.extensions['password_hasher'] = self
+
+    def _pool(self):
+        with self._lock:
+            # Après un fork (gunicorn --preload), le pool du parent n'est pas utilisable
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def _run(self, function, *args):
+        if not self.workers:
+            return function(*args)
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy()
+        try:
+            future = self._pool().submit(function, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=HASH_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            future.cancel()
+            raise PasswordHasherTimeout() from None
+
+    def hash(self, mot_de_passe):
+        return self._run(_hash, _password_bytes(mot_de_passe), self.rounds)
+
+    def check(self, hashed, mot_de_passe):
+        return self._run(_check, _password_bytes(mot_de_passe), hashed)
+
+    def needs_rehash(self, hashed):
+        # Mise à niveau uniquement : un hash plus coûteux que la configuration est conservé
+        rounds = hash_rounds(hashed)
+        return rounds is None or rounds < self.rounds
+
+
+password_hasher = PasswordHasher()
+
+
+@click.command('calibrate-bcrypt')
+@click.option('--target-ms', default=250, type=int, help="Durée visée pour un hachage")
+@with_appcontext
+def calibrate_bcrypt_command(target_ms):
+    """Mesure le coût bcrypt à fixer dans BCRYPT_LOG_ROUNDS pour tout le déploiement."""
+    rounds = calibrate_rounds(target_ms, samples=5)
+    click.echo(f"BCRYPT_LOG_ROUNDS={rounds}  (actuel : {current_app.extensions['password_hasher'].rounds})")
@@ -0,0 +1,170 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_KEYS = 10000
+SQLITE_PURGE_EVERY = 1000
+
+
+class MemoryStore:
+    """Instants théoriques d'arrivée (TAT) par clé, propres au processus, bornés à max_keys (LRU)."""
+
+    def __init__(self, max_keys=DEFAULT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._tats = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._tats.get(key)
+
+    def advance(self, key, now, interval):
+        with self._lock:
+            tat = max(self._tats.pop(key, now), now) + interval
+            self._tats[key] = tat
+            while len(self._tats) > self.max_keys:
+                self._tats.popitem(last=False)
+            return tat
+
+    def delete(self, key):
+        with self._lock:
+            self._tats.pop(key, None)
+
+
+class SQLiteStore:
+    """TAT partagés entre les workers d'une même machine via un fichier SQLite (mode WAL).
+
+    Chaque incrément est un seul UPSERT, atomique sous le verrou d'écriture de SQLite ; les clés
+    expirées sont purgées périodiquement.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("CREATE TABLE IF NOT EXISTS rate_limits (cle TEXT PRIMARY KEY, tat REAL NOT NULL)")
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        row = self._connection().execute("SELECT tat FROM rate_limits WHERE cle = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def advance(self, key, now, interval):
+        connection = self._connection()
+        row = connection.execute(
+            "INSERT INTO rate_limits (cle, tat) VALUES (?, ? + ?) "
+            "ON CONFLICT (cle) DO UPDATE SET tat = MAX(tat, excluded.tat - ?) + ? "
+            "RETURNING tat",
+            (key, now, interval, interval, interval),
+        ).fetchone()
+        self._writes += 1
+        if self._writes % SQLITE_PURGE_EVERY == 0:
+            connection.execute("DELETE FROM rate_limits WHERE tat < ?", (now,))
+        return row[0]
+
+    def delete(self, key):
+        self._connection().execute("DELETE FROM rate_limits WHERE cle = ?", (key,))
+
+
+class RedisStore:
+    """TAT partagés entre workers et machines (Redis ou serveur compatible) ; chaque clé expire seule."""
+
+    ADVANCE_SCRIPT = """
+    local now = tonumber(ARGV[1])
+    local tat = math.max(tonumber(redis.call('GET', KEYS[1]) or now), now) + tonumber(ARGV[2])
+    redis.call('SET', KEYS[1], tostring(tat), 'PX', math.ceil((tat - now) * 1000))
+    return tostring(tat)
+    """
+
+    def __init__(self, url, prefix='recetteo:ratelimit:'):
+        if redis is None:
+            raise RuntimeError("Le paquet redis est requis pour RATELIMIT_STORAGE_URL=redis://")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._advance = self.client.register_script(self.ADVANCE_SCRIPT)
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return float(value) if value is not None else None
+
+    def advance(self, key, now, interval):
+        return float(self._advance(keys=[self.prefix + key], args=[now, interval]))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+
+class RateLimiter:
+    """Limiteur GCRA : au plus `limit` événements par `period` secondes et par clé.
+
+    Une seule valeur par clé (l'instant théorique d'arrivée), mise à jour en O(1) : chaque
+    événement la repousse de period / limit ; la clé est bloquée tant qu'elle dépasse
+    maintenant + period - period / limit. Une tentative est rendue toutes les period / limit secondes.
+    """
+
+    def __init__(self):
+        self.store = None
+
+    def init_app(self, app):
+        url = app.config.get('RATELIMIT_STORAGE_URL', 'memory://')
+        if url.startswith('memory://'):
+            self.store = MemoryStore(app.config.get('RATELIMIT_MAX_KEYS', DEFAULT_MAX_KEYS))
+        elif url.startswith('sqlite:///'):
+            self.store = SQLiteStore(url[len('sqlite:///'):])
+        elif url.startswith(('redis://', 'rediss://', 'unix://')):
+            self.store = RedisStore(url)
+        else:
+            raise RuntimeError(f"RATELIMIT_STORAGE_URL non pris en charge: {url}")
+        app.extensions['rate_limiter'] = self
+
+    def retry_after(self, key, limit, period):
+        """Secondes à attendre avant que la clé soit de nouveau admise, 0 si elle l'est déjà."""
+        try:
+            tat = self.store.get(key)
+        except Exception as exc:
+            # Stockage indisponible : on laisse passer plutôt que de bloquer l'authentification
+            logger.warning("Limiteur indisponible: %s", exc)
+            return 0
+        if tat is None:
+            return 0
+        tolerance = period - period / limit
+        return max(0.0, tat - tolerance - time.time())
+
+    def is_limited(self, key, limit, period):
+        return self.retry_after(key, limit, period) > 0
+
+    def hit(self, key, limit, period):
+        try:
+            self.store.advance(key, time.time(), period / limit)
+        except Exception as exc:
+            logger.warning("Limiteur indisponible: %s", exc)
+
+    def reset(self, key):
+        try:
+            self.store.delete(key)
+        except Exception as exc:
+            logger.warning("Limiteur indisponible: %s", exc)
+
+
+limiter = RateLimiter()
@@ -0,0 +1,128 @@
+import logging
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from backend.models import db, RevokedToken
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SYNC_SECONDS = 1.0
+
+
+def jti_key(jti):
+    return f"jti:{jti}"
+
+
+def family_key(famille):
+    return f"fam:{famille}"
+
+
+class RevocationList:
+    """Liste de révocation des jetons d'accès : table revoked_tokens et copie en mémoire.
+
+    La vérification faite à chaque requête authentifiée ne consulte que l'ensemble en mémoire
+    (deux recherches dans un ensemble). La copie est rechargée depuis la table par un thread, au
+    plus une fois toutes les sync_seconds, pour voir les révocations des autres workers ; celles
+    du processus courant y sont ajoutées dès le commit. Seules les clés non expirées sont relues,
+    la table reste donc de la taille des révocations de la dernière heure.
+    """
+
+    def __init__(self):
+        self.sync_seconds = DEFAULT_SYNC_SECONDS
+        self._keys = frozenset()
+        self._synced_at = None
+        self._sync_lock = threading.Lock()
+        self._lock = threading.Lock()
+        # Clés retenues par ce processus pendant un rechargement, fusionnées avec la copie relue
+        self._remembered = None
+
+    def init_app(self, app):
+        self.sync_seconds = app.config.get('REVOCATION_SYNC_SECONDS', DEFAULT_SYNC_SECONDS)
+        app.extensions['revocation_list'] = self
+
+    def _sync(self):
+        with self._lock:
+            self._remembered = set()
+        try:
+            snapshot = frozenset(RevokedToken.active())
+        except Exception as exc:
+            # Base indisponible : on garde la copie courante et on réessaiera au prochain intervalle
+            logger.error("Rechargement de la liste de révocation impossible: %s", exc)
+            snapshot = None
+        with self._lock:
+            if snapshot is not None:
+                self._keys = snapshot | self._remembered
+            self._remembered = None
+            self._synced_at = time.monotonic()
+
+    def _sync_in_background(self, app):
+        try:
+            with app.app_context():
+                try:
+                    self._sync()
+                finally:
+                    db.session.remove()
+        finally:
+            self._sync_lock.release()
+
+    def _schedule_sync(self):
+        # Un seul thread recharge ; les requêtes continuent avec la copie courante
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            app = current_app._get_current_object()
+            threading.Thread(target=self._sync_in_background, args=(app,), daemon=True).start()
+        except Exception:
+            self._sync_lock.release()
+            raise
+
+    def is_revoked(self, payload):
+        if self._synced_at is None:
+            # Premier contrôle du processus : la copie doit être chargée avant de répondre
+            with self._sync_lock:
+                if self._synced_at is None:
+                    self._sync()
+        elif time.monotonic() - self._synced_at > self.sync_seconds:
+            self._schedule_sync()
+        keys = self._keys
+        if jti_key(payload['jti']) in keys:
+            return True
+        famille = payload.get('fam')
+        return famille is not None and family_key(famille) in keys
+
+    def revoke(self, cles):
+        """Enregistre les clés dans la transaction courante ; elles sont actives après le commit.
+
+        Une clé est conservée jusqu'à l'expiration des jetons d'accès émis avant la révocation.
+        """
+        cles = set(cles)
+        if not cles:
+            return
+        RevokedToken.record(cles, datetime.utcnow() + current_app.config['JWT_ACCESS_TOKEN_EXPIRES'])
+        db.session.info.setdefault('cles_revoquees', set()).update(cles)
+
+    def _remember(self, cles):
+        with self._lock:
+            self._keys = self._keys | cles
+            if self._remembered is not None:
+                self._remembered.update(cles)
+
+
+revocation_list = RevocationList()
+
+
+@event.listens_for(Session, 'after_commit')
+def _remember_after_commit(session):
+    cles = session.info.pop('cles_revoquees', None)
+    if cles:
+        revocation_list._remember(cles)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session):
+    session.info.pop('cles_revoquees', None)
@@ -1,11 +1,11 @@
-import os
 import uuid
-from urllib.parse import urlparse
 from flask import Blueprint, request, jsonify, current_app
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from backend.models import db, Utilisateur, Recette, Inventaire, ShoppingList
+from datetime import datetime
+from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt, get_jwt_identity
+from backend.models import db, Utilisateur, Recette, Inventaire, ShoppingList, RefreshToken
+from backend.passwords import PasswordHasherBusy
 import logging
-import time
+import math
 from backend.validation import (
     ValidationError,
     validate_login_payload,
@@ -13,47 +13,81 @@ from backend.validation import (
     validate_profile_payload,
     validate_password_change_payload
 )
-from backend.uploads import validate_image_upload, upload_to_cloudinary
+from backend.uploads import validate_image_upload, local_upload_path
+from backend.upload_store import save_upload, release_upload, upload_storage, UploadStorageError
+from backend.images import image_pipeline
+from backend.remote_uploads import upload_queue
+from backend.cook_index import RECIPE_SCOPE
+from backend.indexing import notify_write
+from backend.ratelimit import limiter
+from backend.revocation import revocation_list, family_key, jti_key
 
 auth_bp = Blueprint('auth', __name__)
 logger = logging.getLogger(__name__)
-AUTH_ATTEMPTS = {}
 AUTH_LIMIT = 5
 AUTH_WINDOW_SECONDS = 900
 
 
 def _save_image(file_storage, subdir):
     ext = validate_image_upload(file_storage, current_app.config.get('ALLOWED_IMAGE_EXTENSIONS', set()))
+    if upload_queue.synchronous:
+        # Déploiement serverless : envoi vers Cloudinary dans la requête, sans fichier local
+        return upload_queue.upload_now(file_storage, f"recetteo/{subdir}")
+    return save_upload(file_storage, subdir, ext)
 
-    cloud_url = upload_to_cloudinary(file_storage, f"recetteo/{subdir}")
-    if cloud_url:
-        return cloud_url
 
-    unique_name = f"{uuid.uuid4().hex}.{ext}"
-    upload_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], subdir)
-    os.makedirs(upload_dir, exist_ok=True)
-    file_path = os.path.join(upload_dir, unique_name)
-    file_storage.save(file_path)
-
-    public_path = f"{subdir}/{unique_name}"
-    public_url = f"{request.host_url.rstrip('/')}/uploads/{public_path}"
-    return public_url
+def _direct_upload_unavailable():
+    # En mode sync, un envoi direct vers le disque local ne serait jamais transmis à Cloudinary
+    if upload_queue.synchronous and upload_storage.backend.local:
+        return jsonify({"message": "Envoi direct indisponible, utiliser l'upload multipart"}), 501
+    return None
 
 
 def _delete_uploaded_file(file_url):
     if not file_url:
         return
-    parsed = urlparse(file_url)
-    path = parsed.path or ''
-    if not path.startswith('/uploads/'):
-        return
-    relative = path.replace('/uploads/', '', 1)
-    full_path = os.path.join(current_app.config['UPLOAD_FOLDER'], relative)
-    if os.path.isfile(full_path):
-        try:
-            os.remove(full_path)
-        except OSError:
-            logger.warning("Impossible de supprimer le fichier upload %s", full_path)
+    release_upload(file_url)
+
+
+def _store_avatar_placeholder(user_id, avatar_url, placeholder):
+    if Utilisateur.set_avatar_placeholder(user_id, avatar_url, placeholder):
+        db.session.commit()
+
+
+def _replace_avatar(user, avatar_url, upload=None):
+    """Associe avatar_url (référence déjà prise) à l'utilisateur et planifie ses dérivés."""
+    # Libère l'ancienne référence, même si le contenu est identique (la nouvelle a été prise)
+    _delete_uploaded_file(user.avatar_url)
+
+    user.avatar_url = avatar_url
+    user.avatar_placeholder = None
+    upload_queue.enqueue('avatar', user.id, avatar_url, 'recetteo/avatars')
+    try:
+        db.session.commit()
+    except Exception as exc:
+        db.session.rollback()
+        logger.error("Erreur sauvegarde avatar: %s", exc)
+        return jsonify({"message": "Erreur lors de la sauvegarde"}), 500
+    user_id = user.id
+
+    def on_done(placeholder):
+        _store_avatar_placeholder(user_id, avatar_url, placeholder)
+
+    if upload is not None:
+        image_pipeline.submit(upload, avatar_url, on_done)
+    else:
+        path = local_upload_path(avatar_url, current_app.config['UPLOAD_FOLDER'])
+        if path is not None:
+            image_pipeline.submit_file(path, avatar_url, on_done)
+
+    return jsonify(user.to_dict()), 200
+
+
+@auth_bp.errorhandler(PasswordHasherBusy)
+def _hasher_busy(_error):
+    response = jsonify({"message": "Serveur occupé, veuillez réessayer"})
+    response.headers['Retry-After'] = '1'
+    return response, 503
 
 
 def _client_ip():
@@ -63,28 +97,48 @@ def _client_ip():
     return request.remote_addr or 'unknown'
 
 
-def _is_rate_limited(key):
-    now = time.time()
-    attempts = [attempt for attempt in AUTH_ATTEMPTS.get(key, []) if now - attempt < AUTH_WINDOW_SECONDS]
-    AUTH_ATTEMPTS[key] = attempts
-    return len(attempts) >= AUTH_LIMIT
+def _issue_tokens(user_id, famille=None):
+    """Jeton d'accès et nouveau jeton de rafraîchissement (enregistré, à valider par l'appelant)."""
+    jti = uuid.uuid4().hex
+    famille = famille or jti
+    refresh_token = create_refresh_token(identity=str(user_id), additional_claims={'jti': jti, 'fam': famille})
+    RefreshToken.record(jti, famille, user_id, datetime.utcnow() + current_app.config['JWT_REFRESH_TOKEN_EXPIRES'])
+    # La famille est aussi portée par le jeton d'accès : révoquer la session coupe ses jetons d'accès
+    access_token = create_access_token(identity=str(user_id), additional_claims={'fam': famille})
+    return access_token, refresh_token
+
+
+def _revoke_sessions(user_id):
+    """Révoque toutes les sessions de l'utilisateur (jetons de rafraîchissement et d'accès)."""
+    cles = {family_key(famille) for famille in RefreshToken.families(user_id)}
+    cles.add(jti_key(get_jwt()['jti']))
+    revocation_list.revoke(cles)
+    RefreshToken.revoke_user(user_id)
+
+
+def _rate_limited_response(key):
+    """Réponse 429 (avec Retry-After) si la clé a épuisé ses tentatives, sinon None."""
+    retry_after = limiter.retry_after(key, AUTH_LIMIT, AUTH_WINDOW_SECONDS)
+    if retry_after <= 0:
+        return None
+    response = jsonify({"message": "Trop de tentatives, veuillez reessayer plus tard"})
+    response.headers['Retry-After'] = str(math.ceil(retry_after))
+    return response, 429
 
 
 def _record_attempt(key):
-    now = time.time()
-    attempts = [attempt for attempt in AUTH_ATTEMPTS.get(key, []) if now - attempt < AUTH_WINDOW_SECONDS]
-    attempts.append(now)
-    AUTH_ATTEMPTS[key] = attempts
+    limiter.hit(key, AUTH_LIMIT, AUTH_WINDOW_SECONDS)
 
 
 def _clear_attempts(key):
-    AUTH_ATTEMPTS.pop(key, None)
+    limiter.reset(key)
 
 @auth_bp.route('/register', methods=['POST'])
 def register():
     rate_limit_key = f"register:{_client_ip()}"
-    if _is_rate_limited(rate_limit_key):
-        return jsonify({"message": "Trop de tentatives, veuillez reessayer plus tard"}), 429
+    limited = _rate_limited_response(rate_limit_key)
+    if limited:
+        return limited
 
     try:
         data = validate_register_payload(request.get_json(silent=True))
@@ -104,17 +158,22 @@ def register():
         user.set_password(data['mot_de_passe'])
         
         db.session.add(user)
+        db.session.flush()
+        access_token, refresh_token = _issue_tokens(user.id)
         db.session.commit()
         
-        access_token = create_access_token(identity=str(user.id))
         _clear_attempts(rate_limit_key)
         
         return jsonify({
             "message": "Utilisateur créé",
             "access_token": access_token,
+            "refresh_token": refresh_token,
             "user": user.to_dict()
         }), 201
         
+    except PasswordHasherBusy:
+        db.session.rollback()
+        raise
     except Exception as e:
         db.session.rollback()
         logger.error(f"Erreur inscription: {str(e)}")
@@ -124,8 +183,9 @@ def register():
 @auth_bp.route('/login', methods=['POST'])
 def login():
     rate_limit_key = f"login:{_client_ip()}"
-    if _is_rate_limited(rate_limit_key):
-        return jsonify({"message": "Trop de tentatives, veuillez reessayer plus tard"}), 429
+    limited = _rate_limited_response(rate_limit_key)
+    if limited:
+        return limited
 
     try:
         data = validate_login_payload(request.get_json(silent=True))
@@ -138,15 +198,71 @@ def login():
     if not user or not user.check_password(data['mot_de_passe']):
         _record_attempt(rate_limit_key)
         return jsonify({"message": "Identifiants invalides"}), 401
-    
-    access_token = create_access_token(identity=str(user.id))
+
+    if user.password_needs_rehash():
+        # Coût bcrypt modifié depuis le dernier hachage : mise à niveau transparente
+        try:
+            user.set_password(data['mot_de_passe'])
+            db.session.commit()
+        except Exception as exc:
+            db.session.rollback()
+            logger.warning("Mise à niveau du hash impossible pour %s: %s", user.id, exc)
+
+    try:
+        RefreshToken.purge_expired()
+        access_token, refresh_token = _issue_tokens(user.id)
+        db.session.commit()
+    except Exception as exc:
+        db.session.rollback()
+        logger.error("Erreur émission des jetons: %s", exc)
+        return jsonify({"message": "Erreur serveur"}), 500
     _clear_attempts(rate_limit_key)
     
     return jsonify({
         "access_token": access_token,
+        "refresh_token": refresh_token,
         "user": user.to_dict()
     }), 200
 
+@auth_bp.route('/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+def refresh():
+    # Rotation : le jeton présenté est consommé et remplacé, sans vérification du mot de passe
+    claims = get_jwt()
+    famille = claims.get('fam', claims['jti'])
+    try:
+        if not RefreshToken.consume(claims['jti']):
+            # Jeton déjà utilisé ou révoqué : on suppose un vol et on coupe toute la famille
+            RefreshToken.revoke_family(famille)
+            revocation_list.revoke([family_key(famille)])
+            db.session.commit()
+            logger.warning("Jeton de rafraîchissement rejoué (utilisateur %s)", claims['sub'])
+            return jsonify({"message": "Token revoque"}), 401
+
+        access_token, refresh_token = _issue_tokens(int(claims['sub']), famille)
+        db.session.commit()
+    except Exception as exc:
+        db.session.rollback()
+        logger.error("Erreur rafraîchissement des jetons: %s", exc)
+        return jsonify({"message": "Erreur serveur"}), 500
+
+    return jsonify({"access_token": access_token, "refresh_token": refresh_token}), 200
+
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required(refresh=True)
+def logout():
+    claims = get_jwt()
+    famille = claims.get('fam', claims['jti'])
+    try:
+        RefreshToken.revoke_family(famille)
+        revocation_list.revoke([family_key(famille)])
+        db.session.commit()
+    except Exception as exc:
+        db.session.rollback()
+        logger.error("Erreur déconnexion: %s", exc)
+        return jsonify({"message": "Erreur serveur"}), 500
+    return jsonify({"message": "Déconnecté"}), 200
+
 @auth_bp.route('/profile', methods=['GET'])
 @jwt_required()
 def profile():
@@ -215,13 +331,23 @@ def change_password():
 
     try:
         user.set_password(data['newPassword'])
+        # Toutes les sessions sont déconnectées ; celle-ci reçoit une nouvelle paire de jetons
+        _revoke_sessions(user.id)
+        access_token, refresh_token = _issue_tokens(user.id)
         db.session.commit()
+    except PasswordHasherBusy:
+        db.session.rollback()
+        raise
     except Exception as exc:
         db.session.rollback()
         logger.error("Erreur changement mot de passe: %s", exc)
         return jsonify({"message": "Erreur lors du changement de mot de passe"}), 500
 
-    return jsonify({"message": "Mot de passe mis à jour"}), 200
+    return jsonify({
+        "message": "Mot de passe mis à jour",
+        "access_token": access_token,
+        "refresh_token": refresh_token
+    }), 200
 
 
 @auth_bp.route('/profile/avatar', methods=['POST'])
@@ -236,26 +362,54 @@ def upload_avatar():
     if 'avatar' not in request.files:
         return jsonify({"message": "Aucun fichier fourni"}), 400
 
+    upload = request.files['avatar']
     try:
-        avatar_url = _save_image(request.files['avatar'], 'avatars')
+        avatar_url = _save_image(upload, 'avatars')
     except ValidationError as exc:
         return jsonify({"message": str(exc)}), 400
     except Exception as exc:
         logger.error("Erreur upload avatar: %s", exc)
         return jsonify({"message": "Erreur lors de l'upload de la photo"}), 500
 
-    if user.avatar_url and user.avatar_url != avatar_url:
-        _delete_uploaded_file(user.avatar_url)
+    return _replace_avatar(user, avatar_url, upload)
+
+
+@auth_bp.route('/profile/avatar/direct', methods=['POST'])
+@jwt_required()
+def request_avatar_upload():
+    """Ticket d'envoi direct : la photo va au stockage sans passer par l'API."""
+    user = Utilisateur.query.get(int(get_jwt_identity()))
+    if not user:
+        return jsonify({"message": "Utilisateur non trouvé"}), 404
+    unavailable = _direct_upload_unavailable()
+    if unavailable:
+        return unavailable
 
-    user.avatar_url = avatar_url
     try:
-        db.session.commit()
-    except Exception as exc:
+        ticket = upload_storage.create_direct_upload('avatar', user.id, 'avatars', request.get_json(silent=True))
+    except ValidationError as exc:
+        return jsonify({"message": str(exc)}), 400
+    return jsonify(ticket), 200
+
+
+@auth_bp.route('/profile/avatar/direct/confirm', methods=['POST'])
+@jwt_required()
+def confirm_avatar_upload():
+    user = Utilisateur.query.get(int(get_jwt_identity()))
+    if not user:
+        return jsonify({"message": "Utilisateur non trouvé"}), 404
+
+    try:
+        avatar_url = upload_storage.confirm_direct_upload('avatar', user.id, request.get_json(silent=True))
+    except ValidationError as exc:
         db.session.rollback()
-        logger.error("Erreur sauvegarde avatar: %s", exc)
-        return jsonify({"message": "Erreur lors de la sauvegarde"}), 500
+        return jsonify({"message": str(exc)}), 400
+    except UploadStorageError as exc:
+        db.session.rollback()
+        logger.error("Erreur confirmation avatar: %s", exc)
+        return jsonify({"message": "Stockage des images indisponible"}), 502
 
-    return jsonify(user.to_dict()), 200
+    return _replace_avatar(user, avatar_url)
 
 
 @auth_bp.route('/profile', methods=['DELETE'])
@@ -267,13 +421,11 @@ def delete_account():
     if not user:
         return jsonify({"message": "Utilisateur non trouvé"}), 404
 
-    if user.avatar_url:
-        _delete_uploaded_file(user.avatar_url)
-
     try:
         recettes = Recette.query.filter_by(utilisateur_id=user.id).all()
         inventaires = Inventaire.query.filter_by(utilisateur_id=user.id).all()
         listes = ShoppingList.query.filter_by(utilisateur_id=user.id).all()
+        recette_ids = [recette.id for recette in recettes]
 
         for recette in recettes:
             if recette.image_url:
@@ -286,8 +438,12 @@ def delete_account():
         for liste in listes:
             db.session.delete(liste)
 
+        _revoke_sessions(user.id)
         db.session.delete(user)
+        # Référence libérée dans la transaction : le fichier n'est supprimé qu'après le commit
+        _delete_uploaded_file(user.avatar_url)
         db.session.commit()
+        notify_write(RECIPE_SCOPE, recette_ids)
     except Exception as exc:
         db.session.rollback()
         logger.error("Erreur suppression compte: %s", exc)
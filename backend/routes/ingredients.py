@@ -1,9 +1,21 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from backend.models import db, Ingredient
+from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
 import logging
-from backend.validation import ValidationError, validate_ingredient_payload
+from backend.validation import (
+    ValidationError,
+    validate_ingredient_payload,
+    validate_pagination_args,
+    validate_autocomplete_args,
+)
+from backend.pagination import SortOrder, paginate
+from backend.streaming import stream_query
+from backend.conditional import conditional_get
+from backend.cache import response_cache
+from backend.indexing import notify_write
+from backend.ingredient_index import INGREDIENT_SCOPE, ingredient_index
 
 # Configuration des logs
 logging.basicConfig(level=logging.INFO)
@@ -11,24 +23,68 @@ logger = logging.getLogger(__name__)
 
 ingredients_bp = Blueprint('ingredients', __name__)
 
+INGREDIENT_SORTS = {
+    'nom': SortOrder(Ingredient.nom, Ingredient.id),
+    'recent': SortOrder(Ingredient.date_ajout, Ingredient.id, descending=True),
+}
+
+def _is_duplicate(error: IntegrityError) -> bool:
+    message = str(error).lower()
+    return 'duplicate' in message or 'unique' in message
+
 def _format_integrity_error(error: IntegrityError) -> str:
     message = str(error).lower()
     if 'prix_unitaire' in message and 'null' in message:
         return "Le prix unitaire ne peut pas etre null."
-    if 'duplicate' in message or 'unique' in message:
+    if _is_duplicate(error):
         return "Cet ingrédient existe déjà."
     return "Contrainte de base de données non respectée."
 
+def _integrity_error_response(error: IntegrityError):
+    # Doublon écrit par un autre worker (index local pas encore à jour) : même 409 que la vérification
+    return jsonify({"message": _format_integrity_error(error)}), 409 if _is_duplicate(error) else 400
+
 @ingredients_bp.route('/', methods=['GET'])
+@conditional_get('ingredients')
+@response_cache.cached('ingredients')
 def get_ingredients():
     try:
-        ingredients = Ingredient.query.all()
-        return jsonify([ingredient.to_dict() for ingredient in ingredients]), 200
+        params = validate_pagination_args(request.args, INGREDIENT_SORTS, 'nom')
+        if params['limit'] is None:
+            # Catalogue complet : tableau JSON (ou NDJSON) diffusé par paquets pour garder la mémoire
+            # constante. Avec limit ou cursor, la réponse est l'objet {"ingredients", "next_cursor"}.
+            query = Ingredient.query.order_by(*INGREDIENT_SORTS[params['sort']].order_by())
+            return stream_query(query, Ingredient.to_dict)
+
+        ingredients, next_cursor = paginate(Ingredient.query, INGREDIENT_SORTS, params)
+        return jsonify({
+            "ingredients": [ingredient.to_dict() for ingredient in ingredients],
+            "next_cursor": next_cursor
+        }), 200
+    except ValidationError as exc:
+        return jsonify({"message": str(exc)}), 400
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des ingrédients: {str(e)}")
         return jsonify({"message": "Erreur serveur"}), 500
 
+@ingredients_bp.route('/autocomplete', methods=['GET'])
+def autocomplete_ingredients():
+    try:
+        params = validate_autocomplete_args(request.args)
+    except ValidationError as exc:
+        return jsonify({"message": str(exc)}), 400
+
+    ingredient_index.ensure_fresh()
+    return jsonify({
+        "ingredients": [
+            {"id": ingredient_id, "nom": nom, "unite": unite}
+            for ingredient_id, nom, unite in ingredient_index.suggest(params['q'], params['limit'])
+        ]
+    }), 200
+
 @ingredients_bp.route('/<int:ingredient_id>', methods=['GET'])
+@conditional_get('ingredients')
+@response_cache.cached('ingredients')
 def get_ingredient(ingredient_id):
     try:
         ingredient = Ingredient.query.get_or_404(ingredient_id)
@@ -45,9 +101,21 @@ def create_ingredient():
     except ValidationError as exc:
         return jsonify({"message": str(exc)}), 400
     
-    if Ingredient.query.filter_by(nom=data['nom']).first():
-        return jsonify({"message": "Cet ingrédient existe déjà"}), 409
-    
+    # Conflit seulement si la contrainte unique sur nom échouerait : la comparaison est faite par
+    # la base, avec sa collation (recherche indexée)
+    existant = db.session.execute(
+        select(Ingredient.id, Ingredient.nom).where(Ingredient.nom == data['nom']).limit(1)
+    ).first()
+    if existant:
+        return jsonify({
+            "message": "Cet ingrédient existe déjà",
+            "ingredient_existant": {"id": existant[0], "nom": existant[1]}
+        }), 409
+
+    # Noms proches (accents, ponctuation, fautes de frappe) : signalés, sans bloquer la création
+    ingredient_index.ensure_fresh()
+    doublons = ingredient_index.near_duplicates(data['nom'])
+
     try:
         ingredient = Ingredient(
             nom=data['nom'],
@@ -56,11 +124,19 @@ def create_ingredient():
         )
         db.session.add(ingredient)
         db.session.commit()
-        return jsonify(ingredient.to_dict()), 201
+        notify_write(INGREDIENT_SCOPE, [ingredient.id])
+
+        response = ingredient.to_dict()
+        if doublons:
+            response['doublons_possibles'] = [
+                {"id": ingredient_id, "nom": nom, "similarite": similarite}
+                for ingredient_id, nom, similarite in doublons
+            ]
+        return jsonify(response), 201
     except IntegrityError as exc:
         db.session.rollback()
         logger.error(f"Erreur création ingrédient: {exc}")
-        return jsonify({"message": _format_integrity_error(exc)}), 400
+        return _integrity_error_response(exc)
     except Exception as e:
         db.session.rollback()
         logger.error(f"Erreur création ingrédient: {str(e)}")
@@ -74,6 +150,7 @@ def update_ingredient(ingredient_id):
         data = validate_ingredient_payload(request.get_json(silent=True), partial=True)
         
         if 'nom' in data:
+            # Même comparaison que la contrainte unique sur nom, faite par la base
             if Ingredient.query.filter(Ingredient.nom == data['nom'], Ingredient.id != ingredient_id).first():
                 return jsonify({"message": "Nom déjà utilisé"}), 409
             ingredient.nom = data['nom']
@@ -85,13 +162,14 @@ def update_ingredient(ingredient_id):
             ingredient.prix_unitaire = data['prix_unitaire']
         
         db.session.commit()
+        notify_write(INGREDIENT_SCOPE, [ingredient_id])
         return jsonify(ingredient.to_dict()), 200
     except ValidationError as exc:
         return jsonify({"message": str(exc)}), 400
     except IntegrityError as exc:
         db.session.rollback()
         logger.error(f"Erreur mise à jour ingrédient: {exc}")
-        return jsonify({"message": _format_integrity_error(exc)}), 400
+        return _integrity_error_response(exc)
     except Exception as e:
         db.session.rollback()
         logger.error(f"Erreur mise à jour ingrédient: {str(e)}")
@@ -104,6 +182,7 @@ def delete_ingredient(ingredient_id):
         ingredient = Ingredient.query.get_or_404(ingredient_id)
         db.session.delete(ingredient)
         db.session.commit()
+        notify_write(INGREDIENT_SCOPE, [ingredient_id])
         return jsonify({"message": "Ingrédient supprimé"}), 200
     except Exception as e:
         db.session.rollback()
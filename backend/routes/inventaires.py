@@ -1,12 +1,16 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from backend.models import db, Inventaire, InventaireIngredient, Ingredient
+from sqlalchemy import insert
+from backend.models import db, Inventaire, InventaireIngredient, Ingredient, diff_ingredient_links
 import logging
 from backend.validation import (
+    DEFAULT_PAGE_LIMIT,
     ValidationError,
     validate_inventory_payload,
     validate_inventory_quantity_payload,
+    validate_pagination_args,
 )
+from backend.pagination import SortOrder, paginate
 
 # Configuration des logs
 logging.basicConfig(level=logging.INFO)
@@ -14,23 +18,36 @@ logger = logging.getLogger(__name__)
 
 inventaires_bp = Blueprint('inventaires', __name__)
 
+INVENTAIRE_SORTS = {
+    'recent': SortOrder(Inventaire.date_creation, Inventaire.id, descending=True),
+    'ancien': SortOrder(Inventaire.date_creation, Inventaire.id),
+    'nom': SortOrder(Inventaire.nom, Inventaire.id),
+}
+
 @inventaires_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_inventaires():
     user_id = int(get_jwt_identity())
     
     # Obtenir les inventaires de l'utilisateur
-    inventaires = Inventaire.query.filter_by(utilisateur_id=user_id).all()
+    try:
+        params = validate_pagination_args(request.args, INVENTAIRE_SORTS, 'recent', DEFAULT_PAGE_LIMIT)
+        inventaires, next_cursor = paginate(
+            Inventaire.query_loaded().filter_by(utilisateur_id=user_id), INVENTAIRE_SORTS, params
+        )
+    except ValidationError as exc:
+        return jsonify({"message": str(exc)}), 400
     
     return jsonify({
-        "inventaires": [inventaire.to_dict() for inventaire in inventaires]
+        "inventaires": [inventaire.to_dict() for inventaire in inventaires],
+        "next_cursor": next_cursor
     }), 200
 
 @inventaires_bp.route('/<int:inventaire_id>', methods=['GET'])
 @jwt_required()
 def get_inventaire(inventaire_id):
     user_id = int(get_jwt_identity())
-    inventaire = Inventaire.query.get(inventaire_id)
+    inventaire = Inventaire.query_loaded(with_ingredients=True).filter_by(id=inventaire_id).first()
     
     if not inventaire:
         return jsonify({"message": "Inventaire non trouvé"}), 404
@@ -50,33 +67,39 @@ def create_inventaire():
     except ValidationError as exc:
         return jsonify({"message": str(exc)}), 400
     
+    ingredients = data.get('ingredients', [])
+    unknown = Ingredient.unknown_ids([item['id'] for item in ingredients])
+    if unknown:
+        return jsonify({"message": "Ingrédients inconnus", "ingredients_inconnus": unknown}), 400
+    
     try:
-        # Création de l'inventaire
+        # Création de l'inventaire et de ses lignes dans une seule transaction
         nouvel_inventaire = Inventaire(
             nom=data['nom'],
             utilisateur_id=user_id
         )
         
         db.session.add(nouvel_inventaire)
-        db.session.commit()
+        db.session.flush()
+        inventaire_id = nouvel_inventaire.id
         
-        # Ajouter les ingrédients si fournis
-        if 'ingredients' in data and isinstance(data['ingredients'], list):
-            for ingredient_data in data['ingredients']:
-                ingredient = Ingredient.query.get(ingredient_data['id'])
-                if ingredient:
-                    inventaire_ingredient = InventaireIngredient(
-                        inventaire_id=nouvel_inventaire.id,
-                        ingredient_id=ingredient.id,
-                        quantite_disponible=ingredient_data['quantite_disponible']
-                    )
-                    db.session.add(inventaire_ingredient)
-            
-            db.session.commit()
+        # Ajouter les ingrédients si fournis, en un seul INSERT multi-lignes
+        if ingredients:
+            db.session.execute(insert(InventaireIngredient), [
+                {
+                    'inventaire_id': inventaire_id,
+                    'ingredient_id': item['id'],
+                    'quantite_disponible': item['quantite_disponible']
+                }
+                for item in ingredients
+            ])
         
+        db.session.commit()
+        
+        inventaire = Inventaire.query_loaded(with_ingredients=True).filter_by(id=inventaire_id).first()
         return jsonify({
             "message": "Inventaire créé avec succès",
-            "inventaire": nouvel_inventaire.to_dict(with_ingredients=True)
+            "inventaire": inventaire.to_dict(with_ingredients=True)
         }), 201
         
     except Exception as e:
@@ -88,7 +111,7 @@ def create_inventaire():
 @jwt_required()
 def update_inventaire(inventaire_id):
     user_id = int(get_jwt_identity())
-    inventaire = Inventaire.query.get(inventaire_id)
+    inventaire = Inventaire.query_loaded(with_ingredients=True).filter_by(id=inventaire_id).first()
     
     if not inventaire:
         return jsonify({"message": "Inventaire non trouvé"}), 404
@@ -102,29 +125,42 @@ def update_inventaire(inventaire_id):
     except ValidationError as exc:
         return jsonify({"message": str(exc)}), 400
     
+    # Différence entre les lignes existantes et la nouvelle liste : seules les lignes modifiées sont écrites
+    to_add, to_update, to_remove = {}, [], []
+    if 'ingredients' in data:
+        wanted = {item['id']: item['quantite_disponible'] for item in data['ingredients']}
+        to_add, to_update, to_remove = diff_ingredient_links(inventaire.ingredients, wanted, 'quantite_disponible')
+        unknown = Ingredient.unknown_ids(to_add)
+        if unknown:
+            return jsonify({"message": "Ingrédients inconnus", "ingredients_inconnus": unknown}), 400
+    
     try:
+        changed = bool(to_add or to_update or to_remove)
+        
         # Mise à jour des informations de l'inventaire
-        if 'nom' in data:
+        if 'nom' in data and inventaire.nom != data['nom']:
             inventaire.nom = data['nom']
+            changed = True
+        
+        if not changed:
+            return jsonify({
+                "message": "Aucune modification",
+                "inventaire": inventaire.to_dict(with_ingredients=True)
+            }), 200
         
         # Mise à jour des ingrédients si fournis
-        if 'ingredients' in data and isinstance(data['ingredients'], list):
-            # Supprimer les anciens ingrédients
-            InventaireIngredient.query.filter_by(inventaire_id=inventaire.id).delete()
-            
-            # Ajouter les nouveaux ingrédients
-            for ingredient_data in data['ingredients']:
-                ingredient = Ingredient.query.get(ingredient_data['id'])
-                if ingredient:
-                    inventaire_ingredient = InventaireIngredient(
-                        inventaire_id=inventaire.id,
-                        ingredient_id=ingredient.id,
-                        quantite_disponible=ingredient_data['quantite_disponible']
-                    )
-                    db.session.add(inventaire_ingredient)
+        for ii, quantite in to_update:
+            ii.quantite_disponible = quantite
+        for ii in to_remove:
+            inventaire.ingredients.remove(ii)
+        for ingredient_id, quantite in to_add.items():
+            inventaire.ingredients.append(
+                InventaireIngredient(ingredient_id=ingredient_id, quantite_disponible=quantite)
+            )
         
         db.session.commit()
         
+        inventaire = Inventaire.query_loaded(with_ingredients=True).filter_by(id=inventaire_id).first()
         return jsonify({
             "message": "Inventaire mis à jour avec succès",
             "inventaire": inventaire.to_dict(with_ingredients=True)
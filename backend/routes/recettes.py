@@ -1,12 +1,34 @@
-import os
-import uuid
-from urllib.parse import urlparse
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from backend.models import db, Recette, Ingredient, RecetteIngredient
+from sqlalchemy import insert, select
+from backend.models import (
+    db,
+    Recette,
+    Ingredient,
+    RecetteIngredient,
+    Inventaire,
+    InventaireIngredient,
+    diff_ingredient_links,
+)
 import logging
-from backend.validation import ValidationError, validate_recipe_payload
-from backend.uploads import validate_image_upload, upload_to_cloudinary
+from backend.validation import (
+    DEFAULT_PAGE_LIMIT,
+    ValidationError,
+    validate_recipe_payload,
+    validate_pagination_args,
+    validate_cookable_args,
+    validate_search_args,
+)
+from backend.uploads import validate_image_upload, local_upload_path
+from backend.upload_store import save_upload, release_upload, upload_storage, UploadStorageError
+from backend.images import image_pipeline
+from backend.remote_uploads import upload_queue
+from backend.pagination import SortOrder, paginate
+from backend.conditional import conditional_get
+from backend.cache import response_cache
+from backend.cook_index import RECIPE_SCOPE, recipe_index
+from backend.indexing import notify_write
+from backend.search_index import search_index
 
 # Configuration des logs
 logging.basicConfig(level=logging.INFO)
@@ -14,61 +36,170 @@ logger = logging.getLogger(__name__)
 
 recettes_bp = Blueprint('recettes', __name__)
 
+RECETTE_SORTS = {
+    'recent': SortOrder(Recette.date_creation, Recette.id, descending=True),
+    'ancien': SortOrder(Recette.date_creation, Recette.id),
+    'nom': SortOrder(Recette.nom, Recette.id),
+}
+
 
 def _save_image(file_storage, subdir):
     ext = validate_image_upload(file_storage, current_app.config.get('ALLOWED_IMAGE_EXTENSIONS', set()))
+    if upload_queue.synchronous:
+        # Déploiement serverless : envoi vers Cloudinary dans la requête, sans fichier local
+        return upload_queue.upload_now(file_storage, f"recetteo/{subdir}")
+    return save_upload(file_storage, subdir, ext)
 
-    cloud_url = upload_to_cloudinary(file_storage, f"recetteo/{subdir}")
-    if cloud_url:
-        return cloud_url
-
-    unique_name = f"{uuid.uuid4().hex}.{ext}"
-    upload_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], subdir)
-    os.makedirs(upload_dir, exist_ok=True)
-    file_path = os.path.join(upload_dir, unique_name)
-    file_storage.save(file_path)
 
-    public_path = f"{subdir}/{unique_name}"
-    public_url = f"{request.host_url.rstrip('/')}/uploads/{public_path}"
-    return public_url
+def _direct_upload_unavailable():
+    # En mode sync, un envoi direct vers le disque local ne serait jamais transmis à Cloudinary
+    if upload_queue.synchronous and upload_storage.backend.local:
+        return jsonify({"message": "Envoi direct indisponible, utiliser l'upload multipart"}), 501
+    return None
 
 
 def _delete_uploaded_file(file_url):
     if not file_url:
         return
-    parsed = urlparse(file_url)
-    path = parsed.path or ''
-    if not path.startswith('/uploads/'):
-        return
-    relative = path.replace('/uploads/', '', 1)
-    full_path = os.path.join(current_app.config['UPLOAD_FOLDER'], relative)
-    if os.path.isfile(full_path):
-        try:
-            os.remove(full_path)
-        except OSError:
-            logger.warning("Impossible de supprimer le fichier upload %s", full_path)
+    release_upload(file_url)
+
+
+def _store_image_placeholder(recette_id, image_url, placeholder):
+    if Recette.set_image_placeholder(recette_id, image_url, placeholder):
+        db.session.commit()
+        notify_write(RECIPE_SCOPE, [recette_id])
+
 
 @recettes_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_recettes():
     user_id = int(get_jwt_identity())
-    recettes = Recette.query.filter_by(utilisateur_id=user_id).all()
+    try:
+        params = validate_pagination_args(request.args, RECETTE_SORTS, 'recent', DEFAULT_PAGE_LIMIT)
+        recettes, next_cursor = paginate(
+            Recette.query_loaded().filter_by(utilisateur_id=user_id), RECETTE_SORTS, params
+        )
+    except ValidationError as exc:
+        return jsonify({"message": str(exc)}), 400
+
     return jsonify({
-        "recettes": [recette.to_dict() for recette in recettes]
+        "recettes": [recette.to_dict() for recette in recettes],
+        "next_cursor": next_cursor
     }), 200
 
 @recettes_bp.route('/publiques', methods=['GET'])
+@conditional_get('recettes')
+@response_cache.cached('recettes')
 def get_recettes_publiques():
-    recettes_publiques = Recette.query.filter_by(est_publique=True).all()
+    try:
+        params = validate_pagination_args(request.args, RECETTE_SORTS, 'recent', DEFAULT_PAGE_LIMIT)
+        recettes_publiques, next_cursor = paginate(
+            Recette.query_loaded().filter_by(est_publique=True), RECETTE_SORTS, params
+        )
+    except ValidationError as exc:
+        return jsonify({"message": str(exc)}), 400
+
+    return jsonify({
+        "recettes": [recette.to_dict() for recette in recettes_publiques],
+        "next_cursor": next_cursor
+    }), 200
+
+@recettes_bp.route('/recherche', methods=['GET'])
+@jwt_required(optional=True)
+def search_recettes():
+    identity = get_jwt_identity()
+    user_id = int(identity) if identity is not None else None
+    try:
+        params = validate_search_args(request.args)
+    except ValidationError as exc:
+        return jsonify({"message": str(exc)}), 400
+
+    # Recherche et facettes calculées sur l'index en mémoire ; seule la page est lue en base
+    search_index.ensure_fresh()
+    total, page, facettes = search_index.search(
+        params['q'],
+        user_id,
+        avec=params['avec'],
+        sans=params['sans'],
+        temps_preparation=params['temps_preparation'],
+        temps_cuisson=params['temps_cuisson'],
+        offset=params['offset'],
+        limit=params['limit'],
+    )
+    recettes = {
+        recette.id: recette
+        for recette in Recette.query_loaded().filter(Recette.id.in_([item[0] for item in page])).all()
+    }
+    noms = dict(db.session.execute(
+        select(Ingredient.id, Ingredient.nom)
+        .where(Ingredient.id.in_([ingredient_id for ingredient_id, _ in facettes['ingredients']]))
+    ).all())
+
     return jsonify({
-        "recettes": [recette.to_dict() for recette in recettes_publiques]
+        "total": total,
+        "recettes": [
+            {"recette": recettes[recette_id].to_dict(), "score": round(score, 4)}
+            for recette_id, score in page
+            if recette_id in recettes
+        ],
+        "facettes": {
+            "ingredients": [
+                {"id": ingredient_id, "nom": noms.get(ingredient_id), "nombre": nombre}
+                for ingredient_id, nombre in facettes['ingredients']
+            ],
+            "temps_preparation": facettes['temps_preparation'],
+            "temps_cuisson": facettes['temps_cuisson'],
+        },
+    }), 200
+
+@recettes_bp.route('/cuisinables/<int:inventaire_id>', methods=['GET'])
+@jwt_required()
+def get_recettes_cuisinables(inventaire_id):
+    user_id = int(get_jwt_identity())
+    try:
+        params = validate_cookable_args(request.args)
+    except ValidationError as exc:
+        return jsonify({"message": str(exc)}), 400
+
+    inventaire = Inventaire.query.get(inventaire_id)
+    if not inventaire:
+        return jsonify({"message": "Inventaire non trouvé"}), 404
+
+    if inventaire.utilisateur_id != user_id:
+        return jsonify({"message": "Vous n'êtes pas autorisé à accéder à cet inventaire"}), 403
+
+    stock = dict(db.session.execute(
+        select(InventaireIngredient.ingredient_id, InventaireIngredient.quantite_disponible)
+        .where(InventaireIngredient.inventaire_id == inventaire_id)
+    ).all())
+
+    # Classement via l'index inversé en mémoire, puis chargement des seules recettes retenues
+    recipe_index.ensure_fresh()
+    classement = recipe_index.rank(stock, user_id, params['max_manquants'], params['limit'])
+    recettes = {
+        recette.id: recette
+        for recette in Recette.query_loaded().filter(Recette.id.in_([item[0] for item in classement])).all()
+    }
+
+    return jsonify({
+        "recettes": [
+            {
+                "recette": recettes[recette_id].to_dict(),
+                "nombre_ingredients": total,
+                "nombre_manquants": manquants,
+                "ingredients_manquants": recipe_index.missing_ingredients(recette_id, stock),
+            }
+            for recette_id, manquants, total in classement
+            if recette_id in recettes
+        ]
     }), 200
 
 @recettes_bp.route('/<int:recette_id>', methods=['GET'])
 @jwt_required()
+@conditional_get('recettes', per_user=True)
 def get_recette(recette_id):
     user_id = int(get_jwt_identity())
-    recette = Recette.query.get(recette_id)
+    recette = Recette.query_loaded(with_ingredients=True).filter_by(id=recette_id).first()
 
     if not recette:
         return jsonify({"message": "Recette non trouvée"}), 404
@@ -87,7 +218,13 @@ def create_recette():
     except ValidationError as exc:
         return jsonify({"message": str(exc)}), 400
 
+    ingredients = data.get('ingredients', [])
+    unknown = Ingredient.unknown_ids([item['id'] for item in ingredients])
+    if unknown:
+        return jsonify({"message": "Ingrédients inconnus", "ingredients_inconnus": unknown}), 400
+
     try:
+        # Une seule transaction : la recette n'est visible qu'avec tous ses ingrédients
         nouvelle_recette = Recette(
             nom=data['nom'],
             description=data['description'],
@@ -97,25 +234,24 @@ def create_recette():
             utilisateur_id=user_id
         )
         db.session.add(nouvelle_recette)
-        db.session.commit()
+        db.session.flush()
+        recette_id = nouvelle_recette.id
 
-        if 'ingredients' in data and isinstance(data['ingredients'], list):
-            for ingredient_data in data['ingredients']:
-                ingredient = Ingredient.query.get(ingredient_data['id'])
-                if ingredient and not nouvelle_recette.ajouter_ingredient(ingredient, ingredient_data['quantite']):
-                    raise ValueError("Impossible d'ajouter un ingrédient à la recette")
+        if ingredients:
+            db.session.execute(insert(RecetteIngredient), [
+                {'recette_id': recette_id, 'ingredient_id': item['id'], 'quantite': item['quantite']}
+                for item in ingredients
+            ])
 
         db.session.commit()
+        notify_write(RECIPE_SCOPE, [recette_id])
 
+        recette = Recette.query_loaded(with_ingredients=True).filter_by(id=recette_id).first()
         return jsonify({
             "message": "Recette créée avec succès",
-            "recette": nouvelle_recette.to_dict(with_ingredients=True)
+            "recette": recette.to_dict(with_ingredients=True)
         }), 201
 
-    except ValueError as exc:
-        db.session.rollback()
-        logger.error(f"Erreur lors de la création de la recette: {exc}")
-        return jsonify({"message": str(exc)}), 400
     except Exception as e:
         db.session.rollback()
         logger.error(f"Erreur lors de la création de la recette: {e}")
@@ -125,7 +261,7 @@ def create_recette():
 @jwt_required()
 def update_recette(recette_id):
     user_id = int(get_jwt_identity())
-    recette = Recette.query.get(recette_id)
+    recette = Recette.query_loaded(with_ingredients=True).filter_by(id=recette_id).first()
 
     if not recette:
         return jsonify({"message": "Recette non trouvée"}), 404
@@ -138,36 +274,44 @@ def update_recette(recette_id):
     except ValidationError as exc:
         return jsonify({"message": str(exc)}), 400
 
+    # Seules les lignes réellement modifiées sont écrites (INSERT/UPDATE/DELETE minimaux)
+    to_add, to_update, to_remove = {}, [], []
+    if 'ingredients' in data:
+        wanted = {item['id']: item['quantite'] for item in data['ingredients']}
+        to_add, to_update, to_remove = diff_ingredient_links(recette.ingredients, wanted, 'quantite')
+        unknown = Ingredient.unknown_ids(to_add)
+        if unknown:
+            return jsonify({"message": "Ingrédients inconnus", "ingredients_inconnus": unknown}), 400
+
     try:
-        if 'nom' in data:
-            recette.nom = data['nom']
-        if 'description' in data:
-            recette.description = data['description']
-        if 'temps_preparation' in data:
-            recette.temps_preparation = data['temps_preparation']
-        if 'temps_cuisson' in data:
-            recette.temps_cuisson = data['temps_cuisson']
-        if 'est_publique' in data:
-            recette.est_publique = data['est_publique']
-
-        if 'ingredients' in data and isinstance(data['ingredients'], list):
-            RecetteIngredient.query.filter_by(recette_id=recette.id).delete()
-            for ingredient_data in data['ingredients']:
-                ingredient = Ingredient.query.get(ingredient_data['id'])
-                if ingredient and not recette.ajouter_ingredient(ingredient, ingredient_data['quantite']):
-                    raise ValueError("Impossible d'ajouter un ingrédient à la recette")
+        changed = bool(to_add or to_update or to_remove)
+        for field in ('nom', 'description', 'temps_preparation', 'temps_cuisson', 'est_publique'):
+            if field in data and getattr(recette, field) != data[field]:
+                setattr(recette, field, data[field])
+                changed = True
+
+        if not changed:
+            return jsonify({
+                "message": "Aucune modification",
+                "recette": recette.to_dict(with_ingredients=True)
+            }), 200
+
+        for ri, quantite in to_update:
+            ri.quantite = quantite
+        for ri in to_remove:
+            recette.ingredients.remove(ri)
+        for ingredient_id, quantite in to_add.items():
+            recette.ingredients.append(RecetteIngredient(ingredient_id=ingredient_id, quantite=quantite))
 
         db.session.commit()
+        notify_write(RECIPE_SCOPE, [recette_id])
 
+        recette = Recette.query_loaded(with_ingredients=True).filter_by(id=recette_id).first()
         return jsonify({
             "message": "Recette mise à jour avec succès",
             "recette": recette.to_dict(with_ingredients=True)
         }), 200
 
-    except ValueError as exc:
-        db.session.rollback()
-        logger.error(f"Erreur lors de la mise à jour de la recette: {exc}")
-        return jsonify({"message": str(exc)}), 400
     except Exception as e:
         db.session.rollback()
         logger.error(f"Erreur lors de la mise à jour de la recette: {e}")
@@ -190,6 +334,7 @@ def delete_recette(recette_id):
             _delete_uploaded_file(recette.image_url)
         db.session.delete(recette)
         db.session.commit()
+        notify_write(RECIPE_SCOPE, [recette_id])
 
         return jsonify({
             "message": "Recette supprimée avec succès"
@@ -201,41 +346,110 @@ def delete_recette(recette_id):
         return jsonify({"message": "Une erreur est survenue lors de la suppression de la recette"}), 500
 
 
-@recettes_bp.route('/<int:recette_id>/image', methods=['POST'])
-@jwt_required()
-def upload_recette_image(recette_id):
+def _owned_recette(recette_id):
+    """Recette modifiable par l'utilisateur courant, ou réponse d'erreur."""
     user_id = int(get_jwt_identity())
-    recette = Recette.query.get(recette_id)
+    recette = Recette.query_loaded(with_ingredients=True).filter_by(id=recette_id).first()
 
     if not recette:
-        return jsonify({"message": "Recette non trouvée"}), 404
+        return None, (jsonify({"message": "Recette non trouvée"}), 404)
 
     if recette.utilisateur_id != user_id:
-        return jsonify({"message": "Vous n'êtes pas autorisé à modifier cette recette"}), 403
-
-    if 'image' not in request.files:
-        return jsonify({"message": "Aucun fichier fourni"}), 400
+        return None, (jsonify({"message": "Vous n'êtes pas autorisé à modifier cette recette"}), 403)
+    return recette, None
 
-    try:
-        image_url = _save_image(request.files['image'], 'recipes')
-    except ValidationError as exc:
-        return jsonify({"message": str(exc)}), 400
-    except Exception as exc:
-        logger.error("Erreur upload image recette: %s", exc)
-        return jsonify({"message": "Erreur lors de l'upload de l'image"}), 500
 
-    if recette.image_url and recette.image_url != image_url:
-        _delete_uploaded_file(recette.image_url)
+def _replace_recette_image(recette, image_url, upload=None):
+    """Associe image_url (référence déjà prise) à la recette et planifie ses dérivés."""
+    recette_id = recette.id
+    # Libère l'ancienne référence, même si le contenu est identique (la nouvelle a été prise)
+    _delete_uploaded_file(recette.image_url)
 
     recette.image_url = image_url
+    recette.image_placeholder = None
+    # Réponse immédiate avec l'URL locale ; l'envoi vers Cloudinary se fait en arrière-plan
+    upload_queue.enqueue('recette', recette_id, image_url, 'recetteo/recipes')
     try:
         db.session.commit()
     except Exception as exc:
         db.session.rollback()
         logger.error("Erreur sauvegarde image recette: %s", exc)
         return jsonify({"message": "Erreur lors de la sauvegarde"}), 500
+    notify_write(RECIPE_SCOPE, [recette_id])
+
+    def on_done(placeholder):
+        _store_image_placeholder(recette_id, image_url, placeholder)
+
+    if upload is not None:
+        image_pipeline.submit(upload, image_url, on_done)
+    else:
+        path = local_upload_path(image_url, current_app.config['UPLOAD_FOLDER'])
+        if path is not None:
+            image_pipeline.submit_file(path, image_url, on_done)
+
+    recette = Recette.query_loaded(with_ingredients=True).filter_by(id=recette_id).first()
 
     return jsonify({
         "message": "Image recette mise à jour",
         "recette": recette.to_dict(with_ingredients=True)
     }), 200
+
+
+@recettes_bp.route('/<int:recette_id>/image', methods=['POST'])
+@jwt_required()
+def upload_recette_image(recette_id):
+    recette, error = _owned_recette(recette_id)
+    if error:
+        return error
+
+    if 'image' not in request.files:
+        return jsonify({"message": "Aucun fichier fourni"}), 400
+
+    upload = request.files['image']
+    try:
+        image_url = _save_image(upload, 'recipes')
+    except ValidationError as exc:
+        return jsonify({"message": str(exc)}), 400
+    except Exception as exc:
+        logger.error("Erreur upload image recette: %s", exc)
+        return jsonify({"message": "Erreur lors de l'upload de l'image"}), 500
+
+    return _replace_recette_image(recette, image_url, upload)
+
+
+@recettes_bp.route('/<int:recette_id>/image/direct', methods=['POST'])
+@jwt_required()
+def request_recette_image_upload(recette_id):
+    """Ticket d'envoi direct : l'image va au stockage sans passer par l'API."""
+    recette, error = _owned_recette(recette_id)
+    if error:
+        return error
+    unavailable = _direct_upload_unavailable()
+    if unavailable:
+        return unavailable
+
+    try:
+        ticket = upload_storage.create_direct_upload('recette', recette_id, 'recipes', request.get_json(silent=True))
+    except ValidationError as exc:
+        return jsonify({"message": str(exc)}), 400
+    return jsonify(ticket), 200
+
+
+@recettes_bp.route('/<int:recette_id>/image/direct/confirm', methods=['POST'])
+@jwt_required()
+def confirm_recette_image_upload(recette_id):
+    recette, error = _owned_recette(recette_id)
+    if error:
+        return error
+
+    try:
+        image_url = upload_storage.confirm_direct_upload('recette', recette_id, request.get_json(silent=True))
+    except ValidationError as exc:
+        db.session.rollback()
+        return jsonify({"message": str(exc)}), 400
+    except UploadStorageError as exc:
+        db.session.rollback()
+        logger.error("Erreur confirmation image recette: %s", exc)
+        return jsonify({"message": "Stockage des images indisponible"}), 502
+
+    return _replace_recette_image(recette, image_url)
@@ -1,8 +1,18 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from backend.models import db, ShoppingList, ShoppingListItem, Recette, Inventaire, InventaireIngredient, Ingredient, RecetteIngredient
+from sqlalchemy import select
+from datetime import datetime
+from backend.models import db, ShoppingList, ShoppingListItem, Recette, Inventaire, Ingredient, RecetteIngredient
 import logging
-from backend.validation import ValidationError, validate_shopping_item_payload
+from backend.validation import (
+    DEFAULT_PAGE_LIMIT,
+    ValidationError,
+    validate_shopping_item_payload,
+    validate_pagination_args,
+    validate_generate_payload,
+    validate_meal_plan_payload,
+)
+from backend.pagination import SortOrder, paginate
 
 # Configuration des logs
 logging.basicConfig(level=logging.INFO)
@@ -10,23 +20,41 @@ logger = logging.getLogger(__name__)
 
 shopping_bp = Blueprint('shopping', __name__)
 
+SHOPPING_LIST_SORTS = {
+    'recent': SortOrder(ShoppingList.date_creation, ShoppingList.id, descending=True),
+    'ancien': SortOrder(ShoppingList.date_creation, ShoppingList.id),
+}
+
 @shopping_bp.route('/lists', methods=['GET'])
 @jwt_required()
 def get_shopping_lists():
     user_id = int(get_jwt_identity())
     
     # Obtenir les listes de courses de l'utilisateur
-    shopping_lists = ShoppingList.query.filter_by(utilisateur_id=user_id).all()
+    try:
+        params = validate_pagination_args(request.args, SHOPPING_LIST_SORTS, 'recent', DEFAULT_PAGE_LIMIT)
+        shopping_lists, next_cursor = paginate(
+            ShoppingList.query.filter_by(utilisateur_id=user_id), SHOPPING_LIST_SORTS, params
+        )
+    except ValidationError as exc:
+        return jsonify({"message": str(exc)}), 400
     
+    # Résumés uniquement : les totaux viennent d'une requête groupée, le détail des articles
+    # n'est chargé que par GET /lists/<id>
+    totals = ShoppingList.summary_totals([shopping_list.id for shopping_list in shopping_lists])
     return jsonify({
-        "listes_courses": [shopping_list.to_dict() for shopping_list in shopping_lists]
+        "listes_courses": [
+            shopping_list.to_summary_dict(totals.get(shopping_list.id))
+            for shopping_list in shopping_lists
+        ],
+        "next_cursor": next_cursor
     }), 200
 
 @shopping_bp.route('/lists/<int:liste_id>', methods=['GET'])
 @jwt_required()
 def get_shopping_list(liste_id):
     user_id = int(get_jwt_identity())
-    shopping_list = ShoppingList.query.get(liste_id)
+    shopping_list = ShoppingList.query_loaded().filter_by(id=liste_id).first()
     
     if not shopping_list:
         return jsonify({"message": "Liste de courses non trouvée"}), 404
@@ -65,7 +93,7 @@ def create_shopping_list():
 @jwt_required()
 def add_item_to_list(liste_id):
     user_id = int(get_jwt_identity())
-    shopping_list = ShoppingList.query.get(liste_id)
+    shopping_list = ShoppingList.query_loaded().filter_by(id=liste_id).first()
     
     if not shopping_list:
         return jsonify({"message": "Liste de courses non trouvée"}), 404
@@ -106,6 +134,7 @@ def add_item_to_list(liste_id):
         
         db.session.commit()
         
+        shopping_list = ShoppingList.query_loaded().filter_by(id=liste_id).first()
         return jsonify({
             "message": "Article ajouté à la liste de courses avec succès",
             "liste_courses": shopping_list.to_dict()
@@ -214,16 +243,54 @@ def delete_shopping_list(liste_id):
         logger.error(f"Erreur lors de la suppression de la liste de courses: {e}")
         return jsonify({"message": "Une erreur est survenue lors de la suppression de la liste de courses"}), 500
 
+def _target_list(user_id, liste_id):
+    """Liste cible d'une génération : (liste existante ou None pour une nouvelle liste, réponse d'erreur)."""
+    if liste_id is None:
+        return None, None
+    shopping_list = ShoppingList.query.get(liste_id)
+    if not shopping_list:
+        return None, (jsonify({"message": "Liste de courses non trouvée"}), 404)
+    if shopping_list.utilisateur_id != user_id:
+        return None, (jsonify({"message": "Vous n'êtes pas autorisé à modifier cette liste"}), 403)
+    return shopping_list, None
+
+def _fill_list(shopping_list, manquants, user_id):
+    """Fusionne les quantités manquantes dans la liste (créée si None), valide et retourne
+    (liste rechargée avec ses articles, code HTTP)."""
+    if shopping_list is None:
+        shopping_list = ShoppingList(utilisateur_id=user_id)
+        db.session.add(shopping_list)
+        db.session.flush()
+        status = 201
+    else:
+        if manquants:
+            shopping_list.date_mise_a_jour = datetime.utcnow()
+        status = 200
+    
+    liste_id = shopping_list.id
+    shopping_list.merge_quantities(manquants)
+    db.session.commit()
+    
+    return ShoppingList.query_loaded().filter_by(id=liste_id).first(), status
+
 @shopping_bp.route('/generate/<int:recette_id>/<int:inventaire_id>', methods=['POST'])
 @jwt_required()
 def generate_shopping_list(recette_id, inventaire_id):
     user_id = int(get_jwt_identity())
     
-    # Vérifier si la recette existe
+    try:
+        data = validate_generate_payload(request.get_json(silent=True))
+    except ValidationError as exc:
+        return jsonify({"message": str(exc)}), 400
+    
+    # Vérifier si la recette existe et est accessible
     recette = Recette.query.get(recette_id)
     if not recette:
         return jsonify({"message": "Recette non trouvée"}), 404
     
+    if not recette.est_publique and recette.utilisateur_id != user_id:
+        return jsonify({"message": "Vous n'avez pas accès à cette recette"}), 403
+    
     # Vérifier si l'inventaire existe et appartient à l'utilisateur
     inventaire = Inventaire.query.get(inventaire_id)
     if not inventaire:
@@ -232,51 +299,72 @@ def generate_shopping_list(recette_id, inventaire_id):
     if inventaire.utilisateur_id != user_id:
         return jsonify({"message": "Vous n'êtes pas autorisé à accéder à cet inventaire"}), 403
     
+    shopping_list, error = _target_list(user_id, data.get('liste_id'))
+    if error:
+        return error
+    
     try:
-        # Créer une nouvelle liste de courses
-        new_list = ShoppingList(utilisateur_id=user_id)
-        db.session.add(new_list)
-        db.session.commit()
-        
-        # Récupérer les ingrédients de la recette
-        recette_ingredients = RecetteIngredient.query.filter_by(recette_id=recette_id).all()
-        
-        # Pour chaque ingrédient de la recette
-        for ri in recette_ingredients:
-            # Vérifier si l'ingrédient est dans l'inventaire
-            inventory_item = InventaireIngredient.query.filter_by(
-                inventaire_id=inventaire_id,
-                ingredient_id=ri.ingredient_id
-            ).first()
-            
-            quantite_manquante = ri.quantite
-            
-            # Si l'ingrédient est dans l'inventaire, calculer la quantité manquante
-            if inventory_item:
-                if inventory_item.quantite_disponible >= ri.quantite:
-                    # On a assez d'ingrédients, continuer au suivant
-                    continue
-                else:
-                    # On manque d'ingrédients, calculer la quantité manquante
-                    quantite_manquante = ri.quantite - inventory_item.quantite_disponible
-            
-            # Ajouter l'ingrédient manquant à la liste de courses
-            list_item = ShoppingListItem(
-                liste_id=new_list.id,
-                ingredient_id=ri.ingredient_id,
-                quantite=quantite_manquante,
-                est_achete=False
-            )
-            db.session.add(list_item)
-        
-        db.session.commit()
-        
+        # Quantités manquantes calculées en une seule requête recette / inventaire
+        manquants = RecetteIngredient.missing_quantities({recette_id: 1}, [inventaire_id])
+        shopping_list, status = _fill_list(shopping_list, manquants, user_id)
         return jsonify({
             "message": "Liste de courses générée avec succès",
-            "liste_courses": new_list.to_dict()
-        }), 201
+            "liste_courses": shopping_list.to_dict()
+        }), status
         
     except Exception as e:
         db.session.rollback()
         logger.error(f"Erreur lors de la génération de la liste de courses: {e}")
         return jsonify({"message": "Une erreur est survenue lors de la génération de la liste de courses"}), 500
+
+@shopping_bp.route('/plan', methods=['POST'])
+@jwt_required()
+def generate_meal_plan_list():
+    user_id = int(get_jwt_identity())
+    
+    try:
+        data = validate_meal_plan_payload(request.get_json(silent=True))
+    except ValidationError as exc:
+        return jsonify({"message": str(exc)}), 400
+    
+    # Multiplicateurs cumulés par recette (une recette peut apparaître plusieurs fois dans le plan)
+    multipliers = {}
+    for item in data['recettes']:
+        multipliers[item['id']] = multipliers.get(item['id'], 0) + item['multiplicateur']
+    
+    # Vérifier en une requête que toutes les recettes existent et sont accessibles
+    recettes = db.session.execute(
+        select(Recette.id, Recette.est_publique, Recette.utilisateur_id).where(Recette.id.in_(multipliers))
+    ).all()
+    unknown = sorted(set(multipliers) - {recette.id for recette in recettes})
+    if unknown:
+        return jsonify({"message": "Recettes non trouvées", "recettes_inconnues": unknown}), 404
+    if any(not recette.est_publique and recette.utilisateur_id != user_id for recette in recettes):
+        return jsonify({"message": "Vous n'avez pas accès à certaines recettes"}), 403
+    
+    # Vérifier que tous les inventaires appartiennent à l'utilisateur
+    owners = dict(db.session.execute(
+        select(Inventaire.id, Inventaire.utilisateur_id).where(Inventaire.id.in_(data['inventaires']))
+    ).all())
+    if len(owners) != len(data['inventaires']):
+        return jsonify({"message": "Inventaire non trouvé"}), 404
+    if any(owner != user_id for owner in owners.values()):
+        return jsonify({"message": "Vous n'êtes pas autorisé à accéder à cet inventaire"}), 403
+    
+    shopping_list, error = _target_list(user_id, data.get('liste_id'))
+    if error:
+        return error
+    
+    try:
+        # Demande totale du plan moins le stock cumulé des inventaires, agrégés côté SQL
+        manquants = RecetteIngredient.missing_quantities(multipliers, data['inventaires'])
+        shopping_list, status = _fill_list(shopping_list, manquants, user_id)
+        return jsonify({
+            "message": "Liste de courses du plan de repas générée avec succès",
+            "liste_courses": shopping_list.to_dict()
+        }), status
+        
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Erreur lors de la génération du plan de repas: {e}")
+        return jsonify({"message": "Une erreur est survenue lors de la génération de la liste de courses"}), 500
@@ -0,0 +1,33 @@
+from flask import Blueprint, request, jsonify
+import logging
+from backend.validation import ValidationError
+from backend.upload_store import upload_storage
+
+uploads_bp = Blueprint('uploads', __name__)
+logger = logging.getLogger(__name__)
+
+
+@uploads_bp.route('/direct/<token>', methods=['PUT'])
+def receive_direct_upload(token):
+    """Cible des envois directs en stockage local : le jeton signé tient lieu d'URL présignée."""
+    if not upload_storage.backend.local:
+        return jsonify({"message": "Not found"}), 404
+
+    try:
+        ticket = upload_storage.read_direct_token(token)
+    except ValidationError as exc:
+        return jsonify({"message": str(exc)}), 403
+
+    if request.content_length != ticket['taille']:
+        return jsonify({"message": "Taille du fichier différente de celle annoncée"}), 400
+    if request.mimetype != ticket['type']:
+        return jsonify({"message": "Type de fichier différent de celui annoncé"}), 400
+
+    # La limite de la requête devient la taille annoncée (au lieu de MAX_CONTENT_LENGTH)
+    request.max_content_length = ticket['taille']
+    try:
+        upload_storage.local.receive(ticket['cle'], request.stream)
+    except Exception as exc:
+        logger.error("Erreur réception upload direct: %s", exc)
+        return jsonify({"message": "Erreur lors de l'upload de l'image"}), 500
+    return '', 204
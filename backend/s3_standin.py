@@ -0,0 +1,144 @@
+import hmac
+import mimetypes
+import os
+import shutil
+from datetime import datetime, timedelta, timezone
+from urllib.parse import unquote
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from werkzeug.exceptions import HTTPException, NotFound
+from werkzeug.routing import Map, Rule
+from werkzeug.utils import safe_join
+from werkzeug.wrappers import Request, Response
+from werkzeug.wsgi import wrap_file
+
+from backend.upload_store import sigv4_signature
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, HEAD, PUT',
+    'Access-Control-Allow-Headers': 'Content-Type',
+    'Access-Control-Expose-Headers': 'ETag',
+}
+
+
+class S3Standin:
+    """Service local imitant un stockage S3 (style MinIO, adressage par chemin), pour développer
+    et tester les envois directs.
+
+    PUT, HEAD et DELETE exigent une URL présignée SigV4 valide (en-têtes signés compris, dont
+    x-amz-copy-source pour les copies) ; GET est public, comme un bucket en lecture anonyme.
+    """
+
+    def __init__(self, storage_dir, bucket, access_key, secret_key, region):
+        self.storage_dir = storage_dir
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.url_map = Map([Rule('/<bucket>/<path:key>', endpoint='object')])
+
+    def _error(self, status, code):
+        body = f'<?xml version="1.0" encoding="UTF-8"?><Error><Code>{code}</Code></Error>'
+        return Response(body, status=status, mimetype='application/xml')
+
+    def _verify(self, request):
+        """Vérifie la signature présignée ; retourne un code d'erreur S3 ou None."""
+        args = request.args
+        if args.get('X-Amz-Algorithm') != 'AWS4-HMAC-SHA256' or 'X-Amz-Signature' not in args:
+            return 'AccessDenied'
+        access_key = args.get('X-Amz-Credential', '').partition('/')[0]
+        if access_key != self.access_key:
+            return 'InvalidAccessKeyId'
+        try:
+            signed_at = datetime.strptime(args['X-Amz-Date'], '%Y%m%dT%H%M%SZ').replace(tzinfo=timezone.utc)
+            expires = int(args['X-Amz-Expires'])
+        except (KeyError, ValueError):
+            return 'AuthorizationQueryParametersError'
+        if datetime.now(timezone.utc) > signed_at + timedelta(seconds=expires):
+            return 'AccessDenied'
+        headers = {}
+        for name in args.get('X-Amz-SignedHeaders', '').split(';'):
+            if name and name != 'host':
+                headers[name] = request.headers.get(name, '')
+        query = {key: value for key, value in args.items() if key != 'X-Amz-Signature'}
+        expected = sigv4_signature(
+            self.secret_key, self.region, args['X-Amz-Date'], request.method,
+            request.host, request.path, query, headers,
+        )
+        if not hmac.compare_digest(expected, args['X-Amz-Signature']):
+            return 'SignatureDoesNotMatch'
+        return None
+
+    def object(self, request, bucket, key):
+        if request.method == 'OPTIONS':
+            return Response(status=200)
+        if bucket != self.bucket:
+            return self._error(404, 'NoSuchBucket')
+        target = safe_join(self.storage_dir, key)
+        if target is None:
+            raise NotFound()
+        if request.method != 'GET':
+            error = self._verify(request)
+            if error:
+                return self._error(403, error)
+
+        if request.method == 'PUT':
+            source = request.headers.get('x-amz-copy-source')
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if source:
+                source_path = safe_join(self.storage_dir, unquote(source).lstrip('/').partition('/')[2])
+                if source_path is None or not os.path.isfile(source_path):
+                    return self._error(404, 'NoSuchKey')
+                shutil.copyfile(source_path, target)
+                return Response('<CopyObjectResult/>', mimetype='application/xml')
+            with open(target, 'wb') as output:
+                shutil.copyfileobj(request.stream, output)
+            return Response(status=200)
+
+        if request.method == 'DELETE':
+            if os.path.isfile(target):
+                os.remove(target)
+            return Response(status=204)
+
+        if not os.path.isfile(target):
+            return self._error(404, 'NoSuchKey')
+        size = os.path.getsize(target)
+        response = Response(
+            wrap_file(request.environ, open(target, 'rb')),
+            mimetype=mimetypes.guess_type(target)[0] or 'application/octet-stream',
+            direct_passthrough=True,
+        )
+        response.content_length = size
+        response.last_modified = datetime.fromtimestamp(int(os.path.getmtime(target)), timezone.utc)
+        return response.make_conditional(request, accept_ranges=True, complete_length=size)
+
+    def __call__(self, environ, start_response):
+        request = Request(environ)
+        try:
+            endpoint, values = self.url_map.bind_to_environ(environ).match()
+            response = getattr(self, endpoint)(request, **values)
+        except HTTPException as exc:
+            response = exc.get_response(environ)
+        response.headers.extend(CORS_HEADERS)
+        return response(environ, start_response)
+
+
+@click.command('s3-standin')
+@click.option('--host', default='127.0.0.1')
+@click.option('--port', default=9000, type=int)
+@click.option('--storage', default=None, help="Dossier des objets (défaut : instance/s3)")
+@with_appcontext
+def s3_standin_command(host, port, storage):
+    """Lance un service compatible S3 (S3_ENDPOINT_URL=http://host:port) avec les identifiants S3_*."""
+    config = current_app.config
+    if not (config.get('S3_BUCKET') and config.get('S3_ACCESS_KEY_ID') and config.get('S3_SECRET_ACCESS_KEY')):
+        raise click.UsageError("S3_BUCKET, S3_ACCESS_KEY_ID et S3_SECRET_ACCESS_KEY doivent être définies")
+    storage = storage or os.path.join(current_app.instance_path, 's3')
+    from werkzeug.serving import run_simple
+    run_simple(host, port, S3Standin(
+        storage, config['S3_BUCKET'], config['S3_ACCESS_KEY_ID'], config['S3_SECRET_ACCESS_KEY'],
+        config.get('S3_REGION') or 'us-east-1',
+    ))
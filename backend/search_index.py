@@ -0,0 +1,165 @@
+import math
+from collections import Counter
+
+from sqlalchemy import select
+
+from backend.cook_index import RECIPE_SCOPE, REBUILD_BATCH_SIZE
+from backend.indexing import VersionedIndex
+from backend.models import db, Recette, RecetteIngredient
+from backend.text import tokenize
+
+# Périmètre distinct de RECIPE_SCOPE : un renommage invalide la recherche mais pas les recettes cuisinables
+SEARCH_SCOPE = 'recherche_recettes'
+
+# Le nom pèse plus lourd que la description dans le score
+NAME_WEIGHT = 3
+BM25_K1 = 1.2
+BM25_B = 0.75
+FACET_INGREDIENTS = 20
+# Bornes hautes (minutes) des tranches de temps pour les facettes
+TIME_BUCKETS = (15, 30, 60)
+
+
+def _time_bucket(minutes):
+    for upper in TIME_BUCKETS:
+        if minutes <= upper:
+            return f"<={upper}"
+    return f">{TIME_BUCKETS[-1]}"
+
+
+class RecipeSearchIndex(VersionedIndex):
+    """Index plein texte (nom, description) des recettes, avec filtres et facettes.
+
+    Texte replié sans accents et racinisé (backend.text), score BM25 ; les filtres portent sur les
+    ingrédients et les temps de préparation / cuisson.
+    """
+
+    scope = SEARCH_SCOPE
+    topic = RECIPE_SCOPE
+
+    def __init__(self):
+        super().__init__()
+        self.documents = {}
+        self.postings = {}
+        self.total_length = 0
+
+    def _clear(self):
+        self.documents = {}
+        self.postings = {}
+        self.total_length = 0
+
+    def _add(self, recette_id, utilisateur_id, est_publique, nom, description,
+             temps_preparation, temps_cuisson, ingredients):
+        frequencies = Counter()
+        for token in tokenize(nom):
+            frequencies[token] += NAME_WEIGHT
+        frequencies.update(tokenize(description))
+        length = sum(frequencies.values())
+
+        self.documents[recette_id] = (
+            utilisateur_id, est_publique, temps_preparation, temps_cuisson,
+            frozenset(ingredients), frequencies, length,
+        )
+        self.total_length += length
+        for token, frequency in frequencies.items():
+            self.postings.setdefault(token, {})[recette_id] = frequency
+
+    def _remove(self, recette_id):
+        document = self.documents.pop(recette_id, None)
+        if document is None:
+            return
+        frequencies, length = document[5], document[6]
+        self.total_length -= length
+        for token in frequencies:
+            posting = self.postings[token]
+            del posting[recette_id]
+            if not posting:
+                del self.postings[token]
+
+    def _load(self, recette_ids=None):
+        links = select(RecetteIngredient.recette_id, RecetteIngredient.ingredient_id)
+        recipes = select(
+            Recette.id, Recette.utilisateur_id, Recette.est_publique, Recette.nom, Recette.description,
+            Recette.temps_preparation, Recette.temps_cuisson,
+        )
+        if recette_ids is not None:
+            links = links.where(RecetteIngredient.recette_id.in_(recette_ids))
+            recipes = recipes.where(Recette.id.in_(recette_ids))
+
+        ingredients = {}
+        for recette_id, ingredient_id in db.session.execute(
+            links.execution_options(yield_per=REBUILD_BATCH_SIZE)
+        ):
+            ingredients.setdefault(recette_id, []).append(ingredient_id)
+
+        for row in db.session.execute(recipes.execution_options(yield_per=REBUILD_BATCH_SIZE)):
+            self._add(*row, ingredients.get(row[0], ()))
+
+    def search(self, query, utilisateur_id, *, avec=(), sans=(), temps_preparation=(None, None),
+               temps_cuisson=(None, None), offset=0, limit=20):
+        """Retourne (total, [(recette_id, score)] de la page, facettes) des recettes visibles."""
+        tokens = list(dict.fromkeys(tokenize(query or '')))
+        avec, sans = frozenset(avec), frozenset(sans)
+
+        with self._lock:
+            if tokens:
+                postings = [self.postings.get(token, {}) for token in tokens]
+                postings.sort(key=len)
+                # Tous les termes doivent être présents : on part de la liste la plus courte
+                candidates = set(postings[0]).intersection(*postings[1:])
+            else:
+                candidates = self.documents.keys()
+
+            count = len(self.documents) or 1
+            average_length = self.total_length / count or 1
+            idf = {
+                token: math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+                for token, posting in zip(tokens, (self.postings.get(token, {}) for token in tokens))
+            }
+
+            matches = []
+            for recette_id in candidates:
+                owner, public, preparation, cuisson, ingredients, frequencies, length = self.documents[recette_id]
+                if not public and owner != utilisateur_id:
+                    continue
+                if avec and not avec <= ingredients:
+                    continue
+                if sans and not sans.isdisjoint(ingredients):
+                    continue
+                if not _in_range(preparation, temps_preparation) or not _in_range(cuisson, temps_cuisson):
+                    continue
+                score = 0.0
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                for token in tokens:
+                    frequency = frequencies[token]
+                    score += idf[token] * frequency * (BM25_K1 + 1) / (frequency + norm)
+                matches.append((recette_id, score))
+
+            facets = self._facets(recette_id for recette_id, _ in matches)
+
+        # Score décroissant, puis recettes les plus récentes
+        matches.sort(key=lambda item: (-item[1], -item[0]))
+        return len(matches), matches[offset:offset + limit], facets
+
+    def _facets(self, recette_ids):
+        ingredients = Counter()
+        preparation = Counter()
+        cuisson = Counter()
+        for recette_id in recette_ids:
+            document = self.documents[recette_id]
+            preparation[_time_bucket(document[2])] += 1
+            cuisson[_time_bucket(document[3])] += 1
+            ingredients.update(document[4])
+        return {
+            'ingredients': ingredients.most_common(FACET_INGREDIENTS),
+            'temps_preparation': dict(preparation),
+            'temps_cuisson': dict(cuisson),
+        }
+
+
+def _in_range(value, bounds):
+    minimum, maximum = bounds
+    return (minimum is None or value >= minimum) and (maximum is None or value <= maximum)
+
+
+search_index = RecipeSearchIndex()
@@ -0,0 +1,217 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import stat
+from datetime import datetime, timezone
+
+import click
+from flask import current_app, request
+from flask.cli import with_appcontext
+from werkzeug.security import safe_join
+from werkzeug.wrappers import Response
+from werkzeug.wsgi import wrap_file
+
+from backend.uploads import INCOMING_DIR
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dépendance optionnelle (variantes .br)
+    brotli = None
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Vite place dans assets/ les seuls fichiers dont le nom contient l'empreinte du contenu
+IMMUTABLE_PREFIX = 'assets/'
+# Uploads adressés par contenu (<sha256>.jpg) et leurs dérivés (<sha256>_carte.webp)
+CONTENT_ADDRESSED_RE = re.compile(r'^[0-9a-f]{64}(?:_[a-z]+)?\.[a-z0-9]+$')
+# Variantes précompressées, par ordre de préférence
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+COMPRESSIBLE_SUFFIXES = ('.html', '.js', '.mjs', '.css', '.json', '.map', '.svg', '.txt', '.xml', '.webmanifest', '.ico')
+MIN_COMPRESS_BYTES = 1024
+SENDFILE_MODES = ('x-sendfile', 'x-accel')
+
+
+class _StaticFile:
+    """Métadonnées d'un fichier servi : lues une fois, puis réutilisées à chaque requête."""
+
+    __slots__ = ('path', 'relative', 'size', 'last_modified', 'etag', 'mimetype', 'immutable', 'encoded')
+
+    def __init__(self, path, relative, stat_result, etag, immutable):
+        self.path = path
+        self.relative = relative
+        self.size = stat_result.st_size
+        self.last_modified = datetime.fromtimestamp(int(stat_result.st_mtime), timezone.utc)
+        self.etag = etag
+        self.mimetype = mimetypes.guess_type(relative)[0] or 'application/octet-stream'
+        self.immutable = immutable
+        self.encoded = {}
+
+
+def _digest(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as file:
+        while chunk := file.read(64 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_manifest(root):
+    """Index {chemin relatif: fichier} du build frontend, avec ETag fort (empreinte du contenu)
+    et variantes .br/.gz disponibles. Construit au démarrage : aucune sonde disque par requête."""
+    manifest = {}
+    if not root or not os.path.isdir(root):
+        return manifest
+    for directory, _, names in os.walk(root):
+        present = set(names)
+        for name in names:
+            base, suffix = os.path.splitext(name)
+            if suffix in ('.br', '.gz') and base in present:
+                continue
+            path = os.path.join(directory, name)
+            relative = os.path.relpath(path, root).replace(os.sep, '/')
+            immutable = relative.startswith(IMMUTABLE_PREFIX)
+            entry = _StaticFile(path, relative, os.stat(path), _digest(path), immutable)
+            for encoding, encoded_suffix in PRECOMPRESSED:
+                if name + encoded_suffix in present:
+                    encoded_path = path + encoded_suffix
+                    variant = _StaticFile(encoded_path, relative, os.stat(encoded_path), _digest(encoded_path), immutable)
+                    variant.mimetype = entry.mimetype
+                    entry.encoded[encoding] = variant
+            manifest[relative] = entry
+    return manifest
+
+
+class StaticFiles:
+    """Service du build frontend (dist) et des uploads avec en-têtes de cache longue durée.
+
+    - fichiers empreintés (assets/, uploads adressés par contenu) : Cache-Control immutable d'un an ;
+      les autres (index.html...) sont revalidés à chaque fois grâce à l'ETag ;
+    - ETag fort, If-None-Match / If-Modified-Since (304) et requêtes Range (206) ;
+    - variante .br ou .gz choisie selon Accept-Encoding quand elle existe ;
+    - SENDFILE_MODE=x-sendfile (Apache, lighttpd) ou x-accel (nginx) : le proxy envoie les octets,
+      l'application ne produit que les en-têtes.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.upload_root = None
+        self.manifest = {}
+        self.sendfile_mode = None
+        self.accel_prefixes = {}
+
+    def init_app(self, app):
+        self.root = app.config.get('STATIC_FOLDER')
+        self.upload_root = app.config['UPLOAD_FOLDER']
+        self.manifest = build_manifest(self.root)
+        mode = app.config.get('SENDFILE_MODE') or None
+        if mode is not None and mode not in SENDFILE_MODES:
+            raise RuntimeError(f"SENDFILE_MODE non pris en charge: {mode}")
+        self.sendfile_mode = mode
+        self.accel_prefixes = {
+            'static': app.config.get('X_ACCEL_STATIC_PREFIX', '/_internal/static/'),
+            'uploads': app.config.get('X_ACCEL_UPLOADS_PREFIX', '/_internal/uploads/'),
+        }
+        app.extensions['static_files'] = self
+
+    def static_entry(self, relative):
+        return self.manifest.get(relative)
+
+    def upload_entry(self, relative):
+        """Un seul stat par requête : les uploads sont ajoutés pendant que l'application tourne."""
+        path = safe_join(self.upload_root, relative)
+        # Les envois directs non confirmés ne sont pas servis
+        if path is None or relative.split('/', 1)[0] == INCOMING_DIR:
+            return None
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(stat_result.st_mode):
+            return None
+        name = os.path.basename(path)
+        if CONTENT_ADDRESSED_RE.match(name):
+            # Le nom est l'empreinte du contenu : ETag fort sans lire le fichier
+            return _StaticFile(path, relative, stat_result, name, immutable=True)
+        etag = f"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"
+        return _StaticFile(path, relative, stat_result, etag, immutable=False)
+
+    def _negotiate(self, entry):
+        if not entry.encoded or self.sendfile_mode == 'x-accel':
+            return None, entry
+        accepted = request.accept_encodings
+        for encoding, _ in PRECOMPRESSED:
+            variant = entry.encoded.get(encoding)
+            if variant is not None and accepted.quality(encoding) > 0:
+                return encoding, variant
+        return None, entry
+
+    def send(self, entry, location):
+        """Réponse pour entry ; location ('static' ou 'uploads') sert au mode x-accel."""
+        encoding, selected = self._negotiate(entry)
+
+        if self.sendfile_mode == 'x-accel':
+            # nginx sert le fichier (gzip_static/brotli_static pour les variantes) et gère Range
+            response = Response(mimetype=entry.mimetype)
+            response.headers['X-Accel-Redirect'] = self.accel_prefixes[location] + entry.relative
+        elif self.sendfile_mode == 'x-sendfile':
+            response = Response(mimetype=selected.mimetype)
+            response.headers['X-Sendfile'] = selected.path
+        else:
+            response = Response(
+                wrap_file(request.environ, open(selected.path, 'rb')),
+                mimetype=selected.mimetype,
+                direct_passthrough=True,
+            )
+            response.content_length = selected.size
+
+        response.set_etag(selected.etag)
+        response.last_modified = selected.last_modified
+        if entry.immutable:
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        if entry.encoded:
+            response.vary.add('Accept-Encoding')
+        if encoding:
+            response.content_encoding = encoding
+
+        if self.sendfile_mode is None:
+            return response.make_conditional(request, accept_ranges=True, complete_length=selected.size)
+        return response.make_conditional(request)
+
+
+static_files = StaticFiles()
+
+
+@click.command('compress-static')
+@with_appcontext
+def compress_static_command():
+    """Écrit les variantes .gz (et .br si le paquet brotli est installé) du build frontend."""
+    root = current_app.config.get('STATIC_FOLDER')
+    if not root or not os.path.isdir(root):
+        raise click.UsageError(f"Dossier du build frontend introuvable: {root}")
+    written = 0
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if not name.endswith(COMPRESSIBLE_SUFFIXES):
+                continue
+            path = os.path.join(directory, name)
+            if os.path.getsize(path) < MIN_COMPRESS_BYTES:
+                continue
+            with open(path, 'rb') as file:
+                data = file.read()
+            variants = [('.gz', lambda raw: gzip.compress(raw, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                variants.append(('.br', lambda raw: brotli.compress(raw, quality=11)))
+            for suffix, compress in variants:
+                compressed = compress(data)
+                # Une variante qui ne fait rien gagner n'est pas écrite
+                if len(compressed) >= len(data):
+                    continue
+                with open(path + suffix, 'wb') as output:
+                    output.write(compressed)
+                written += 1
+    click.echo(f"{written} variante(s) écrite(s). Redémarrer l'application pour les servir.")
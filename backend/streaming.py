@@ -0,0 +1,59 @@
+from flask import Response, current_app, request, stream_with_context
+
+from backend.negotiation import msgpack, negotiated_msgpack
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+STREAM_CHUNK_SIZE = 500
+
+
+def wants_ndjson():
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def stream_query(query, serialize, chunk_size=STREAM_CHUNK_SIZE):
+    """Diffuse le résultat d'une requête en JSON (tableau) ou NDJSON, par paquets de chunk_size lignes.
+    Un client MessagePack reçoit le même tableau, encodé d'un bloc (voir _msgpack_response).
+
+    Les lignes sont lues via un curseur serveur (yield_per) : ni la liste d'objets ni le corps
+    complet ne sont jamais en mémoire, seul le paquet courant l'est.
+    """
+    msgpack_mimetype = negotiated_msgpack()
+    if msgpack_mimetype:
+        return _msgpack_response(query, serialize, chunk_size, msgpack_mimetype)
+    ndjson = wants_ndjson()
+    dumps = current_app.json.dumps
+
+    def generate():
+        if not ndjson:
+            yield '['
+        first = True
+        chunk = []
+        for row in query.yield_per(chunk_size):
+            chunk.append(dumps(serialize(row)))
+            if len(chunk) >= chunk_size:
+                yield _join_chunk(chunk, first, ndjson)
+                first = False
+                chunk = []
+        if chunk:
+            yield _join_chunk(chunk, first, ndjson)
+        if not ndjson:
+            yield ']'
+
+    mimetype = NDJSON_MIMETYPE if ndjson else 'application/json'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+
+def _join_chunk(chunk, first, ndjson):
+    if ndjson:
+        return '\n'.join(chunk) + '\n'
+    body = ','.join(chunk)
+    return body if first else ',' + body
+
+
+def _msgpack_response(query, serialize, chunk_size, mimetype):
+    """Tableau MessagePack : son en-tête porte le nombre d'éléments, le corps n'est donc envoyé
+    qu'une fois toutes les lignes encodées (en octets, les objets restent lus par paquets)."""
+    packer = msgpack.Packer(default=current_app.json.default, use_bin_type=True)
+    items = [packer.pack(serialize(row)) for row in query.yield_per(chunk_size)]
+    items.insert(0, packer.pack_array_header(len(items)))
+    return Response(b''.join(items), mimetype=mimetype)
@@ -0,0 +1,30 @@
+import re
+import unicodedata
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+LIGATURES = str.maketrans({"œ": "oe", "æ": "ae", "ß": "ss"})
+
+# Mots vides français, déjà sans accents
+STOPWORDS = frozenset(
+    "a au aux avec ce ces dans de des du elle en et il je la le les leur lui ma mais me mes mon ne "
+    "nos notre nous on ou par pas pour qu que qui sa se ses son sur ta te tes ton tu un une vos votre "
+    "vous y d l j m n s t c".split()
+)
+
+
+def fold(text: str) -> str:
+    """Minuscules sans accents ni ligatures : "Crème Brûlée" -> "creme brulee"."""
+    decomposed = unicodedata.normalize("NFKD", text.lower().translate(LIGATURES))
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def stem(token: str) -> str:
+    # Racinisation légère : pluriels réguliers en -s / -x ("tomates", "gateaux")
+    if len(token) > 3 and token[-1] in "sx" and token[-2] != token[-1]:
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    """Jetons de recherche d'un texte français : repliés, sans mots vides, racinisés."""
+    return [stem(token) for token in TOKEN_RE.findall(fold(text)) if token not in STOPWORDS]
@@ -0,0 +1,462 @@
+import hashlib
+import hmac
+import logging
+import os
+import tempfile
+import threading
+import uuid
+from datetime import datetime, timezone
+from urllib.parse import quote, urlparse
+
+import requests
+from flask import current_app, request, url_for
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from requests.adapters import HTTPAdapter
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from backend.models import db, UploadBlob
+from backend.uploads import INCOMING_DIR, _detect_image_type, derivative_paths, local_upload_path
+from backend.validation import ValidationError, get_json_object, validate_direct_upload_payload
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+# Deux niveaux de 256 sous-dossiers : quelques fichiers par dossier même avec des millions d'images
+SHARD_WIDTH = 2
+SHARD_DEPTH = 2
+HEADER_BYTES = 64
+DEFAULT_DIRECT_UPLOAD_SECONDS = 300
+DEFAULT_TIMEOUT_SECONDS = 30
+SIGV4_ALGORITHM = 'AWS4-HMAC-SHA256'
+UNSIGNED_PAYLOAD = 'UNSIGNED-PAYLOAD'
+
+
+class UploadStorageError(Exception):
+    pass
+
+
+def blob_relative_path(subdir, digest, ext):
+    shards = [digest[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH] for i in range(SHARD_DEPTH)]
+    return '/'.join([subdir, *shards, f"{digest}.{ext}"])
+
+
+def _check_header(header, ext):
+    if _detect_image_type(header) != ext:
+        raise ValidationError("Fichier image invalide")
+
+
+def _defer_delete(storage, chemin, tracked):
+    """Suppression du fichier reportée après le commit : un rollback rend la référence et
+    l'ancienne URL, le fichier doit donc encore exister."""
+    db.session.info.setdefault('uploads_a_supprimer', []).append((storage, chemin, tracked))
+
+
+class LocalStorage:
+    """Fichiers sous UPLOAD_FOLDER, nommés par leur empreinte SHA-256 et comptés par références.
+
+    L'upload direct vise PUT /api/uploads/direct/<jeton> : le fichier arrive dans incoming/, puis
+    la confirmation le hache et le range à son adresse de contenu.
+    """
+
+    local = True
+
+    def __init__(self, root):
+        self.root = root
+
+    def _url(self, relative):
+        return f"{request.host_url.rstrip('/')}/uploads/{relative}"
+
+    def _store(self, source, subdir, ext, digest):
+        """Range le fichier temporaire source sous son empreinte et prend une référence."""
+        relative = blob_relative_path(subdir, digest, ext)
+        # Référence prise avant le renommage : une suppression concurrente du même contenu
+        # attend ce verrou et voit alors une référence restante
+        UploadBlob.acquire(relative)
+        target = os.path.join(self.root, relative)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(source, target)
+        return relative
+
+    def _copy_to_staging(self, stream, directory, digest=None):
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.part')
+        try:
+            with os.fdopen(descriptor, 'wb') as output:
+                while chunk := stream.read(CHUNK_SIZE):
+                    if digest is not None:
+                        digest.update(chunk)
+                    output.write(chunk)
+        except BaseException:
+            os.remove(temporary)
+            raise
+        return temporary
+
+    def save(self, file_storage, subdir, ext):
+        """Le flux est copié par blocs dans un fichier temporaire tout en étant haché, sans charger
+        l'image en mémoire. Un contenu déjà présent n'est pas dupliqué : le fichier temporaire
+        remplace la copie identique et le compteur de références est incrémenté dans la
+        transaction courante (à valider par l'appelant)."""
+        digest = hashlib.sha256()
+        file_storage.stream.seek(0)
+        temporary = self._copy_to_staging(file_storage.stream, os.path.join(self.root, subdir), digest)
+        try:
+            relative = self._store(temporary, subdir, ext, digest.hexdigest())
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return self._url(relative)
+
+    def release(self, file_url):
+        full_path = local_upload_path(file_url, self.root)
+        if full_path is None:
+            return
+        relative = os.path.relpath(full_path, os.path.abspath(self.root)).replace(os.sep, '/')
+        remaining = UploadBlob.release(relative)
+        if not remaining:
+            _defer_delete(self, relative, remaining is not None)
+
+    def delete(self, relative):
+        full_path = os.path.join(self.root, relative)
+        for path in [full_path, *derivative_paths(full_path)]:
+            if os.path.isfile(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    logger.warning("Impossible de supprimer le fichier upload %s", path)
+
+    def direct_target(self, key, content_type, size, token, expires):
+        return url_for('uploads.receive_direct_upload', token=token, _external=True)
+
+    def receive(self, key, stream):
+        """Écrit le corps d'un PUT direct sous incoming/ (remplace un envoi précédent du même jeton)."""
+        target = os.path.join(self.root, key)
+        temporary = self._copy_to_staging(stream, os.path.dirname(target))
+        os.replace(temporary, target)
+
+    def confirm(self, key, subdir, ext, size):
+        source = os.path.join(self.root, key)
+        if not os.path.isfile(source):
+            raise ValidationError("Fichier non reçu")
+        try:
+            if os.path.getsize(source) != size:
+                raise ValidationError("Taille du fichier différente de celle annoncée")
+            digest = hashlib.sha256()
+            with open(source, 'rb') as file:
+                _check_header(file.read(HEADER_BYTES), ext)
+                file.seek(0)
+                while chunk := file.read(CHUNK_SIZE):
+                    digest.update(chunk)
+            relative = self._store(source, subdir, ext, digest.hexdigest())
+        finally:
+            if os.path.exists(source):
+                os.remove(source)
+        return self._url(relative)
+
+    def purge_incoming(self, max_age_seconds):
+        """Supprime les envois directs jamais confirmés (jeton expiré)."""
+        directory = os.path.join(self.root, INCOMING_DIR)
+        if not os.path.isdir(directory):
+            return 0
+        limit = datetime.now().timestamp() - max_age_seconds
+        removed = 0
+        for entry in os.scandir(directory):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < limit:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+
+
+def _uri_encode(value, safe='-_.~'):
+    return quote(str(value), safe=safe)
+
+
+def sigv4_signature(secret_key, region, amz_date, method, host, path, query, headers):
+    """Signature AWS SigV4 (service s3, charge non signée) d'une requête présignée.
+
+    query : paramètres de la chaîne de requête sans X-Amz-Signature ; headers : en-têtes signés
+    (noms en minuscules, host compris).
+    """
+    canonical_query = '&'.join(
+        f"{_uri_encode(key)}={_uri_encode(value)}" for key, value in sorted(query.items())
+    )
+    signed = {**headers, 'host': host}
+    canonical_headers = ''.join(f"{name}:{str(signed[name]).strip()}\n" for name in sorted(signed))
+    canonical_request = '\n'.join([
+        method, _uri_encode(path, safe='/-_.~'), canonical_query, canonical_headers,
+        ';'.join(sorted(signed)), UNSIGNED_PAYLOAD,
+    ])
+    date = amz_date[:8]
+    scope = f"{date}/{region}/s3/aws4_request"
+    string_to_sign = '\n'.join([
+        SIGV4_ALGORITHM, amz_date, scope, hashlib.sha256(canonical_request.encode('utf-8')).hexdigest(),
+    ])
+    key = ('AWS4' + secret_key).encode('utf-8')
+    for part in (date, region, 's3', 'aws4_request'):
+        key = hmac.new(key, part.encode('utf-8'), hashlib.sha256).digest()
+    return hmac.new(key, string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+class S3Storage:
+    """Stockage compatible S3 (AWS, MinIO, R2...) adressé en style chemin : {endpoint}/{bucket}/{clé}.
+
+    Toutes les requêtes, y compris celles du serveur, utilisent des URLs présignées SigV4 : le
+    navigateur envoie l'image directement au stockage et l'API ne fait que vérifier l'objet
+    (HEAD, 64 premiers octets), puis le copier côté stockage hors de incoming/.
+    """
+
+    local = False
+
+    def __init__(self, endpoint_url, bucket, access_key, secret_key, region='us-east-1',
+                 public_url=None, timeout=DEFAULT_TIMEOUT_SECONDS):
+        parsed = urlparse(endpoint_url or '')
+        if parsed.scheme not in ('http', 'https') or not parsed.netloc:
+            raise RuntimeError("S3_ENDPOINT_URL doit être une URL http(s)")
+        if not (bucket and access_key and secret_key):
+            raise RuntimeError("S3_BUCKET, S3_ACCESS_KEY_ID et S3_SECRET_ACCESS_KEY sont requis")
+        self.endpoint_url = endpoint_url.rstrip('/')
+        self.host = parsed.netloc
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.public_url = (public_url or f"{self.endpoint_url}/{bucket}").rstrip('/')
+        self.timeout = timeout
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _http(self):
+        with self._lock:
+            # Les connexions ouvertes ne doivent pas être partagées avec un processus forké
+            if self._session is None or self._pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=8)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._session = session
+                self._pid = os.getpid()
+            return self._session
+
+    def presign(self, method, key, expires, headers=None):
+        """URL présignée pour method sur key ; headers (noms en minuscules) devront être envoyés tels quels."""
+        headers = {name.lower(): value for name, value in (headers or {}).items()}
+        amz_date = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        path = f"/{self.bucket}/{key}"
+        query = {
+            'X-Amz-Algorithm': SIGV4_ALGORITHM,
+            'X-Amz-Credential': f"{self.access_key}/{amz_date[:8]}/{self.region}/s3/aws4_request",
+            'X-Amz-Date': amz_date,
+            'X-Amz-Expires': str(int(expires)),
+            'X-Amz-SignedHeaders': ';'.join(sorted({*headers, 'host'})),
+        }
+        signature = sigv4_signature(self.secret_key, self.region, amz_date, method, self.host, path, query, headers)
+        encoded = '&'.join(f"{_uri_encode(k)}={_uri_encode(v)}" for k, v in sorted(query.items()))
+        return f"{self.endpoint_url}{_uri_encode(path, safe='/-_.~')}?{encoded}&X-Amz-Signature={signature}"
+
+    def _request(self, method, key, headers=None, signed_headers=None, **kwargs):
+        url = self.presign(method, key, 60, signed_headers)
+        try:
+            return self._http().request(
+                method, url, headers={**(headers or {}), **(signed_headers or {})}, timeout=self.timeout, **kwargs
+            )
+        except requests.RequestException as exc:
+            raise UploadStorageError(f"Stockage S3 injoignable: {exc}") from exc
+
+    def _check(self, response, action):
+        if response.status_code >= 400:
+            raise UploadStorageError(f"Stockage S3 ({action}): HTTP {response.status_code}")
+
+    def key_for_url(self, file_url):
+        prefix = self.public_url + '/'
+        if not file_url or not file_url.startswith(prefix):
+            return None
+        return file_url[len(prefix):] or None
+
+    def save(self, file_storage, subdir, ext):
+        stream = file_storage.stream
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
+        stream.seek(0)
+        key = f"{subdir}/{uuid.uuid4().hex}.{ext}"
+        response = self._request(
+            'PUT', key, data=stream,
+            signed_headers={'content-length': str(size), 'content-type': file_storage.mimetype or 'application/octet-stream'},
+        )
+        self._check(response, 'envoi')
+        UploadBlob.acquire(key)
+        return f"{self.public_url}/{key}"
+
+    def release(self, file_url):
+        key = self.key_for_url(file_url)
+        if key is None:
+            return
+        remaining = UploadBlob.release(key)
+        if not remaining:
+            _defer_delete(self, key, remaining is not None)
+
+    def delete(self, key):
+        try:
+            self._check(self._request('DELETE', key), 'suppression')
+        except UploadStorageError as exc:
+            logger.warning("Impossible de supprimer l'objet %s: %s", key, exc)
+
+    def direct_target(self, key, content_type, size, token, expires):
+        # Taille et type signés : le stockage refuse un envoi qui ne correspond pas au jeton
+        return self.presign('PUT', key, expires, {'content-length': str(size), 'content-type': content_type})
+
+    def confirm(self, key, subdir, ext, size):
+        head = self._request('HEAD', key)
+        if head.status_code == 404:
+            raise ValidationError("Fichier non reçu")
+        self._check(head, 'vérification')
+        try:
+            if int(head.headers.get('Content-Length', -1)) != size:
+                raise ValidationError("Taille du fichier différente de celle annoncée")
+            header = self._request('GET', key, headers={'Range': f"bytes=0-{HEADER_BYTES - 1}"})
+            self._check(header, 'lecture')
+            _check_header(header.content[:HEADER_BYTES], ext)
+        except ValidationError:
+            self._discard(key)
+            raise
+        final_key = f"{subdir}/{os.path.basename(key)}"
+        # Copie côté stockage : les octets ne transitent pas par l'API. En cas d'échec, l'envoi
+        # reste dans incoming/ et la confirmation peut être retentée avec le même jeton.
+        copy = self._request('PUT', final_key, signed_headers={
+            'x-amz-copy-source': _uri_encode(f"/{self.bucket}/{key}", safe='/-_.~'),
+        })
+        self._check(copy, 'copie')
+        self._discard(key)
+        UploadBlob.acquire(final_key)
+        return f"{self.public_url}/{final_key}"
+
+    def _discard(self, key):
+        try:
+            self._check(self._request('DELETE', key), 'suppression')
+        except UploadStorageError as exc:
+            logger.warning("Impossible de supprimer l'envoi direct %s: %s", key, exc)
+
+
+class UploadStorage:
+    """Point d'entrée du stockage des images : local (UPLOAD_FOLDER) ou S3 (UPLOAD_STORAGE=s3).
+
+    Les fichiers locaux restent gérés quel que soit le mode : une URL /uploads/... enregistrée
+    avant le passage à S3 est toujours libérée correctement.
+    """
+
+    def __init__(self):
+        self.local = None
+        self.backend = None
+        self.direct_upload_seconds = DEFAULT_DIRECT_UPLOAD_SECONDS
+        self.direct_upload_max_bytes = 0
+        self._secret_key = None
+
+    def init_app(self, app):
+        self.local = LocalStorage(app.config['UPLOAD_FOLDER'])
+        mode = app.config.get('UPLOAD_STORAGE', 'local')
+        if mode == 's3':
+            self.backend = S3Storage(
+                app.config.get('S3_ENDPOINT_URL'),
+                app.config.get('S3_BUCKET'),
+                app.config.get('S3_ACCESS_KEY_ID'),
+                app.config.get('S3_SECRET_ACCESS_KEY'),
+                app.config.get('S3_REGION') or 'us-east-1',
+                app.config.get('S3_PUBLIC_URL'),
+                app.config.get('S3_TIMEOUT', DEFAULT_TIMEOUT_SECONDS),
+            )
+        elif mode == 'local':
+            self.backend = self.local
+        else:
+            raise RuntimeError(f"UPLOAD_STORAGE non pris en charge: {mode}")
+        self.direct_upload_seconds = app.config.get('DIRECT_UPLOAD_SECONDS', DEFAULT_DIRECT_UPLOAD_SECONDS)
+        self.direct_upload_max_bytes = app.config.get('DIRECT_UPLOAD_MAX_BYTES') or app.config['MAX_CONTENT_LENGTH']
+        self._secret_key = app.config['SECRET_KEY']
+        app.extensions['upload_storage'] = self
+
+    def _serializer(self):
+        return URLSafeTimedSerializer(self._secret_key, salt='upload-direct')
+
+    def create_direct_upload(self, cible, cible_id, subdir, payload):
+        """Prépare un envoi direct vers le stockage et retourne le ticket à transmettre au client."""
+        data = validate_direct_upload_payload(payload, max_bytes=self.direct_upload_max_bytes)
+        allowed = {'jpg' if ext == 'jpeg' else ext for ext in current_app.config.get('ALLOWED_IMAGE_EXTENSIONS', ())}
+        if data['extension'] not in allowed:
+            raise ValidationError("Format de fichier non supporte")
+        key = f"{INCOMING_DIR}/{uuid.uuid4().hex}.{data['extension']}"
+        token = self._serializer().dumps({
+            'cle': key, 'cible': cible, 'id': cible_id, 'dossier': subdir,
+            'ext': data['extension'], 'taille': data['taille'], 'type': data['type_contenu'],
+        })
+        if self.backend.local:
+            self.local.purge_incoming(self.direct_upload_seconds)
+        url = self.backend.direct_target(key, data['type_contenu'], data['taille'], token, self.direct_upload_seconds)
+        return {
+            "url": url,
+            "methode": "PUT",
+            "entetes": {"Content-Type": data['type_contenu']},
+            "jeton": token,
+            "expire_dans": self.direct_upload_seconds,
+        }
+
+    def read_direct_token(self, token):
+        try:
+            # Marge pour un envoi commencé juste avant l'expiration
+            return self._serializer().loads(token or '', max_age=self.direct_upload_seconds * 2)
+        except (BadSignature, SignatureExpired):
+            raise ValidationError("Jeton d'upload invalide ou expiré") from None
+
+    def confirm_direct_upload(self, cible, cible_id, payload):
+        """Vérifie l'objet reçu pour cette cible ({"jeton": ...}) et retourne son URL définitive
+        (référence prise dans la transaction courante)."""
+        ticket = self.read_direct_token(get_json_object(payload).get('jeton'))
+        if ticket.get('cible') != cible or ticket.get('id') != cible_id:
+            raise ValidationError("Jeton d'upload invalide ou expiré")
+        return self.backend.confirm(ticket['cle'], ticket['dossier'], ticket['ext'], ticket['taille'])
+
+    def save(self, file_storage, subdir, ext):
+        return self.backend.save(file_storage, subdir, 'jpg' if ext == 'jpeg' else ext)
+
+    def release(self, file_url):
+        if local_upload_path(file_url, self.local.root) is not None:
+            self.local.release(file_url)
+        elif not self.backend.local:
+            self.backend.release(file_url)
+
+
+upload_storage = UploadStorage()
+
+
+def save_upload(file_storage, subdir, ext):
+    """Enregistre le fichier dans le stockage configuré et retourne son URL publique."""
+    return upload_storage.save(file_storage, subdir, ext)
+
+
+def release_upload(file_url):
+    """Retire une référence au fichier ; le supprime (avec ses dérivés en local) à la dernière.
+
+    Sans effet pour une URL externe (Cloudinary). La suppression n'a lieu qu'après le commit
+    de l'appelant, et seulement si aucun envoi n'a repris le même contenu entre-temps.
+    """
+    upload_storage.release(file_url)
+
+
+@event.listens_for(Session, 'after_commit')
+def _delete_after_commit(session):
+    pending = session.info.pop('uploads_a_supprimer', None)
+    for storage, chemin, tracked in pending or ():
+        try:
+            with db.engine.begin() as connection:
+                if tracked and not UploadBlob.reclaim(connection, chemin):
+                    continue
+                storage.delete(chemin)
+        except Exception as exc:
+            logger.warning("Suppression de l'upload %s impossible: %s", chemin, exc)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session):
+    session.info.pop('uploads_a_supprimer', None)
@@ -1,15 +1,18 @@
 import os
 from typing import Iterable
+from urllib.parse import urlparse
 
 from werkzeug.utils import secure_filename
 
 from backend.validation import ValidationError
 
-try:
-    import cloudinary
-    import cloudinary.uploader
-except ImportError:  # Cloudinary est optionnel (dev local)
-    cloudinary = None
+# Dérivés produits pour chaque image : (nom, côté maximal en pixels), du plus petit au plus grand.
+# Chacun existe en WebP et en JPEG pour les navigateurs sans WebP.
+IMAGE_VARIANTS = (("miniature", 160), ("carte", 480), ("grande", 1280))
+IMAGE_FORMATS = ("webp", "jpg")
+CLOUDINARY_UPLOAD_SEGMENT = "/image/upload/"
+# Envois directs en attente de confirmation (jamais servis tels quels)
+INCOMING_DIR = "incoming"
 
 
 def _detect_image_type(header: bytes) -> str | None:
@@ -48,17 +51,77 @@ def validate_image_upload(file_storage, allowed_exts: Iterable[str]) -> str:
     return ext
 
 
-def upload_to_cloudinary(file_storage, folder: str) -> str | None:
-    cloudinary_url = os.environ.get("CLOUDINARY_URL")
-    if not cloudinary_url:
+def local_upload_path(file_url: str | None, upload_folder: str) -> str | None:
+    """Chemin disque d'une URL /uploads/..., None pour une URL externe ou hors du dossier d'upload."""
+    if not file_url:
         return None
-    if cloudinary is None:
-        raise ValidationError("Cloudinary non disponible")
-
-    cloudinary.config(cloudinary_url=cloudinary_url)
-    result = cloudinary.uploader.upload(
-        file_storage,
-        folder=folder,
-        resource_type="image",
-    )
-    return result.get("secure_url")
+    path = urlparse(file_url).path or ""
+    if not path.startswith("/uploads/"):
+        return None
+    root = os.path.abspath(upload_folder)
+    full_path = os.path.abspath(os.path.join(root, path[len("/uploads/"):]))
+    if os.path.commonpath([root, full_path]) != root:
+        return None
+    return full_path
+
+
+def upload_stem(file_url: str | None) -> str | None:
+    """Nom du fichier d'upload sans extension : identique en local et sur Cloudinary (public_id)."""
+    if not file_url:
+        return None
+    return os.path.splitext(os.path.basename(urlparse(file_url).path))[0] or None
+
+
+def same_upload(url_a: str | None, url_b: str | None) -> bool:
+    stem = upload_stem(url_a)
+    return stem is not None and stem == upload_stem(url_b)
+
+
+def derivative_path(path: str, variant: str, fmt: str) -> str:
+    return f"{os.path.splitext(path)[0]}_{variant}.{fmt}"
+
+
+def derivative_paths(path: str) -> list[str]:
+    return [derivative_path(path, variant, fmt) for variant, _ in IMAGE_VARIANTS for fmt in IMAGE_FORMATS]
+
+
+# Suffixes des dérivés précalculés : (nom, taille, ((format, "_nom.format"), ...))
+_VARIANT_SUFFIXES = tuple(
+    (variant, size, tuple((fmt, f"_{variant}.{fmt}") for fmt in IMAGE_FORMATS)) for variant, size in IMAGE_VARIANTS
+)
+
+
+def image_variants(file_url: str | None, ready: bool) -> dict | None:
+    """URLs des dérivés d'une image : {nom: {"largeur", "webp", "jpg"}}.
+
+    Cloudinary redimensionne à la volée via l'URL ; les fichiers locaux n'existent qu'une fois
+    le traitement en arrière-plan terminé (ready). Appelée pour chaque ligne sérialisée : le cas
+    local évite urlparse et ne découpe l'URL qu'une fois.
+    """
+    if not file_url:
+        return None
+    if CLOUDINARY_UPLOAD_SEGMENT in file_url:
+        parsed = urlparse(file_url)
+        if parsed.netloc.endswith("cloudinary.com") and CLOUDINARY_UPLOAD_SEGMENT in parsed.path:
+            prefix, suffix = file_url.split(CLOUDINARY_UPLOAD_SEGMENT, 1)
+            return {
+                variant: {
+                    "largeur": size,
+                    **{
+                        fmt: f"{prefix}{CLOUDINARY_UPLOAD_SEGMENT}c_limit,w_{size},h_{size},f_{fmt},q_auto/{suffix}"
+                        for fmt in IMAGE_FORMATS
+                    },
+                }
+                for variant, size in IMAGE_VARIANTS
+            }
+    if not ready:
+        return None
+    _, separator, rest = file_url.partition("://")
+    path = rest[rest.find("/"):] if separator else file_url
+    if not path.startswith("/uploads/"):
+        return None
+    stem = os.path.splitext(file_url)[0]
+    return {
+        variant: {"largeur": size, **{fmt: stem + suffix for fmt, suffix in suffixes}}
+        for variant, size, suffixes in _VARIANT_SUFFIXES
+    }
@@ -12,6 +12,17 @@ SAFE_NAME_RE = re.compile(r"^[A-Za-zÀ-ÿ0-9][A-Za-zÀ-ÿ0-9\s'(),._:-]{0,119}$"
 SAFE_UNIT_RE = re.compile(r"^[A-Za-zÀ-ÿ0-9/%.\-\s]{1,20}$")
 SAFE_TEXT_RE = re.compile(r"^[A-Za-zÀ-ÿŒœ0-9\s.,;:!?()'\"%+\-_/&’“”°€–—]{1,2000}$")
 PASSWORD_RE = re.compile(r"^.{8,128}$")
+DEFAULT_PAGE_LIMIT = 20
+MAX_PAGE_LIMIT = 100
+MAX_PLAN_RECIPES = 500
+MAX_PLAN_INVENTORIES = 50
+MAX_MISSING_INGREDIENTS = 5
+MAX_SEARCH_FILTER_IDS = 20
+MAX_SEARCH_OFFSET = 1000
+DEFAULT_AUTOCOMPLETE_LIMIT = 10
+MAX_AUTOCOMPLETE_LIMIT = 20
+# Types acceptés pour l'upload direct (le client annonce le type, vérifié à la confirmation)
+DIRECT_UPLOAD_TYPES = {"image/jpeg": "jpg", "image/png": "png", "image/webp": "webp"}
 
 
 def get_json_object(payload: Any) -> dict:
@@ -184,6 +195,18 @@ def validate_password_change_payload(payload: Any) -> dict:
     }
 
 
+def validate_direct_upload_payload(payload: Any, *, max_bytes: int) -> dict:
+    data = get_json_object(payload)
+    content_type = _get_string(data, "type_contenu", max_len=50, normalize_lower=True)
+    if content_type not in DIRECT_UPLOAD_TYPES:
+        raise ValidationError("Format de fichier non supporte")
+    return {
+        "type_contenu": content_type,
+        "extension": DIRECT_UPLOAD_TYPES[content_type],
+        "taille": _get_int(data, "taille", minimum=1, maximum=max_bytes),
+    }
+
+
 def validate_ingredient_payload(payload: Any, *, partial: bool = False) -> dict:
     data = get_json_object(payload)
     validated: dict[str, Any] = {}
@@ -198,6 +221,12 @@ def validate_ingredient_payload(payload: Any, *, partial: bool = False) -> dict:
     return {key: value for key, value in validated.items() if value is not None}
 
 
+def _reject_duplicate_ids(items: list[dict]) -> None:
+    ids = [item["id"] for item in items]
+    if len(ids) != len(set(ids)):
+        raise ValidationError("Le champ ingredients contient des doublons")
+
+
 def validate_recipe_ingredients(items: Any) -> list[dict]:
     if not isinstance(items, list):
         raise ValidationError("Le champ ingredients doit etre une liste")
@@ -212,6 +241,7 @@ def validate_recipe_ingredients(items: Any) -> list[dict]:
             }
         )
 
+    _reject_duplicate_ids(validated_items)
     return validated_items
 
 
@@ -255,6 +285,7 @@ def validate_inventory_ingredients(items: Any) -> list[dict]:
             }
         )
 
+    _reject_duplicate_ids(validated_items)
     return validated_items
 
 
@@ -289,3 +320,111 @@ def validate_shopping_item_payload(payload: Any, *, partial: bool = False) -> di
         validated["est_achete"] = _get_bool(data, "est_achete")
 
     return {key: value for key, value in validated.items() if value is not None}
+
+
+def validate_pagination_args(args: Any, sorts: Any, default_sort: str, default_limit: Any = None) -> dict:
+    """default_limit : taille de page sans limit explicite (None : liste complète, réservé aux
+    listes diffusées en flux)."""
+    sort = args.get("sort") or default_sort
+    if sort not in sorts:
+        raise ValidationError("Le parametre sort est invalide")
+
+    cursor = _get_string(args, "cursor", required=False, max_len=512)
+    limit = _get_int(args, "limit", required=False, minimum=1, maximum=MAX_PAGE_LIMIT)
+    if limit is None:
+        limit = DEFAULT_PAGE_LIMIT if cursor is not None else default_limit
+
+    return {"sort": sort, "cursor": cursor, "limit": limit}
+
+
+def validate_generate_payload(payload: Any) -> dict:
+    # Corps optionnel : sans liste_id, une nouvelle liste est créée
+    data = get_json_object(payload if payload is not None else {})
+    validated = {"liste_id": _get_int(data, "liste_id", required=False, minimum=1, maximum=10_000_000)}
+    return {key: value for key, value in validated.items() if value is not None}
+
+
+def _get_id_list(data: dict, field: str, *, max_items: int) -> list:
+    values = data.get(field)
+    if not isinstance(values, list) or not values:
+        raise ValidationError(f"Le champ {field} doit etre une liste non vide")
+    if len(values) > max_items:
+        raise ValidationError(f"Le champ {field} contient trop d'elements")
+    return values
+
+
+def validate_meal_plan_payload(payload: Any) -> dict:
+    data = get_json_object(payload)
+
+    recettes = []
+    for item in _get_id_list(data, "recettes", max_items=MAX_PLAN_RECIPES):
+        item_data = get_json_object(item)
+        multiplicateur = _get_float(item_data, "multiplicateur", required=False, minimum=0.01, maximum=1000.0)
+        recettes.append({
+            "id": _get_int(item_data, "id", minimum=1, maximum=10_000_000),
+            "multiplicateur": 1.0 if multiplicateur is None else multiplicateur,
+        })
+
+    inventaires = [
+        _get_int({"inventaires": value}, "inventaires", minimum=1, maximum=10_000_000)
+        for value in _get_id_list(data, "inventaires", max_items=MAX_PLAN_INVENTORIES)
+    ]
+
+    validated = {
+        "recettes": recettes,
+        "inventaires": sorted(set(inventaires)),
+        "liste_id": _get_int(data, "liste_id", required=False, minimum=1, maximum=10_000_000),
+    }
+    return {key: value for key, value in validated.items() if value is not None}
+
+
+def validate_cookable_args(args: Any) -> dict:
+    max_missing = _get_int(args, "max_manquants", required=False, minimum=0, maximum=MAX_MISSING_INGREDIENTS)
+    limit = _get_int(args, "limit", required=False, minimum=1, maximum=MAX_PAGE_LIMIT)
+    return {
+        "max_manquants": 2 if max_missing is None else max_missing,
+        "limit": DEFAULT_PAGE_LIMIT if limit is None else limit,
+    }
+
+
+def _get_csv_ids(args: Any, field: str) -> list:
+    raw = _get_string(args, field, required=False, min_len=0, max_len=400)
+    if raw is None:
+        return []
+    values = [value for value in raw.split(",") if value.strip()]
+    if len(values) > MAX_SEARCH_FILTER_IDS:
+        raise ValidationError(f"Le parametre {field} contient trop d'elements")
+    return sorted({_get_int({field: value}, field, minimum=1, maximum=10_000_000) for value in values})
+
+
+def validate_search_args(args: Any) -> dict:
+    query = _get_string(args, "q", required=False, min_len=0, max_len=200)
+    bounds = {
+        field: _get_int(args, field, required=False, minimum=0, maximum=1440)
+        for field in ("prep_min", "prep_max", "cuisson_min", "cuisson_max")
+    }
+    limit = _get_int(args, "limit", required=False, minimum=1, maximum=MAX_PAGE_LIMIT)
+    offset = _get_int(args, "offset", required=False, minimum=0, maximum=MAX_SEARCH_OFFSET)
+
+    avec = _get_csv_ids(args, "avec")
+    sans = _get_csv_ids(args, "sans")
+    if set(avec) & set(sans):
+        raise ValidationError("Un ingredient ne peut pas etre a la fois dans avec et sans")
+
+    return {
+        "q": query or "",
+        "avec": avec,
+        "sans": sans,
+        "temps_preparation": (bounds["prep_min"], bounds["prep_max"]),
+        "temps_cuisson": (bounds["cuisson_min"], bounds["cuisson_max"]),
+        "limit": DEFAULT_PAGE_LIMIT if limit is None else limit,
+        "offset": offset or 0,
+    }
+
+
+def validate_autocomplete_args(args: Any) -> dict:
+    limit = _get_int(args, "limit", required=False, minimum=1, maximum=MAX_AUTOCOMPLETE_LIMIT)
+    return {
+        "q": _get_string(args, "q", max_len=120),
+        "limit": DEFAULT_AUTOCOMPLETE_LIMIT if limit is None else limit,
+    }
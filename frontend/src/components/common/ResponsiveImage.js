@@ -0,0 +1,48 @@
+import React from 'react';
+import { Box } from '@mui/material';
+
+const buildSrcSet = (variantes, format) =>
+  Object.values(variantes)
+    .map((variante) => `${variante[format]} ${variante.largeur}w`)
+    .join(', ');
+
+// Image servie au format et à la taille adaptés (dérivés WebP/JPEG), avec l'aperçu flouté
+// en fond pendant le chargement. Sans dérivés, l'image d'origine est affichée telle quelle.
+const ResponsiveImage = ({ src, variantes, placeholder, sizes, alt, height, fallback, sx }) => {
+  const handleError = (e) => {
+    if (!fallback) return;
+    e.target.onerror = null;
+    e.target.srcset = '';
+    e.target.src = fallback;
+  };
+
+  return (
+    <Box
+      component="picture"
+      sx={{
+        display: 'block',
+        height,
+        backgroundColor: 'background.default',
+        backgroundImage: placeholder ? `url(${placeholder})` : undefined,
+        backgroundSize: 'cover',
+        backgroundPosition: 'center',
+        ...sx
+      }}
+    >
+      {variantes && <source type="image/webp" srcSet={buildSrcSet(variantes, 'webp')} sizes={sizes} />}
+      <Box
+        component="img"
+        src={src || fallback}
+        srcSet={variantes ? buildSrcSet(variantes, 'jpg') : undefined}
+        sizes={variantes ? sizes : undefined}
+        alt={alt}
+        loading="lazy"
+        decoding="async"
+        onError={handleError}
+        sx={{ display: 'block', width: '100%', height: '100%', objectFit: 'cover' }}
+      />
+    </Box>
+  );
+};
+
+export default ResponsiveImage;
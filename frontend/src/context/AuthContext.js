@@ -44,6 +44,7 @@ export const AuthProvider = ({ children }) => {
             const status = error.response?.status;
             if (status === 401 || status === 422) {
               localStorage.removeItem('token');
+              localStorage.removeItem('refresh_token');
               localStorage.removeItem(USER_STORAGE_KEY);
               setUser(null);
               navigate('/login');
@@ -83,6 +84,9 @@ export const AuthProvider = ({ children }) => {
         return { success: false, message: 'Token manquant, reessayez.' };
       }
       localStorage.setItem('token', token);
+      if (response.data.refresh_token) {
+        localStorage.setItem('refresh_token', response.data.refresh_token);
+      }
       setAuthToken(token);
       localStorage.setItem(USER_STORAGE_KEY, JSON.stringify(response.data.user));
       setUser(response.data.user);
@@ -101,6 +105,9 @@ export const AuthProvider = ({ children }) => {
         return { success: false, message: 'Token manquant, reessayez.' };
       }
       localStorage.setItem('token', token);
+      if (response.data.refresh_token) {
+        localStorage.setItem('refresh_token', response.data.refresh_token);
+      }
       setAuthToken(token);
       localStorage.setItem(USER_STORAGE_KEY, JSON.stringify(response.data.user));
       setUser(response.data.user);
@@ -112,8 +119,13 @@ export const AuthProvider = ({ children }) => {
   };
 
   const logout = () => {
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (refreshToken) {
+      authService.logout(refreshToken).catch(() => {});
+    }
     setAuthToken(null);
     localStorage.removeItem('token');
+    localStorage.removeItem('refresh_token');
     localStorage.removeItem(USER_STORAGE_KEY);
     setUser(null);
     navigate('/login');
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useAuth } from '../../context/AuthContext';
-import { authService } from '../../services/api';
+import { authService, setAuthToken } from '../../services/api';
 import { motion } from 'framer-motion';
 import {
   Box, Container, Typography, Avatar, Button, TextField,
@@ -32,7 +32,7 @@ const passwordSchema = yup.object().shape({
     .required('La confirmation du mot de passe est requise'),
 });
 
-const MAX_AVATAR_SIZE = 1024 * 1024;
+const MAX_AVATAR_SIZE = 15 * 1024 * 1024;
 
 const ProfilePage = () => {
   const { user, updateUser, logout } = useAuth();
@@ -109,10 +109,16 @@ const ProfilePage = () => {
     try {
       setLoading(true);
       setError(null);
-      await authService.changePassword({
+      const response = await authService.changePassword({
         currentPassword: data.currentPassword,
         newPassword: data.newPassword
       });
+      // Les autres sessions sont révoquées : cette session reçoit de nouveaux jetons
+      if (response.data?.access_token) {
+        localStorage.setItem('token', response.data.access_token);
+        localStorage.setItem('refresh_token', response.data.refresh_token);
+        setAuthToken(response.data.access_token);
+      }
       setChangingPassword(false);
       resetPassword();
       setSuccess('Mot de passe changé avec succès');
@@ -136,7 +142,7 @@ const ProfilePage = () => {
     }
 
     if (file.size > MAX_AVATAR_SIZE) {
-      setAvatarError('Image trop lourde (1 Mo max).');
+      setAvatarError('Image trop lourde (15 Mo max).');
       setAvatarFile(null);
       setAvatarPreview(user?.avatar || '');
       return;
@@ -152,9 +158,7 @@ const ProfilePage = () => {
     try {
       setAvatarUploading(true);
       setError(null);
-      const formData = new FormData();
-      formData.append('avatar', avatarFile);
-      const response = await authService.uploadAvatar(formData);
+      const response = await authService.uploadAvatar(avatarFile);
       updateUser(response.data);
       setAvatarFile(null);
       setSuccess('Photo de profil mise a jour');
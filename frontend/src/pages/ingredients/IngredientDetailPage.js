@@ -31,7 +31,7 @@ const IngredientDetailPage = () => {
       try {
         setLoading(true);
         const ingredientResponse = await ingredientService.getById(id);
-        const recipesResponse = await recipeService.getAll();
+        const allRecipes = await recipeService.listAll();
         
         setIngredient(ingredientResponse.data);
         setEditData({
@@ -41,7 +41,7 @@ const IngredientDetailPage = () => {
         });
         
         // Filter recipes that use this ingredient
-        const recipesWithIngredient = recipesResponse.data.recettes.filter(recipe => 
+        const recipesWithIngredient = allRecipes.filter(recipe => 
           recipe.ingredients.some(ing => ing.id === parseInt(id))
         );
         setRecipes(recipesWithIngredient);
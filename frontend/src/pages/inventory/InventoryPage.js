@@ -24,9 +24,9 @@ const InventoryPage = () => {
     const fetchInventories = async () => {
       try {
         setLoading(true);
-        const response = await inventoryService.getAll();
-        setInventories(response.data.inventaires);
-        setFilteredInventories(response.data.inventaires);
+        const allInventories = await inventoryService.listAll();
+        setInventories(allInventories);
+        setFilteredInventories(allInventories);
       } catch (error) {
         console.error('Failed to fetch inventories', error);
       } finally {
@@ -2,10 +2,11 @@ import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { recipeService, inventoryService, shoppingService } from '../../services/api';
 import { useAuth } from '../../context/AuthContext';
+import ResponsiveImage from '../../components/common/ResponsiveImage';
 import { motion } from 'framer-motion';
 import {
   Box, Container, Typography, Button, Grid, Card, CardContent,
-  CardHeader, CardMedia, Divider, Chip, IconButton, Tooltip, List, ListItem,
+  CardHeader, Divider, Chip, IconButton, Tooltip, List, ListItem,
   ListItemText, Avatar, Stack, CircularProgress, Dialog,
   DialogTitle, DialogContent, DialogActions, FormControl, InputLabel,
   Select, MenuItem, Alert, Snackbar
@@ -53,12 +54,12 @@ const RecipeDetailPage = () => {
     const fetchRecipeData = async () => {
       try {
         setLoading(true);
-        const [recipeResponse, inventoriesResponse] = await Promise.all([
+        const [recipeResponse, allInventories] = await Promise.all([
           recipeService.getById(id),
-          inventoryService.getAll()
+          inventoryService.listAll()
         ]);
         setRecipe(recipeResponse.data);
-        setInventories(inventoriesResponse.data.inventaires || []);
+        setInventories(allInventories);
       } catch (error) {
         console.error('Failed to fetch recipe', error);
         navigate('/recettes');
@@ -196,12 +197,13 @@ const RecipeDetailPage = () => {
           <Grid item xs={12} md={8}>
             {recipe.image && (
               <Card sx={{ mb: 3 }}>
-                <CardMedia
-                  component="img"
-                  height="320"
-                  image={recipe.image}
+                <ResponsiveImage
+                  height={320}
+                  src={recipe.image}
+                  variantes={recipe.image_variantes}
+                  placeholder={recipe.image_placeholder}
+                  sizes="(min-width: 900px) 66vw, 100vw"
                   alt={recipe.nom}
-                  sx={{ objectFit: 'cover' }}
                 />
               </Card>
             )}
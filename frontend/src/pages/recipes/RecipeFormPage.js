@@ -24,7 +24,7 @@ const normalizePrice = (value) => {
 };
 
 const RECIPE_DRAFT_KEY = 'recipe_draft_v1';
-const MAX_RECIPE_IMAGE_SIZE = 1024 * 1024;
+const MAX_RECIPE_IMAGE_SIZE = 15 * 1024 * 1024;
 
 const splitMinutes = (totalMinutes) => {
   if (!Number.isFinite(totalMinutes)) {
@@ -261,7 +261,7 @@ const RecipeFormPage = ({ edit = false }) => {
     }
 
     if (file.size > MAX_RECIPE_IMAGE_SIZE) {
-      setImageError('Image trop lourde (1 Mo max).');
+      setImageError('Image trop lourde (15 Mo max).');
       setImageFile(null);
       setImagePreview(existingImage || '');
       return;
@@ -341,9 +341,7 @@ const RecipeFormPage = ({ edit = false }) => {
 
       if (imageFile && recipeId) {
         try {
-          const formData = new FormData();
-          formData.append('image', imageFile);
-          await recipeService.uploadImage(recipeId, formData);
+          await recipeService.uploadImage(recipeId, imageFile);
         } catch (error) {
           const message = error.response?.data?.message || "Recette enregistree, mais l'image n'a pas pu etre envoyee.";
           setSubmitError(message);
@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { useNavigate, useSearchParams } from 'react-router-dom';
 import { recipeService } from '../../services/api';
 import { useAuth } from '../../context/AuthContext';
+import ResponsiveImage from '../../components/common/ResponsiveImage';
 import { motion, AnimatePresence } from 'framer-motion';
 import {
   Box,
@@ -12,7 +13,6 @@ import {
   Card,
   CardActionArea,
   CardContent,
-  CardMedia,
   CardActions,
   IconButton,
   TextField,
@@ -44,6 +44,10 @@ import {
 // Define placeholder image path correctly
 const PLACEHOLDER_IMAGE = '/recipe-placeholder.jpg';
 
+const PAGE_SIZE = 24;
+// Tri côté API (pagination par curseur) ; Z-A inverse ensuite les recettes chargées
+const API_SORTS = { recent: 'recent', oldest: 'ancien', az: 'nom', za: 'nom' };
+
 const formatDuration = (totalMinutes) => {
   if (!Number.isFinite(totalMinutes)) {
     return '0 min';
@@ -70,6 +74,8 @@ const RecipesPage = () => {
   const [searchParams] = useSearchParams();
   const [recipes, setRecipes] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [searchTerm, setSearchTerm] = useState(searchParams.get('search') || '');
   const [filterAnchorEl, setFilterAnchorEl] = useState(null);
   const [sortAnchorEl, setSortAnchorEl] = useState(null);
@@ -86,12 +92,15 @@ const RecipesPage = () => {
     { value: 'za', label: 'Z-A' }
   ];
 
+  const apiSort = API_SORTS[sortBy];
+
   useEffect(() => {
     const fetchRecipes = async () => {
       try {
         setLoading(true);
-        const response = await recipeService.getAll();
+        const response = await recipeService.getAll({ limit: PAGE_SIZE, sort: apiSort });
         setRecipes(response.data.recettes || []);
+        setNextCursor(response.data.next_cursor || null);
       } catch (error) {
         console.error('Failed to fetch recipes', error);
       } finally {
@@ -100,7 +109,21 @@ const RecipesPage = () => {
     };
 
     fetchRecipes();
-  }, []);
+  }, [apiSort]);
+
+  const handleLoadMore = async () => {
+    if (!nextCursor || loadingMore) return;
+    try {
+      setLoadingMore(true);
+      const response = await recipeService.getAll({ limit: PAGE_SIZE, sort: apiSort, cursor: nextCursor });
+      setRecipes((prev) => [...prev, ...(response.data.recettes || [])]);
+      setNextCursor(response.data.next_cursor || null);
+    } catch (error) {
+      console.error('Failed to fetch more recipes', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
 
   useEffect(() => {
     setSearchTerm(searchParams.get('search') || '');
@@ -324,19 +347,14 @@ const RecipesPage = () => {
                 >
                   <Card sx={{ height: '100%', display: 'flex', flexDirection: 'column' }}>
                     <CardActionArea onClick={() => handleViewRecipe(recipe.id)} sx={{ flexGrow: 1, alignItems: 'stretch' }}>
-                      <CardMedia
-                        component="img"
-                        height="200"
-                        image={recipe.image || PLACEHOLDER_IMAGE}
+                      <ResponsiveImage
+                        height={200}
+                        src={recipe.image}
+                        variantes={recipe.image_variantes}
+                        placeholder={recipe.image_placeholder}
+                        sizes="(min-width: 900px) 33vw, (min-width: 600px) 50vw, 100vw"
                         alt={recipe.nom}
-                        onError={(e) => {
-                          e.target.onerror = null;
-                          e.target.src = PLACEHOLDER_IMAGE;
-                        }}
-                        sx={{
-                          objectFit: 'cover',
-                          backgroundColor: 'background.default'
-                        }}
+                        fallback={PLACEHOLDER_IMAGE}
                       />
                       <CardContent sx={{ flexGrow: 1 }}>
                         <Box sx={{ display: 'flex', justifyContent: 'space-between' }}>
@@ -417,6 +435,14 @@ const RecipesPage = () => {
         </Grid>
       )}
 
+      {nextCursor && (
+        <Box sx={{ display: 'flex', justifyContent: 'center', mt: 4 }}>
+          <Button variant="outlined" onClick={handleLoadMore} disabled={loadingMore}>
+            {loadingMore ? 'Chargement...' : 'Charger plus'}
+          </Button>
+        </Box>
+      )}
+
       <Dialog open={Boolean(deleteTarget)} onClose={handleCloseDelete}>
         <DialogTitle>Supprimer la recette</DialogTitle>
         <DialogContent>
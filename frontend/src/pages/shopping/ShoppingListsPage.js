@@ -38,9 +38,9 @@ const ShoppingListsPage = () => {
   const navigate = useNavigate();
 
   const refreshLists = async () => {
-    const response = await shoppingService.getLists();
-    setLists(response.data.listes_courses || []);
-    return response.data.listes_courses || [];
+    const allLists = await shoppingService.listAll();
+    setLists(allLists);
+    return allLists;
   };
 
   const refreshSelectedList = async (listId) => {
@@ -59,14 +59,14 @@ const ShoppingListsPage = () => {
         
         // Fetch recipes, inventories and ingredients if user wants to generate a list
         if (user) {
-          const [recipesResponse, inventoriesResponse, ingredientsResponse] = await Promise.all([
-            recipeService.getAll(),
-            inventoryService.getAll(),
+          const [allRecipes, allInventories, ingredientsResponse] = await Promise.all([
+            recipeService.listAll(),
+            inventoryService.listAll(),
             ingredientService.getAll()
           ]);
           
-          setRecipes(recipesResponse.data.recettes);
-          setInventories(inventoriesResponse.data.inventaires);
+          setRecipes(allRecipes);
+          setInventories(allInventories);
           setAllIngredients(ingredientsResponse.data);
         }
       } catch (error) {
@@ -38,52 +38,149 @@ api.interceptors.request.use((config) => {
   return config;
 });
 
+const clearSession = (status) => {
+  localStorage.removeItem('token');
+  localStorage.removeItem('refresh_token');
+  localStorage.removeItem('user');
+  window.dispatchEvent(new CustomEvent('auth:logout', { detail: { status } }));
+};
+
+// Un seul rafraîchissement à la fois : les requêtes expirées en parallèle attendent le même.
+// Le jeton de rafraîchissement est partagé par tous les onglets (localStorage) : un verrou
+// inter-onglets évite qu'un second onglet présente un jeton déjà consommé, ce que le serveur
+// traite comme un rejeu (toute la session serait révoquée).
+let refreshPromise = null;
+
+const REFRESH_LOCK = 'recetteo-refresh-token';
+
+const withRefreshLock = (callback) =>
+  navigator.locks ? navigator.locks.request(REFRESH_LOCK, callback) : callback();
+
+const refreshAccessToken = () => {
+  if (!refreshPromise) {
+    const staleRefreshToken = localStorage.getItem('refresh_token');
+    refreshPromise = withRefreshLock(async () => {
+      const refreshToken = localStorage.getItem('refresh_token');
+      if (refreshToken && refreshToken !== staleRefreshToken) {
+        // Un autre onglet vient de faire la rotation : ses jetons sont réutilisés tels quels
+        const token = localStorage.getItem('token');
+        setAuthToken(token);
+        return token;
+      }
+      const response = await axios.post(`${API_URL}/auth/refresh`, null, {
+        headers: { Authorization: `Bearer ${refreshToken}` },
+      });
+      localStorage.setItem('token', response.data.access_token);
+      localStorage.setItem('refresh_token', response.data.refresh_token);
+      setAuthToken(response.data.access_token);
+      return response.data.access_token;
+    }).finally(() => {
+      refreshPromise = null;
+    });
+  }
+  return refreshPromise;
+};
+
 // Intercepteur pour gérer les tokens invalides/expirés globalement
 api.interceptors.response.use(
   (response) => response,
-  (error) => {
+  async (error) => {
     const status = error.response?.status;
-    const url = error.config?.url || '';
+    const config = error.config || {};
+    const url = config.url || '';
+    // Jeton d'accès expiré : rafraîchi une fois puis la requête est rejouée
+    if (
+      status === 401 &&
+      error.response?.data?.message === 'Token expire' &&
+      !config._retry &&
+      localStorage.getItem('refresh_token')
+    ) {
+      config._retry = true;
+      try {
+        await refreshAccessToken();
+        return api(config);
+      } catch (refreshError) {
+        clearSession(refreshError.response?.status);
+        return Promise.reject(error);
+      }
+    }
     // Sur 401/422 du profil, token invalide ou expiré → déclencher la déconnexion
     if ((status === 401 || status === 422) && url.includes('/auth/profile')) {
-      localStorage.removeItem('token');
-      localStorage.removeItem('user');
-      window.dispatchEvent(new CustomEvent('auth:logout', { detail: { status } }));
+      clearSession(status);
     }
     return Promise.reject(error);
   }
 );
 
+// Envoi direct : l'image part vers le stockage (URL présignée, sans jeton JWT), puis l'API
+// vérifie l'objet reçu et l'associe à la ressource. Réponse identique à l'upload multipart,
+// utilisé à la place quand l'envoi direct est indisponible (501, déploiement serverless).
+const uploadDirect = async (ticketPath, file, multipartPath, field) => {
+  let ticket;
+  try {
+    ({ data: ticket } = await api.post(ticketPath, { type_contenu: file.type, taille: file.size }));
+  } catch (error) {
+    if (error.response?.status !== 501) {
+      throw error;
+    }
+    const formData = new FormData();
+    formData.append(field, file);
+    return api.post(multipartPath, formData);
+  }
+  await axios({ method: ticket.methode, url: ticket.url, data: file, headers: ticket.entetes });
+  return api.post(`${ticketPath}/confirm`, { jeton: ticket.jeton });
+};
+
 export const authService = {
   register: (data) => api.post('/auth/register', data),
   login: (data) => api.post('/auth/login', data),
+  logout: (refreshToken) =>
+    axios.post(`${API_URL}/auth/logout`, null, { headers: { Authorization: `Bearer ${refreshToken}` } }),
   getProfile: () => api.get('/auth/profile'),
   updateProfile: (data) => api.put('/auth/profile', data),
   changePassword: (data) => api.post('/auth/profile/password', data),
   deleteAccount: () => api.delete('/auth/profile'),
-  uploadAvatar: (formData) => api.post('/auth/profile/avatar', formData),
+  uploadAvatar: (file) => uploadDirect('/auth/profile/avatar/direct', file, '/auth/profile/avatar', 'avatar'),
+};
+
+// Listes paginées par curseur : page suivante tant que next_cursor est renvoyé
+const LIST_PAGE_SIZE = 100;
+
+const fetchAllPages = async (path, key) => {
+  const items = [];
+  let cursor;
+  do {
+    const { data } = await api.get(path, { params: { limit: LIST_PAGE_SIZE, cursor } });
+    items.push(...data[key]);
+    cursor = data.next_cursor;
+  } while (cursor);
+  return items;
 };
 
 export const recipeService = {
-  getAll: () => api.get('/recettes'),
-  getPublic: () => api.get('/recettes/publiques'),
+  getAll: (params) => api.get('/recettes', { params }),
+  listAll: () => fetchAllPages('/recettes', 'recettes'),
+  getPublic: (params) => api.get('/recettes/publiques', { params }),
   getById: (id) => api.get(`/recettes/${id}`),
   create: (data) => api.post('/recettes', data),
   update: (id, data) => api.put(`/recettes/${id}`, data),
   delete: (id) => api.delete(`/recettes/${id}`),
-  uploadImage: (id, formData) => api.post(`/recettes/${id}/image`, formData),
+  uploadImage: (id, file) =>
+    uploadDirect(`/recettes/${id}/image/direct`, file, `/recettes/${id}/image`, 'image'),
 };
 
 export const ingredientService = {
   getAll: () => api.get('/ingredients'),
   getById: (id) => api.get(`/ingredients/${id}`),
+  autocomplete: (q, limit = 10) => api.get('/ingredients/autocomplete', { params: { q, limit } }),
   create: (data) => api.post('/ingredients', data),
   update: (id, data) => api.put(`/ingredients/${id}`, data),
   delete: (id) => api.delete(`/ingredients/${id}`),
 };
 
 export const inventoryService = {
-  getAll: () => api.get('/inventaires'),
+  getAll: (params) => api.get('/inventaires', { params }),
+  listAll: () => fetchAllPages('/inventaires', 'inventaires'),
   getById: (id) => api.get(`/inventaires/${id}`),
   create: (data) => api.post('/inventaires', data),
   update: (id, data) => api.put(`/inventaires/${id}`, data),
@@ -93,7 +190,8 @@ export const inventoryService = {
 };
 
 export const shoppingService = {
-  getLists: () => api.get('/shopping/lists'),
+  getLists: (params) => api.get('/shopping/lists', { params }),
+  listAll: () => fetchAllPages('/shopping/lists', 'listes_courses'),
   getList: (id) => api.get(`/shopping/lists/${id}`),
   createList: () => api.post('/shopping/lists'),
   addItem: (listId, data) => api.post(`/shopping/lists/${listId}/items`, data),